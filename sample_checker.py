@@ -1,19 +1,46 @@
-import customtkinter as ctk
-import tkinter as tk
-from tkinter import messagebox, filedialog
 import os
 import sys
 import re
 import csv
 import logging
-from typing import List, Dict, Tuple, Optional, Set
-from urllib.parse import urljoin
+import argparse
+import json
+import codecs
+import hashlib
+import shutil
+import tempfile
+import weakref
+import getpass
+import socket
+import sqlite3
+import io
+import ctypes
+import http.client
+import http.server
+import zlib
+import uuid
+import zipfile
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Iterable, List, Dict, Tuple, Optional, Set, Union
+from urllib.parse import parse_qs, urlencode, urljoin, urlparse
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from html import escape
+from types import SimpleNamespace
+from collections import Counter, OrderedDict, deque
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
+import numpy as np
 import pandas as pd
 import threading
+try:
+    import httpx  # 選用：HTTP/2 傳輸層 (pip install "httpx[http2]")
+except ImportError:
+    httpx = None
 import time
 
 # =================================================================
@@ -26,7 +53,24 @@ LIST_PATH_TMPL = "/admin/project/{project}/wave/{wave}/survey-work/list?page={pa
 EDIT_BASE_TMPL = "/admin/project/{project}/wave/{wave}/survey-work/edit/{work_id}"
 
 MAX_WORKERS = 15
+MAX_OUTSTANDING_TASKS = MAX_WORKERS * 4
 TIMEOUT = 15
+CACHE_DIR = Path.cwd() / "cache"
+
+# 抓取模式：rules 只抓檢查規則用得到的頁面；full 抓取所有頁面（完整匯出）
+FETCH_MODE_RULES = "rules"
+FETCH_MODE_FULL = "full"
+FETCH_MODE = FETCH_MODE_RULES
+FIELD_NOT_FETCHED = "未擷取"
+
+# 填答結果頁改以串流方式邊下載邊解析，找到目標列即中斷下載（預設關閉，見 Streaming Form Results）
+# 命令列以 --stream-forms 開啟；GUI 執行時可設定環境變數 SAMPLE_CHECKER_STREAM_FORMS=1
+STREAM_FORMS_ENV = "SAMPLE_CHECKER_STREAM_FORMS"
+STREAM_FORM_PAGES = os.environ.get(STREAM_FORMS_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# 傳輸層：http1 使用 requests 內建的連線池；http2 改用 httpx 多工連線（見 HTTP/2 Transport）
+HTTP_TRANSPORT = "http1"
 
 # 爬蟲的日誌器
 crawler_logger = logging.getLogger("Crawler")
@@ -38,28 +82,748 @@ if not crawler_logger.handlers:
     crawler_logger.addHandler(ch)
 
 # ---------------------- Session Factory ----------------------
-def create_session() -> requests.Session:
-    s = requests.Session()
+LOGIN_PATH_CANDIDATES = ["/admin/login", "/admin/auth/login", "/login", "/auth/login"]
+RELOGIN_ATTEMPTS = 2
+FETCH_CACHE_MAX_ENTRIES = 4096
+FETCH_CACHE_MAX_BYTES = 128 * 1024 * 1024
+RUN_METRICS_FILE = "run_metrics.json"
+_PASSWORD_INPUT_RE = re.compile(rb"<input[^>]+type=[\"']?password", re.IGNORECASE)
+
+
+class SessionExpiredError(requests.RequestException):
+    """重新登入後仍拿到登入頁；登入頁不可當成一般回應解析（會變成「未填寫」「無訪次」），改走抓取失敗的流程"""
+
+
+class LoginState:
+    """登入憑證與登入世代（所有 worker session 共用，帳密僅保存在記憶體中）"""
+
+    def __init__(self, email: str, password: str, cookies: requests.cookies.RequestsCookieJar):
+        self.email = email
+        self.password = password
+        self.cookies = cookies.copy()
+        self.generation = 0
+        self.relogin_count = 0
+        self.lock = threading.Lock()
+
+    def relogin(self, seen_generation: int) -> None:
+        """登入逾期時重新登入；多個 worker 同時偵測到時只會登入一次"""
+        with self.lock:
+            if self.generation != seen_generation:
+                return
+            fresh = create_session()
+            fetch_csrf_and_login(fresh, self.email, self.password, use_saved=False)
+            self.cookies = fresh.cookies.copy()
+            self.generation += 1
+            self.relogin_count += 1
+            crawler_logger.warning(f"登入已逾期，已重新登入 (第 {self.relogin_count} 次)")
+
+
+def is_login_response(r: requests.Response, requested_url: str = "", check_body: bool = True) -> bool:
+    """判斷回應是否為登入頁（被導向登入頁，或 200 回傳登入表單）"""
+    if requested_url and urlparse(requested_url).path in LOGIN_PATH_CANDIDATES:
+        return False
+    landed = [r.url]
+    if r.is_redirect:
+        landed.append(urljoin(r.url, r.headers.get("Location", "")))
+    if any(urlparse(u).path in LOGIN_PATH_CANDIDATES for u in landed if u):
+        return True
+    if not check_body or r.status_code != 200:
+        return False
+    return bool(_PASSWORD_INPUT_RE.search(r.content or b""))
+
+
+class FetchCache:
+    """同一次執行內共用的 GET 快取：相同 URL 的並行請求只發出一次，並保留最近的回應 (LRU)"""
+
+    def __init__(self, max_entries: int = FETCH_CACHE_MAX_ENTRIES, max_bytes: int = FETCH_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, requests.Response]" = OrderedDict()
+        self.inflight: Dict[str, Future] = {}
+        self.size = 0
+        self.network_requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+
+    @property
+    def deduplicated(self) -> int:
+        return self.cache_hits + self.coalesced
+
+    def fetch(self, key: str, do_request) -> requests.Response:
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            waiter = self.inflight.get(key)
+            owner = waiter is None
+            if owner:
+                waiter = self.inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return waiter.result()
+
+        try:
+            r = do_request()
+        except BaseException as e:
+            with self.lock:
+                self.inflight.pop(key, None)
+            waiter.set_exception(e)
+            raise
+
+        storable = r.status_code == 200 and not is_login_response(r, key)
+        with self.lock:
+            self.network_requests += 1
+            self.inflight.pop(key, None)
+            if storable:
+                self._store(key, r)
+        waiter.set_result(r)
+        return r
+
+    def _store(self, key: str, r: requests.Response) -> None:
+        body_size = len(r.content or b"")
+        if body_size > self.max_bytes:
+            return
+        self.entries[key] = r
+        self.size += body_size
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old.content or b"")
+
+
+class EsccSession(requests.Session):
+    """附帶登入逾期偵測的 Session：遇到登入頁時重新登入並重試一次；可共用 FetchCache 合併重複的 GET"""
+
+    def __init__(self):
+        super().__init__()
+        self.login_state: Optional[LoginState] = None
+        self.login_generation = 0
+        self.fetch_cache: Optional[FetchCache] = None
+        self.parse_cache: Optional["ParseCache"] = None
+
+    def _sync_login_cookies(self) -> int:
+        state = self.login_state
+        generation = state.generation
+        if self.login_generation != generation:
+            self.cookies.update(state.cookies)
+            self.login_generation = generation
+        return generation
+
+    def request(self, method, url, *args, **kwargs):
+        cacheable = (
+            self.fetch_cache is not None
+            and method.upper() == "GET"
+            and not args
+            and not any(kwargs.get(k) for k in ("params", "data", "json", "headers", "stream"))
+        )
+        if cacheable:
+            return self.fetch_cache.fetch(url, lambda: self._request_with_login(method, url, **kwargs))
+        return self._request_with_login(method, url, *args, **kwargs)
+
+    def _request_with_login(self, method, url, *args, **kwargs):
+        if self.login_state is None:
+            return super().request(method, url, *args, **kwargs)
+
+        generation = self._sync_login_cookies()
+        check_body = not kwargs.get("stream", False)
+        r = super().request(method, url, *args, **kwargs)
+        for _ in range(RELOGIN_ATTEMPTS):
+            if not is_login_response(r, url, check_body):
+                return r
+            crawler_logger.info(f"偵測到登入頁，重新登入後重試: {url}")
+            r.close()
+            self.login_state.relogin(generation)
+            generation = self._sync_login_cookies()
+            r = super().request(method, url, *args, **kwargs)
+
+        if is_login_response(r, url, check_body):
+            r.close()
+            crawler_logger.error(f"重新登入後仍被導向登入頁: {url}")
+            raise SessionExpiredError(f"重新登入後仍被導向登入頁: {url}", response=r, request=r.request)
+        return r
+
+
+def create_session() -> EsccSession:
+    s = EsccSession()
     s.headers.update({
         "User-Agent": "Mozilla/5.0",
         "Referer": BASE_URL
     })
-    adapter = requests.adapters.HTTPAdapter(
-        pool_connections=MAX_WORKERS,
-        pool_maxsize=MAX_WORKERS * 2,
-        max_retries=3
-    )
+    adapter = create_adapter()
     s.mount('http://', adapter)
     s.mount('https://', adapter)
     return s
 
+
+def create_adapter() -> requests.adapters.BaseAdapter:
+    """一般為 HTTPAdapter；錄製/回放模式時改用對應的 adapter（見 Record / Replay）"""
+    pool = dict(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS * 2, max_retries=3)
+    if _transport_mode == "replay":
+        return ReplayAdapter(_transport_archive)
+    if _transport_mode == "record":
+        return RecordingAdapter(_transport_archive, **pool)
+    if HTTP_TRANSPORT == "http2":
+        transport = get_http2_transport()
+        if transport is not None:
+            return Http2Adapter(transport)
+    return requests.adapters.HTTPAdapter(**pool)
+
+
+def clone_session(session: requests.Session) -> EsccSession:
+    """建立 worker 用的 Session，複製目前的 cookies 並共用登入狀態"""
+    worker_session = create_session()
+    worker_session.cookies.update(session.cookies)
+    state = getattr(session, "login_state", None)
+    if state is not None:
+        worker_session.login_state = state
+        worker_session.login_generation = session.login_generation
+    worker_session.fetch_cache = getattr(session, "fetch_cache", None)
+    worker_session.parse_cache = getattr(session, "parse_cache", None)
+    return worker_session
+
+
+def attach_run_caches(session: requests.Session) -> None:
+    """為一次執行掛上 GET 快取與解析結果快取；已掛上的沿用"""
+    if not isinstance(session, EsccSession):
+        return
+    if session.fetch_cache is None:
+        session.fetch_cache = FetchCache()
+    if session.parse_cache is None:
+        session.parse_cache = ParseCache.load()
+
+
+def save_run_caches(session: requests.Session) -> None:
+    parse_cache = getattr(session, "parse_cache", None)
+    if parse_cache is not None:
+        parse_cache.save()
+
+
+def collect_session_metrics(session: requests.Session) -> Dict[str, int]:
+    """整理 session 共用元件的統計數字，寫入 run_metrics.json"""
+    metrics: Dict[str, int] = {}
+    cache = getattr(session, "fetch_cache", None)
+    if cache is not None:
+        metrics.update({
+            "get_network_requests": cache.network_requests,
+            "deduplicated_requests": cache.deduplicated,
+            "dedup_inflight_coalesced": cache.coalesced,
+            "dedup_cache_hits": cache.cache_hits,
+        })
+    parse_cache = getattr(session, "parse_cache", None)
+    if parse_cache is not None:
+        metrics.update({
+            "parse_cache_hits": parse_cache.hits,
+            "parse_cache_misses": parse_cache.misses,
+        })
+    state = getattr(session, "login_state", None)
+    if state is not None:
+        metrics["relogins"] = state.relogin_count
+    metrics.update(http_version_metrics())
+    return metrics
+
+
+def write_run_metrics(metrics: Dict, output_dir: Path) -> None:
+    try:
+        (output_dir / RUN_METRICS_FILE).write_text(json.dumps(metrics, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        crawler_logger.warning(f"寫出執行統計失敗: {e}")
+
+
+# ---------------------- HTTP/2 Transport ----------------------
+# HTTP_TRANSPORT = "http2" 時，所有 session 共用一個 httpx 傳輸層：以 ALPN 協商 HTTP/2，
+# 多個請求在少數幾條連線上多工傳送，標頭以 HPACK 壓縮；伺服器不支援時同一條連線自動使用 HTTP/1.1。
+# 未安裝 httpx[http2] 時記錄警告並改用一般的 HTTPAdapter。登入、cookies、重新導向仍由 requests 處理。
+# HTTP/2 時所有請求共用一條連線；伺服器只支援 HTTP/1.1 時與 HTTPAdapter 相同，需要 MAX_WORKERS * 2 條連線才不會排隊
+HTTP2_MAX_CONNECTIONS = MAX_WORKERS * 2
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}  # HTTP/2 禁止
+
+_http2_lock = threading.Lock()
+_http2_transport = None
+_http_versions: Counter = Counter()
+
+
+def get_http2_transport():
+    """建立（或沿用）共用的 httpx 傳輸層；無法使用 HTTP/2 時回傳 None"""
+    global _http2_transport
+    with _http2_lock:
+        if _http2_transport is None:
+            if httpx is None:
+                crawler_logger.warning('未安裝 httpx，改用 HTTP/1.1（pip install "httpx[http2]"）')
+                _http2_transport = False
+            else:
+                try:
+                    _http2_transport = httpx.HTTPTransport(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=HTTP2_MAX_CONNECTIONS,
+                                            max_keepalive_connections=HTTP2_MAX_CONNECTIONS),
+                        retries=3,
+                    )
+                except ImportError as e:
+                    crawler_logger.warning(f"無法使用 HTTP/2，改用 HTTP/1.1: {e}")
+                    _http2_transport = False
+        return _http2_transport or None
+
+
+class _Http2Body(io.RawIOBase):
+    """把 httpx 回應包成 requests 讀取用的 raw；未讀完就關閉時只會取消這個 stream"""
+
+    def __init__(self, response, headers):
+        super().__init__()
+        self.response = response
+        self.chunks = response.iter_bytes()
+        self.buffer = b""
+        # requests 由 raw._original_response.msg 取出 Set-Cookie
+        msg = http.client.HTTPMessage()
+        for key, value in headers:
+            msg.add_header(key, value)
+        self._original_response = SimpleNamespace(msg=msg)
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            while size < 0 or len(self.buffer) < size:
+                chunk = next(self.chunks, None)
+                if chunk is None:
+                    break
+                self.buffer += chunk
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e)
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def close(self) -> None:
+        if not self.closed:
+            self.response.close()
+        super().close()
+
+
+class Http2Adapter(requests.adapters.BaseAdapter):
+    def __init__(self, transport):
+        super().__init__()
+        self.transport = transport
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS]
+        outgoing = httpx.Request(
+            request.method, request.url, headers=headers, content=request.body or b"",
+            extensions={"timeout": {"connect": connect_timeout, "read": read_timeout,
+                                    "write": read_timeout, "pool": read_timeout}},
+        )
+        try:
+            incoming = self.transport.handle_request(outgoing)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        version = incoming.extensions.get("http_version", b"HTTP/1.1").decode("ascii")
+        with _http2_lock:
+            _http_versions[version] += 1
+
+        headers = incoming.headers.multi_items()
+        r = requests.Response()
+        r.status_code = incoming.status_code
+        r.reason = incoming.extensions.get("reason_phrase", b"").decode("latin-1")
+        r.headers = requests.structures.CaseInsensitiveDict(headers)
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        r.raw = _Http2Body(incoming, headers)
+        r.url = request.url
+        r.request = request
+        r.connection = self
+        return r
+
+    def close(self):
+        pass
+
+
+def http_version_metrics() -> Dict[str, int]:
+    with _http2_lock:
+        return {f"responses_{version.replace('/', '').replace('.', '')}": n for version, n in _http_versions.items()}
+
+
+# ---------------------- Record / Replay ----------------------
+# 錄製模式把每個回應（URL、狀態碼、部分標頭、壓縮後的內容）寫入回放檔 (SQLite)；回放模式以 transport adapter
+# 直接由回放檔回應，不連網即可完整重跑一個梯次，用於效能量測與解析器回歸測試。
+# 錄製時不保存請求內容（帳密）與 cookies，回應內容中的個人資料依 REPLAY_REDACT_PATTERNS 置換成固定代號
+# （同一個值得到同一個代號，不影響比對）。
+REPLAY_FORMAT = 1
+REPLAY_HEADER_ALLOWLIST = {"content-type", "location", "etag", "last-modified", "cache-control"}
+REPLAY_REDACT_PATTERNS = [
+    r"(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)+",  # Email
+    r"(?<!\d)09\d{2}-?\d{3}-?\d{3}(?!\d)",        # 手機
+    r"(?<!\d)0\d{1,2}-\d{6,8}(?!\d)",             # 市話
+    r"(?<![A-Za-z0-9])[A-Z][12]\d{8}(?!\d)",      # 身分證字號
+]
+
+_transport_archive: Optional["ReplayArchive"] = None
+_transport_mode = ""
+
+
+def _replay_key(method: str, url: str) -> str:
+    """以方法與路徑（含查詢字串）為鍵，回放時不受主機名稱影響"""
+    parts = urlparse(url)
+    return f"{method.upper()} {parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+class Redactor:
+    def __init__(self, patterns: Iterable[str]):
+        self.regexes = [re.compile(p) for p in patterns]
+        self.replaced = 0
+
+    def _token(self, match: "re.Match") -> str:
+        self.replaced += 1
+        return "REDACTED-" + hashlib.blake2b(match.group(0).encode("utf-8"), digest_size=4).hexdigest()
+
+    def redact(self, body: bytes) -> bytes:
+        if not self.regexes or not body:
+            return body
+        text = body.decode("utf-8", errors="surrogateescape")
+        for regex in self.regexes:
+            text = regex.sub(self._token, text)
+        return text.encode("utf-8", errors="surrogateescape")
+
+
+class ReplayArchive:
+    """回放檔：每個 (方法, 路徑) 保存一個回應；已有 200 回應時不會被之後的非 200 回應（例如登入逾期）覆蓋"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS replay_meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT,
+            status INTEGER,
+            reason TEXT,
+            headers TEXT,
+            body BLOB,
+            recorded_at REAL
+        );
+    """
+
+    def __init__(self, path, redactor: Optional[Redactor] = None):
+        self.path = str(path)
+        self.redactor = redactor
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.db.executescript(self.SCHEMA)
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.entries: Dict[str, tuple] = {}
+        self.recorded = 0
+        self.served = 0
+        self.missing = 0
+
+    def start_recording(self) -> None:
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO replay_meta (key, value) VALUES ('meta', ?)", (json.dumps({
+                "format": REPLAY_FORMAT,
+                "base_url": BASE_URL,
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "redact_patterns": [r.pattern for r in self.redactor.regexes] if self.redactor else [],
+            }, ensure_ascii=False),))
+
+    def load(self) -> None:
+        """回放前把整個回放檔載入記憶體（內容維持壓縮，取用時才解壓）"""
+        row = self.db.execute("SELECT value FROM replay_meta WHERE key = 'meta'").fetchone()
+        if not row or json.loads(row[0]).get("format") != REPLAY_FORMAT:
+            raise RuntimeError(f"{self.path} 不是可用的回放檔")
+        for key, url, status, reason, headers, body in self.db.execute(
+                "SELECT key, url, status, reason, headers, body FROM responses"):
+            self.entries[key] = (url, status, reason, json.loads(headers), body)
+        crawler_logger.info(f"已載入回放檔 {self.path}：{len(self.entries)} 個回應")
+
+    def record(self, request: requests.PreparedRequest, r: requests.Response) -> None:
+        body = r.content or b""
+        if self.redactor:
+            body = self.redactor.redact(body)
+        headers = {k: v for k, v in r.headers.items() if k.lower() in REPLAY_HEADER_ALLOWLIST}
+        values = (_replay_key(request.method, request.url), request.url, r.status_code, r.reason or "",
+                  json.dumps(headers), zlib.compress(body, 6), time.time())
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO responses (key, url, status, reason, headers, body, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "url = excluded.url, status = excluded.status, reason = excluded.reason, headers = excluded.headers, "
+                "body = excluded.body, recorded_at = excluded.recorded_at "
+                "WHERE responses.status != 200 OR excluded.status = 200",
+                values,
+            )
+            self.recorded += 1
+
+    def response_for(self, request: requests.PreparedRequest) -> requests.Response:
+        entry = self.entries.get(_replay_key(request.method, request.url))
+        if entry is None:
+            with self.lock:
+                self.missing += 1
+            raise requests.exceptions.ConnectionError(f"回放檔中沒有此請求: {request.method} {request.url}",
+                                                      request=request)
+        _, status, reason, headers, body = entry
+        r = requests.Response()
+        r.status_code = status
+        r.reason = reason
+        r.headers = requests.structures.CaseInsensitiveDict(headers)
+        r._content = zlib.decompress(body)
+        r._content_consumed = True
+        r.raw = io.BytesIO(r._content)
+        r.url = request.url
+        r.request = request
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        with self.lock:
+            self.served += 1
+        return r
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+class RecordingAdapter(requests.adapters.HTTPAdapter):
+    """一般的 HTTP 連線，另把每個回應寫入回放檔（串流請求會先讀完整個內容）"""
+
+    def __init__(self, archive: ReplayArchive, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        r = super().send(request, **kwargs)
+        try:
+            self.archive.record(request, r)
+        except Exception as e:
+            crawler_logger.warning(f"錄製回應失敗 {request.url}: {e}")
+        return r
+
+
+class ReplayAdapter(requests.adapters.BaseAdapter):
+    """不連網，由回放檔回應所有請求"""
+
+    def __init__(self, archive: ReplayArchive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        r = self.archive.response_for(request)
+        r.connection = self
+        return r
+
+    def close(self):
+        pass
+
+
+def start_recording(path, extra_patterns: Iterable[str] = ()) -> ReplayArchive:
+    """之後建立的 session 都會錄製回應"""
+    global _transport_archive, _transport_mode
+    archive = ReplayArchive(path, Redactor(list(REPLAY_REDACT_PATTERNS) + list(extra_patterns)))
+    archive.start_recording()
+    _transport_archive, _transport_mode = archive, "record"
+    return archive
+
+
+def start_replay(path) -> ReplayArchive:
+    """之後建立的 session 都由回放檔回應"""
+    global _transport_archive, _transport_mode
+    if not Path(path).exists():
+        raise FileNotFoundError(f"找不到回放檔 {path}")
+    archive = ReplayArchive(path)
+    archive.load()
+    _transport_archive, _transport_mode = archive, "replay"
+    return archive
+
+
+def stop_transport_archive() -> None:
+    global _transport_archive, _transport_mode
+    archive = _transport_archive
+    _transport_archive, _transport_mode = None, ""
+    if archive is None:
+        return
+    if archive.redactor:
+        crawler_logger.info(f"錄製完成：{archive.recorded} 個回應，遮蔽 {archive.redactor.replaced} 處個人資料")
+    else:
+        crawler_logger.info(f"回放完成：{archive.served} 個回應，{archive.missing} 個請求不在回放檔中")
+    archive.close()
+
+
+# ---------------------- Profiling ----------------------
+# 分段計時：各階段以 profile_stage() 包住，記錄牆鐘時間與整個行程的 CPU 時間（未啟用時不做任何事）。
+# 取樣：另開執行緒定期讀取所有執行緒的 Python 堆疊（牆鐘取樣，等待中的執行緒也會計入），依「階段;執行緒;函式…」累計，
+# 輸出 collapsed stacks（可給 flamegraph.pl / speedscope）與 speedscope JSON。
+# 取樣間隔 10ms 時約佔一個核心的 1~2%，可在正式執行時開啟。
+PROFILE_ENV = "SAMPLE_CHECKER_PROFILE"  # GUI 執行時：stages 只計時，stacks 另外取樣堆疊
+PROFILE_SAMPLE_INTERVAL = 0.01
+PROFILE_STAGES_FILE = "profile_stages.csv"
+PROFILE_FOLDED_FILE = "profile.folded"
+PROFILE_SPEEDSCOPE_FILE = "profile.speedscope.json"
+
+_active_profiler: Optional["RunProfiler"] = None
+
+
+class RunProfiler:
+    def __init__(self, sample_stacks: bool = False, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.stack: List[str] = []
+        self.current = ""
+        self.totals: Dict[str, List[float]] = {}
+        self.events: List[Tuple[str, str, float]] = []
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.stop_event = threading.Event()
+        self.sampler: Optional[threading.Thread] = None
+        if sample_stacks:
+            self.sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+            self.sampler.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        path = "/".join(self.stack + [name])
+        self.stack.append(name)
+        self.current = path
+        self.events.append(("O", path, time.perf_counter() - self.started))
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self.events.append(("C", path, time.perf_counter() - self.started))
+            self.stack.pop()
+            self.current = "/".join(self.stack)
+            total = self.totals.setdefault(path, [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += wall
+            total[2] += cpu
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        while not self.stop_event.wait(self.interval):
+            stage = self.current or "(無階段)"
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {t.ident: re.sub(r"_\d+$", "", t.name) for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[(stage, names.get(ident, str(ident))) + tuple(stack)] += 1
+            self.sample_count += 1
+
+    def stage_table(self) -> pd.DataFrame:
+        elapsed = time.perf_counter() - self.started
+        rows = [
+            {"階段": path, "次數": calls, "牆鐘秒數": round(wall, 3), "CPU秒數": round(cpu, 3),
+             "佔總時間%": round(100 * wall / elapsed, 1) if elapsed else 0.0}
+            for path, (calls, wall, cpu) in self.totals.items()
+        ]
+        rows.append({"階段": "(全部)", "次數": 1, "牆鐘秒數": round(elapsed, 3), "CPU秒數": "", "佔總時間%": 100.0})
+        return pd.DataFrame(rows)
+
+    def finish(self, output_dir: Path) -> None:
+        self.stop_event.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        table = self.stage_table()
+        table.to_csv(output_dir / PROFILE_STAGES_FILE, index=False, encoding="utf-8-sig")
+        crawler_logger.info("分段計時：\n" + table.to_string(index=False))
+        if self.sampler is None:
+            return
+        with open(output_dir / PROFILE_FOLDED_FILE, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(";".join(frame.replace(";", ",") for frame in stack) + f" {count}\n")
+        (output_dir / PROFILE_SPEEDSCOPE_FILE).write_text(
+            json.dumps(self.speedscope(), ensure_ascii=False), encoding="utf-8"
+        )
+        crawler_logger.info(f"堆疊取樣 {self.sample_count} 次，已輸出 {PROFILE_FOLDED_FILE} 與 {PROFILE_SPEEDSCOPE_FILE}")
+
+    def speedscope(self) -> Dict:
+        """每個執行緒群組一個 sampled profile（權重為秒），另加一個階段時間軸 (evented)"""
+        frames: List[Dict] = []
+        frame_index: Dict[str, int] = {}
+
+        def index_of(name: str) -> int:
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                frames.append({"name": name})
+            return frame_index[name]
+
+        by_thread: Dict[str, List[Tuple[List[int], float]]] = {}
+        for (stage, thread, *stack), count in self.samples.items():
+            by_thread.setdefault(thread, []).append(
+                ([index_of(f"階段 {stage}")] + [index_of(name) for name in stack], count * self.interval)
+            )
+        profiles = []
+        for thread, entries in sorted(by_thread.items()):
+            total = sum(weight for _, weight in entries)
+            profiles.append({
+                "type": "sampled", "name": thread, "unit": "seconds", "startValue": 0, "endValue": total,
+                "samples": [stack for stack, _ in entries], "weights": [weight for _, weight in entries],
+            })
+        end = time.perf_counter() - self.started
+        profiles.append({
+            "type": "evented", "name": "階段", "unit": "seconds", "startValue": 0, "endValue": end,
+            "events": [{"type": kind, "frame": index_of(f"階段 {path}"), "at": at} for kind, path, at in self.events],
+        })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": "sample_checker",
+            "exporter": "sample_checker",
+        }
+
+
+def profile_stage(name: str):
+    """以 with 包住一個階段；未啟用分析時為空的 context manager"""
+    profiler = _active_profiler
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+def start_profiling(sample_stacks: bool = False, interval: float = PROFILE_SAMPLE_INTERVAL) -> RunProfiler:
+    global _active_profiler
+    _active_profiler = RunProfiler(sample_stacks, interval)
+    return _active_profiler
+
+
+def finish_profiling(output_dir: Path) -> None:
+    global _active_profiler
+    profiler, _active_profiler = _active_profiler, None
+    if profiler is None:
+        return
+    try:
+        profiler.finish(output_dir)
+    except Exception as e:
+        crawler_logger.warning(f"寫出效能分析結果失敗: {e}")
+
+
 # ---------------------- Login ----------------------
-def fetch_csrf_and_login(session: requests.Session, email: str, password: str) -> None:
-    # 邏輯與 v6.0.1 相同
-    login_path_candidates = ["/admin/login", "/admin/auth/login", "/login", "/auth/login"]
+def fetch_csrf_and_login(session: requests.Session, email: str, password: str, use_saved: bool = True) -> None:
+    # 邏輯與 v6.0.1 相同；另會記住成功的登入路徑，並優先沿用加密保存的登入 cookies
+    if use_saved and restore_saved_login(session, email, password):
+        crawler_logger.info("沿用已保存的登入狀態")
+        _remember_login(session, email, password)
+        return
+
+    profile = load_login_profile()
+    candidates = list(LOGIN_PATH_CANDIDATES)
+    if profile.get("login_path") in candidates:
+        candidates.remove(profile["login_path"])
+        candidates.insert(0, profile["login_path"])
+
     last_err: Optional[Exception] = None
 
-    for p in login_path_candidates:
+    for p in candidates:
         try:
             login_url = urljoin(BASE_URL, p)
             r = session.get(login_url, timeout=TIMEOUT)
@@ -68,17 +832,15 @@ def fetch_csrf_and_login(session: requests.Session, email: str, password: str) -
             last_err = e
             continue
 
-        soup = BeautifulSoup(r.text, "lxml")
+        soup = make_soup(response_markup(r))
         form = soup.find("form")
         if not form:
             post_url = login_url
             payload = {"email": email, "password": password}
             r2 = session.post(post_url, data=payload, timeout=TIMEOUT, allow_redirects=True)
-            if r2.status_code in (200, 302):
-                probe = session.get(urljoin(BASE_URL, "/admin"), timeout=TIMEOUT, allow_redirects=True)
-                if probe.status_code == 200 and "admin" in probe.url:
-                    crawler_logger.info("登入成功")
-                    return
+            if r2.status_code in (200, 302) and _probe_admin(session):
+                _login_succeeded(session, email, password, p, "none")
+                return
             last_err = RuntimeError(f"Login failed at {post_url}")
             continue
 
@@ -91,28 +853,242 @@ def fetch_csrf_and_login(session: requests.Session, email: str, password: str) -
                 continue
             payload[name] = inp.get("value", "")
 
-        if soup.select_one('input[name="user[email]"]') or "user[email]" in payload:
+        known_layout = profile.get("field_layout") if profile.get("login_path") == p else None
+        if known_layout == "user" or (known_layout is None and (soup.select_one('input[name="user[email]"]') or "user[email]" in payload)):
+            layout = "user"
             payload["user[email]"] = email
             payload["user[password]"] = password
         else:
+            layout = "plain"
             payload["email"] = email
             payload["password"] = password
 
         r2 = session.post(action_url, data=payload, timeout=TIMEOUT, allow_redirects=True)
-        if r2.status_code in (200, 302):
-            probe = session.get(urljoin(BASE_URL, "/admin"), timeout=TIMEOUT, allow_redirects=True)
-            if probe.status_code == 200 and "admin" in probe.url:
-                crawler_logger.info("登入成功")
-                return
+        if r2.status_code in (200, 302) and _probe_admin(session):
+            _login_succeeded(session, email, password, p, layout)
+            return
         last_err = RuntimeError(f"Login failed at {action_url}")
 
     if last_err:
         raise last_err
     raise RuntimeError("Login failed for all candidates")
 
+
+def _probe_admin(session: requests.Session) -> bool:
+    probe = session.get(urljoin(BASE_URL, "/admin"), timeout=TIMEOUT, allow_redirects=True)
+    return probe.status_code == 200 and "admin" in probe.url and not is_login_response(probe)
+
+
+def _login_succeeded(session: requests.Session, email: str, password: str, login_path: str, layout: str) -> None:
+    crawler_logger.info("登入成功")
+    save_login_profile({"base_url": BASE_URL, "login_path": login_path, "field_layout": layout})
+    save_login_cookies(session, email, password)
+    _remember_login(session, email, password)
+
+
+def _remember_login(session: requests.Session, email: str, password: str) -> None:
+    # 首次登入時保留帳密，供長時間爬取中 session 逾期時自動重新登入
+    if isinstance(session, EsccSession) and session.login_state is None:
+        session.login_state = LoginState(email, password, session.cookies)
+
+# ---------------------- Login Cache ----------------------
+# login_profile.json 只記錄登入路徑與欄位格式；cookies 以 Windows DPAPI 加密後保存（只有同一個 Windows 使用者能解開），
+# 並以帳密的雜湊作為附加 entropy，換帳號或密碼時無法解開，會改走完整登入流程。非 Windows 平台不保存 cookies。
+LOGIN_PROFILE_FILE = "login_profile.json"
+LOGIN_COOKIE_STORE_FILE = "login_cookies.bin"
+_STORE_MAGIC = b"SCK2"  # SCK1 為舊版自製加密格式，讀到時視為沒有保存
+_CRYPTPROTECT_UI_FORBIDDEN = 0x01
+
+
+def get_cache_dir() -> Path:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return CACHE_DIR
+
+
+def load_login_profile() -> Dict[str, str]:
+    try:
+        profile = json.loads((CACHE_DIR / LOGIN_PROFILE_FILE).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if not isinstance(profile, dict) or profile.get("base_url") != BASE_URL:
+        return {}
+    return profile
+
+
+def save_login_profile(profile: Dict[str, str]) -> None:
+    try:
+        (get_cache_dir() / LOGIN_PROFILE_FILE).write_text(json.dumps(profile, ensure_ascii=False), encoding="utf-8")
+    except Exception as e:
+        crawler_logger.debug(f"保存登入路徑失敗: {e}")
+
+
+class _DataBlob(ctypes.Structure):
+    _fields_ = [("cbData", ctypes.c_uint32), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+
+def _dpapi(protect: bool, data: bytes, entropy: bytes) -> Optional[bytes]:
+    """呼叫 Windows CryptProtectData / CryptUnprotectData（綁定目前的 Windows 使用者）；失敗時回傳 None"""
+    crypt32, kernel32 = ctypes.windll.crypt32, ctypes.windll.kernel32
+    kernel32.LocalFree.argtypes = [ctypes.c_void_p]
+    data_buf = ctypes.create_string_buffer(data, len(data))
+    entropy_buf = ctypes.create_string_buffer(entropy, len(entropy))
+    data_in = _DataBlob(len(data), ctypes.cast(data_buf, ctypes.POINTER(ctypes.c_char)))
+    entropy_in = _DataBlob(len(entropy), ctypes.cast(entropy_buf, ctypes.POINTER(ctypes.c_char)))
+    out = _DataBlob()
+    call = crypt32.CryptProtectData if protect else crypt32.CryptUnprotectData
+    if not call(ctypes.byref(data_in), None, ctypes.byref(entropy_in), None, None,
+                _CRYPTPROTECT_UI_FORBIDDEN, ctypes.byref(out)):
+        return None
+    try:
+        return ctypes.string_at(out.pbData, out.cbData)
+    finally:
+        kernel32.LocalFree(out.pbData)
+
+
+def _store_entropy(email: str, password: str) -> bytes:
+    return hashlib.sha256(email.strip().lower().encode("utf-8") + b"\0" + password.encode("utf-8")).digest()
+
+
+def encrypt_secret(plain: bytes, email: str, password: str) -> Optional[bytes]:
+    """以 DPAPI 加密；非 Windows 平台回傳 None（不保存）"""
+    if sys.platform != "win32":
+        return None
+    cipher = _dpapi(True, plain, _store_entropy(email, password))
+    return _STORE_MAGIC + cipher if cipher is not None else None
+
+
+def decrypt_secret(blob: bytes, email: str, password: str) -> Optional[bytes]:
+    if sys.platform != "win32" or not blob.startswith(_STORE_MAGIC):
+        return None
+    return _dpapi(False, blob[len(_STORE_MAGIC):], _store_entropy(email, password))
+
+
+def save_login_cookies(session: requests.Session, email: str, password: str) -> None:
+    cookies = [
+        {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+         "expires": c.expires, "secure": c.secure}
+        for c in session.cookies
+    ]
+    payload = json.dumps({"base_url": BASE_URL, "saved_at": time.time(), "cookies": cookies}).encode("utf-8")
+    try:
+        blob = encrypt_secret(payload, email, password)
+        if blob is None:
+            crawler_logger.debug("無法以 DPAPI 加密（非 Windows），不保存登入 cookies")
+            return
+        (get_cache_dir() / LOGIN_COOKIE_STORE_FILE).write_bytes(blob)
+    except Exception as e:
+        crawler_logger.debug(f"保存登入 cookies 失敗: {e}")
+
+
+def restore_saved_login(session: requests.Session, email: str, password: str) -> bool:
+    """載入保存的 cookies，並以一次 /admin 探測確認仍然有效"""
+    try:
+        blob = (CACHE_DIR / LOGIN_COOKIE_STORE_FILE).read_bytes()
+    except OSError:
+        return False
+    plain = decrypt_secret(blob, email, password)
+    if plain is None:
+        return False
+    try:
+        saved = json.loads(plain.decode("utf-8"))
+    except Exception:
+        return False
+    if saved.get("base_url") != BASE_URL:
+        return False
+
+    now = time.time()
+    for c in saved.get("cookies", []):
+        if c.get("expires") and c["expires"] < now:
+            continue
+        session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"),
+                            expires=c.get("expires"), secure=c.get("secure", False))
+    try:
+        if _probe_admin(session):
+            return True
+    except Exception as e:
+        crawler_logger.debug(f"驗證保存的登入狀態失敗: {e}")
+    session.cookies.clear()
+    return False
+
+# ---------------------- Response Decoding ----------------------
+# ESCC 頁面皆為 UTF-8；直接把 bytes 與已知編碼交給 lxml，避免 r.text 在未宣告 charset 時
+# 對整頁執行 charset_normalizer 偵測，也省去先 decode 成 str 再交給 BeautifulSoup 的複本
+HTML_ENCODING = "utf-8"
+Markup = Union[str, bytes]
+_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+def response_encoding(r: requests.Response) -> str:
+    """Content-Type 宣告的編碼；未宣告或無法辨識時視為 UTF-8"""
+    m = _CHARSET_RE.search(r.headers.get("Content-Type", ""))
+    if m:
+        try:
+            return codecs.lookup(m.group(1)).name
+        except LookupError:
+            pass
+    return codecs.lookup(HTML_ENCODING).name
+
+
+def response_markup(r: requests.Response) -> Markup:
+    """回傳給解析器的內容：UTF-8 或未宣告編碼時為原始 bytes，其他宣告的編碼才先解碼"""
+    encoding = response_encoding(r)
+    if encoding != codecs.lookup(HTML_ENCODING).name:
+        return r.content.decode(encoding, errors="replace")
+    return r.content
+
+
+def make_soup(html: Markup) -> BeautifulSoup:
+    if isinstance(html, bytes):
+        return BeautifulSoup(html, "lxml", from_encoding=HTML_ENCODING)
+    return BeautifulSoup(html, "lxml")
+
+
+# 填答結果頁（接觸方式、T16、問卷結果代碼）篇幅長、數量多，直接用 lxml 解析 bytes，
+# 不建立 BeautifulSoup 物件樹；以下輔助函式對應原本 select()/get_text(strip=True) 的行為
+_BORDERED_TABLES = etree.XPath(
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' table ')"
+    " and contains(concat(' ', normalize-space(@class), ' '), ' table-bordered ')]"
+)
+_TBODY_ROWS = etree.XPath(".//tbody//tr")
+_NON_TEXT_TAGS = {"script", "style", "template"}
+
+
+def parse_html_tree(html: Markup):
+    if isinstance(html, bytes):
+        if not html.strip():
+            return None
+        return etree.fromstring(html, etree.HTMLParser(encoding=HTML_ENCODING))
+    if not html.strip():
+        return None
+    return etree.fromstring(html, etree.HTMLParser())
+
+
+def bordered_tables(root) -> list:
+    return [] if root is None else _BORDERED_TABLES(root)
+
+
+def tbody_rows(table) -> list:
+    return _TBODY_ROWS(table)
+
+
+def node_text(el, sep: str = "") -> str:
+    """等同 BeautifulSoup 的 get_text(sep, strip=True)：略過註解與 script/style 內容"""
+    parts: List[str] = []
+
+    def walk(node):
+        if isinstance(node.tag, str) and node.tag not in _NON_TEXT_TAGS and node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(el)
+    return sep.join(p.strip() for p in parts if p.strip())
+
 # ---------------------- List Parsing ----------------------
-def parse_list_page_for_items(html: str):
-    soup = BeautifulSoup(html, "lxml")
+def parse_list_page_for_items(html: Markup):
+    soup = make_soup(html)
     items = []
     for tr in soup.select("table tbody tr"):
         tds = tr.find_all("td")
@@ -146,6 +1122,7 @@ def parse_list_page_for_items(html: str):
                 "sample_id": sample_id,
                 "interviewer_no": interviewer_no,
                 "interviewer_name": interviewer_name,
+                "row_hash": hashlib.sha1(tr.get_text("|", strip=True).encode("utf-8")).hexdigest()[:16],
             })
 
     max_page = detect_max_page_from_html(soup)
@@ -162,8 +1139,8 @@ def detect_max_page_from_html(soup: BeautifulSoup) -> int:
     return max_page
 
 # ---------------------- Visit Parsing ----------------------
-def parse_visits_from_visit_html(html: str) -> List[Dict[str, Optional[str]]]:
-    soup = BeautifulSoup(html, "lxml")
+def parse_visits_from_visit_html(html: Markup) -> List[Dict[str, Optional[str]]]:
+    soup = make_soup(html)
     table = soup.select_one("div.grid-table table.table")
     if not table:
         return []
@@ -206,146 +1183,193 @@ def parse_visits_from_visit_html(html: str) -> List[Dict[str, Optional[str]]]:
     return visits
 
 # ---------------------- Check Questionnaire Status ----------------------
-def check_questionnaire_result_code(html: str) -> str:
-    soup = BeautifulSoup(html, "lxml")
-    tables = soup.select("table.table.table-bordered")
+def check_questionnaire_result_code(html: Markup) -> str:
+    root = parse_html_tree(html)
+    tables = bordered_tables(root)
     
     if len(tables) < 1:
         return "未填寫"
     
     first_table = tables[0]
     
-    for tr in first_table.select("tbody tr"):
-        tds = tr.find_all(["th", "td"])
+    status = _find_result_code_status(tbody_rows(first_table))
+    return status if status is not None else "未填寫"
+
+
+def _find_result_code_status(rows) -> Optional[str]:
+    for tr in rows:
+        tds = list(tr.iter("th", "td"))
         if len(tds) < 2:
             continue
         
         for i in range(len(tds) - 1):
-            if tds[i].name == "th" and "結果代碼" in tds[i].get_text(strip=True):
-                code = tds[i + 1].get_text(strip=True)
+            if tds[i].tag == "th" and "結果代碼" in node_text(tds[i]):
+                code = node_text(tds[i + 1])
                 if code == "100":
                     return "已填寫"
                 else:
                     return "未填寫"
     
-    return "未填寫"
+    return None
 
 
-def check_questionnaires_status(session: requests.Session, work_id: str, project: int, wave: int) -> Dict[str, str]:
+def parse_record_links(html: Markup) -> Dict[str, str]:
+    """解析 /record 頁面，回傳訪視問卷、戶中抽樣、戶抽問卷、訪問記錄問卷的連結"""
+    soup = make_soup(html)
+    links: Dict[str, str] = {}
+    
+    for tr in soup.select("table tbody tr"):
+        tds = tr.find_all("td")
+        if len(tds) < 3:
+            continue
+        
+        title = tds[1].get_text(strip=True)
+        link = tds[2].select_one("a[href*='/form-result/view/']")
+        if not link:
+            continue
+        href = link.get("href")
+        
+        if "訪視問卷" in title:
+            links.setdefault("visit_survey", href)
+        
+        if "戶中抽樣" in title and "問卷" not in title:
+            links["sampling"] = href
+        elif "戶抽問卷" in title:
+            links["sampling_q"] = href
+        elif "訪問記錄問卷" in title or "訪問記錄" in title:
+            links["interview_record"] = href
+    
+    return links
+
+
+def note_fetch_failure(failures: Optional[list], url: str, reason) -> None:
+    """記錄抓取失敗的 URL 與原因；failures 為 None 時（單獨呼叫）不記錄"""
+    if failures is None:
+        return
+    if isinstance(reason, BaseException):
+        reason = f"{type(reason).__name__}: {reason}"
+    failures.append((url, str(reason)))
+
+
+def fetch_record_links(session: requests.Session, work_id: str, project: int, wave: int, failures: Optional[list] = None) -> Dict[str, str]:
+    record_url = urljoin(BASE_URL, EDIT_BASE_TMPL.format(project=project, wave=wave, work_id=work_id) + "/record")
+    
+    try:
+        r = session.get(record_url, timeout=TIMEOUT, allow_redirects=True)
+        if r.status_code != 200:
+            note_fetch_failure(failures, record_url, f"HTTP {r.status_code}")
+            return {}
+        return parse_record_links(response_markup(r))
+    except Exception as e:
+        crawler_logger.debug(f"獲取問卷清單失敗 WorkID={work_id}: {e}")
+        note_fetch_failure(failures, record_url, e)
+        return {}
+
+
+def fetch_questionnaire_statuses(session: requests.Session, links: Dict[str, str], work_id: str = "") -> Dict[str, str]:
     result = {
         "sampling": "未填寫",      # 戶中抽樣
         "sampling_q": "未填寫",    # 戶抽問卷
         "interview_record": "未填寫"  # 訪問記錄問卷
     }
     
-    record_url = urljoin(BASE_URL, EDIT_BASE_TMPL.format(project=project, wave=wave, work_id=work_id) + "/record")
+    for key in result:
+        if not links.get(key):
+            continue
+        result[key] = fetch_questionnaire_status(session, links[key], work_id, key)
     
-    try:
-        r = session.get(record_url, timeout=TIMEOUT, allow_redirects=True)
-        if r.status_code != 200:
-            return result
-        
-        soup = BeautifulSoup(r.text, "lxml")
-        
-        for tr in soup.select("table tbody tr"):
-            tds = tr.find_all("td")
-            if len(tds) < 3:
-                continue
-            
-            title = tds[1].get_text(strip=True)
-            
-            link = tds[2].select_one("a[href*='/form-result/view/']")
-            
-            if link:
-                questionnaire_url = urljoin(BASE_URL, link.get("href"))
-                
-                try:
-                    rq = session.get(questionnaire_url, timeout=TIMEOUT, allow_redirects=True)
-                    if rq.status_code == 200:
-                        html_content = rq.content.decode('utf-8', errors='replace')
-                        status = check_questionnaire_result_code(html_content)
-                        
-                        if "戶中抽樣" in title and "問卷" not in title:
-                            result["sampling"] = status
-                        elif "戶抽問卷" in title:
-                            result["sampling_q"] = status
-                        elif "訪問記錄問卷" in title or "訪問記錄" in title:
-                            result["interview_record"] = status
-                except Exception as e:
-                    crawler_logger.debug(f"獲取問卷頁面失敗 {title}: {e}")
-        
-        return result
+    return result
+
+
+def fetch_questionnaire_status(session: requests.Session, url: str, work_id: str = "", key: str = "", failures: Optional[list] = None) -> str:
+    questionnaire_url = urljoin(BASE_URL, url)
+    try:
+        if STREAM_FORM_PAGES:
+            streamed = stream_form_result(session, questionnaire_url, FORM_RESULT_CODE)
+            if streamed is not None:
+                return streamed
+        rq = session.get(questionnaire_url, timeout=TIMEOUT, allow_redirects=True)
+        if rq.status_code == 200:
+            return parse_form_result(session, FORM_RESULT_CODE, rq)
+        note_fetch_failure(failures, questionnaire_url, f"HTTP {rq.status_code}")
     except Exception as e:
-        crawler_logger.debug(f"檢查問卷狀態失敗 WorkID={work_id}: {e}")
-        return result
+        crawler_logger.debug(f"獲取問卷頁面失敗 WorkID={work_id} {key}: {e}")
+        note_fetch_failure(failures, questionnaire_url, e)
+    return "未填寫"
+
+
+def check_questionnaires_status(session: requests.Session, work_id: str, project: int, wave: int) -> Dict[str, str]:
+    links = fetch_record_links(session, work_id, project, wave)
+    return fetch_questionnaire_statuses(session, links, work_id)
 
 
-def parse_t16_from_visit_survey(html: str, work_id: str = "", debug: bool = False) -> str:
-    soup = BeautifulSoup(html, "lxml")
-    tables = soup.select("table.table.table-bordered")
+def parse_t16_from_visit_survey(html: Markup, work_id: str = "", debug: bool = False) -> str:
+    root = parse_html_tree(html)
+    tables = bordered_tables(root)
     
     if len(tables) < 2:
         return "未填寫"
     
     target_table = tables[1]
     
-    for tr in target_table.select("tbody tr"):
-        tds = tr.find_all("td")
+    answer = _find_t16_answer(tbody_rows(target_table))
+    return answer if answer is not None else "未填寫"
+
+
+def _find_t16_answer(rows) -> Optional[str]:
+    for tr in rows:
+        tds = list(tr.iter("td"))
         if len(tds) < 4:
             continue
         
-        first_col = tds[0].get_text(" ", strip=True)
+        first_col = node_text(tds[0], " ")
         
         if "T16" in first_col:
-            answer_cell = tds[2]
-            
-            divs = answer_cell.select("div")
-            if divs:
-                answers = [div.get_text(strip=True) for div in divs if div.get_text(strip=True)]
-                if answers:
-                    return "; ".join(answers)
-            
-            answer_text = answer_cell.get_text(strip=True)
-            if answer_text:
-                return answer_text
-            
-            return "未填寫"
+            return t16_answer_from_cell(tds[2])
+    
+    return None
+
+
+def t16_answer_from_cell(answer_cell) -> str:
+    divs = [d for d in answer_cell.iter("div") if d is not answer_cell]
+    if divs:
+        answers = [node_text(div) for div in divs if node_text(div)]
+        if answers:
+            return "; ".join(answers)
+    
+    answer_text = node_text(answer_cell)
+    if answer_text:
+        return answer_text
     
     return "未填寫"
 
 
 # ---------------------- Get Visit Survey URL ----------------------
 def get_visit_survey_url(session: requests.Session, work_id: str, project: int, wave: int) -> Optional[str]:
-    record_url = urljoin(BASE_URL, EDIT_BASE_TMPL.format(project=project, wave=wave, work_id=work_id) + "/record")
-    
+    return fetch_record_links(session, work_id, project, wave).get("visit_survey")
+
+
+def fetch_t16_answer(session: requests.Session, visit_survey_url: str, work_id: str = "", debug: bool = False, failures: Optional[list] = None) -> str:
+    url = urljoin(BASE_URL, visit_survey_url)
     try:
-        r = session.get(record_url, timeout=TIMEOUT, allow_redirects=True)
-        if r.status_code != 200:
-            return None
-        
-        soup = BeautifulSoup(r.text, "lxml")
-        
-        for tr in soup.select("table tbody tr"):
-            tds = tr.find_all("td")
-            if len(tds) < 3:
-                continue
-            
-            title = tds[1].get_text(strip=True)
-            if "TEDS2025_訪視問卷" in title or "訪視問卷" in title:
-                link = tds[2].select_one("a[href*='/form-result/view/']")
-                if link:
-                    return link.get("href")
-        
-        return None
+        if STREAM_FORM_PAGES:
+            streamed = stream_form_result(session, url, FORM_T16)
+            if streamed is not None:
+                return streamed
+        rv_visit = session.get(url, timeout=TIMEOUT, allow_redirects=True)
+        if rv_visit.status_code == 200:
+            return parse_form_result(session, FORM_T16, rv_visit)
+        note_fetch_failure(failures, url, f"HTTP {rv_visit.status_code}")
     except Exception as e:
-        crawler_logger.debug(f"獲取訪視問卷 URL 失敗 WorkID={work_id}: {e}")
-        return None
+        crawler_logger.debug(f"獲取 T16 失敗 WorkID={work_id}: {e}")
+        note_fetch_failure(failures, url, e)
+    return "未填寫"
 
 
-def parse_contact_from_view(html: str, work_id: str = "", debug: bool = False) -> Tuple[str, str]:
-    soup = BeautifulSoup(html, "lxml")
+def parse_contact_from_view(html: Markup, work_id: str = "", debug: bool = False) -> Tuple[str, str]:
+    root = parse_html_tree(html)
     
-    tables = soup.select("table.table.table-bordered")
+    tables = bordered_tables(root)
     
     target_table = None
     if len(tables) >= 2:
@@ -353,72 +1377,415 @@ def parse_contact_from_view(html: str, work_id: str = "", debug: bool = False) -
     elif len(tables) == 1:
         target_table = tables[0]
     
-    if not target_table:
+    if target_table is None:
         return ("未填寫", "")
 
-    for idx, tr in enumerate(target_table.select("tbody tr")):
-        tds = tr.find_all("td")
+    contact = _find_t03_contact(tbody_rows(target_table))
+    return contact if contact is not None else ("未填寫", "")
+
+
+def _find_t03_contact(rows) -> Optional[Tuple[str, str]]:
+    for tr in rows:
+        tds = list(tr.iter("td"))
         if len(tds) < 4:
             continue
         
-        first_col = tds[0].get_text(" ", strip=True)
+        first_col = node_text(tds[0], " ")
         
         if "T03" in first_col:
-            answer = tds[2].get_text(strip=True)
-            answered_at = tds[3].get_text(strip=True)
+            answer = node_text(tds[2])
+            answered_at = node_text(tds[3])
             
             if not answer:
                 answer = "未填寫"
             
             return (answer, answered_at)
 
-    return ("未填寫", "")
-
-# ---------------------- Process Single Item (v2 with debug_work_ids) ----------------------
-def process_single_item_v2(
-    session: requests.Session, 
-    item: Dict, 
-    project: int, 
-    wave: int, 
-    item_idx: int, 
-    total: int, 
-    debug_work_ids: set,
-    update_progress_callback
-) -> List[Dict[str, str]]:
-    """處理單個樣本（v2 版本）"""
-    work_id = item["work_id"]
-    sample_id = item["sample_id"]
-    interviewer_no = item["interviewer_no"]
-    interviewer_name = item["interviewer_name"]
-    
-    is_debug = work_id in debug_work_ids
-    
-    rows = []
-    
-    update_progress_callback(item_idx, total, f"處理樣本: {sample_id} ({work_id})")
+    return None
 
+def fetch_visit_contact(session: requests.Session, view_url_abs: str, work_id: str = "", debug: bool = False, failures: Optional[list] = None) -> Tuple[str, str, str]:
+    """抓取訪次的 T03 接觸方式，回傳 (答案, 作答時間, HasFill)"""
     try:
-        record_url = urljoin(BASE_URL, EDIT_BASE_TMPL.format(project=project, wave=wave, work_id=work_id) + "/visit")
-        r = session.get(record_url, timeout=TIMEOUT, allow_redirects=True)
+        if STREAM_FORM_PAGES:
+            streamed = stream_form_result(session, view_url_abs, FORM_CONTACT)
+            if streamed is not None:
+                ans, ts = streamed
+                return ans, ts, ("1" if ans != "未填寫" else "0")
+        rv = session.get(view_url_abs, timeout=TIMEOUT, allow_redirects=True)
         
+        if rv.status_code == 200:
+            ans, ts = parse_form_result(session, FORM_CONTACT, rv)
+            return ans, ts, ("1" if ans != "未填寫" else "0")
+        note_fetch_failure(failures, view_url_abs, f"HTTP {rv.status_code}")
+        return "未填寫", "", "1"
+    except Exception as e:
+        crawler_logger.error(f"View fetch error for WorkID={work_id}: {e}")
+        note_fetch_failure(failures, view_url_abs, e)
+        return "未填寫", "", "0"
+
+
+# ---------------------- Streaming Form Results ----------------------
+# 填答結果頁的目標列（結果代碼、T16、T03）通常在頁面前段，後面是大量其他題目。
+# 串流模式以 lxml 的增量解析器逐塊餵入回應內容，目標列的 </tr> 一出現就停止下載並關閉連線；
+# 無法提早判定時（例如只有一個表格、巢狀表格）讀到結尾後改用與一般模式相同的完整解析。
+# 注意：提早關閉的連線無法回到連線池重用，因此僅在頁面遠大於握手成本時才值得開啟。
+FORM_RESULT_CODE = "result_code"
+FORM_T16 = "t16"
+FORM_CONTACT = "contact"
+
+
+class FormResultScanner:
+    """增量解析填答結果頁；feed() 回傳 True 表示結果已確定，可停止下載"""
+
+    # 各頁面類型：目標表格的索引、在單列/整個表格中找答案的函式、找不到時的預設值、完整解析函式
+    TARGETS = {
+        FORM_RESULT_CODE: (0, _find_result_code_status, "未填寫", check_questionnaire_result_code),
+        FORM_T16: (1, _find_t16_answer, "未填寫", parse_t16_from_visit_survey),
+        FORM_CONTACT: (1, _find_t03_contact, ("未填寫", ""), parse_contact_from_view),
+    }
+
+    def __init__(self, kind: str, encoding: str = HTML_ENCODING):
+        self.target_index, self.find, self.default, self.parse_full = self.TARGETS[kind]
+        self.parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding)
+        self.encoding = encoding
+        self.chunks: List[bytes] = []
+        self.table_index: Dict = {}
+        self.result = None
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        self.chunks.append(chunk)
+        self.parser.feed(chunk)
+        for event, el in self.parser.read_events():
+            if el.tag != "table" and el.tag != "tr":
+                continue
+            if event == "start":
+                if el.tag == "table" and _is_bordered_table(el):
+                    self.table_index[el] = len(self.table_index)
+                continue
+            if el.tag == "tr":
+                found = self._scan_row(el)
+            elif self.table_index.get(el) == self.target_index:
+                # 目標表格已完整：依一般模式的規則在整個表格中找答案
+                found = self.find(tbody_rows(el))
+                if found is None:
+                    found = self.default
+            else:
+                continue
+            if found is not None:
+                self.result = found
+                self.done = True
+                return True
+        return False
+
+    def _scan_row(self, tr):
+        # 只有屬於目標表格 tbody、且不在其他 tr 內的列才能立即判定（保持文件順序上的「第一個符合列」）
+        in_target = False
+        seen_tbody = False
+        for anc in tr.iterancestors():
+            if anc.tag == "tr":
+                return None
+            if anc.tag == "tbody":
+                seen_tbody = True
+            elif anc.tag == "table" and seen_tbody and self.table_index.get(anc) == self.target_index:
+                in_target = True
+        if not in_target:
+            return None
+        return self.find([tr])
+
+    def body(self) -> bytes:
+        return b"".join(self.chunks)
+
+    def finish(self):
+        """讀到結尾仍未判定時，以完整內容走一般解析"""
+        if self.done:
+            return self.result
+        markup = self.body()
+        if self.encoding != codecs.lookup(HTML_ENCODING).name:
+            markup = markup.decode(self.encoding, errors="replace")
+        self.result = self.parse_full(markup)
+        self.done = True
+        return self.result
+
+
+def _is_bordered_table(el) -> bool:
+    classes = (el.get("class") or "").split()
+    return "table" in classes and "table-bordered" in classes
+
+
+def stream_form_result(session: requests.Session, url: str, kind: str):
+    """以串流方式抓取填答結果頁；回傳 None 代表應改用一般請求（非 200 或遇到登入頁）"""
+    r = session.get(url, timeout=TIMEOUT, allow_redirects=True, stream=True)
+    try:
         if r.status_code != 200:
-            crawler_logger.warning(f"[{item_idx}/{total}] WorkID={work_id} status={r.status_code}")
-            return rows
-        
-        visits = parse_visits_from_visit_html(r.text)
-        
-        if not visits:
-            rows.append({
-                "SampleID": sample_id,
-                "WorkID": work_id,
+            return None
+        scanner = FormResultScanner(kind, response_encoding(r))
+        for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+            if scanner.feed(chunk):
+                return scanner.result
+        if _PASSWORD_INPUT_RE.search(scanner.body()):
+            # 200 回應的登入頁交給一般請求處理（EsccSession 會重新登入並重試）
+            return None
+        return scanner.finish()
+    finally:
+        r.close()
+
+
+# ---------------------- Parse Result Cache ----------------------
+# 重新下載的填答結果頁常與上次完全相同（已結案樣本、已完成問卷）。以回應內容的雜湊加上解析器版本為鍵，
+# 保存解析出的小結果，命中時完全略過解析。解析器版本取自解析函式（及其呼叫的本模組函式、常數）的
+# code object，打包成執行檔後沒有原始碼也能計算；任何解析邏輯變更都會讓舊的快取項目自動失效。
+PARSE_CACHE_FILE = "parse_cache.json"
+PARSE_CACHE_MAX_ENTRIES = 200_000
+
+FORM_PARSERS = {
+    FORM_RESULT_CODE: check_questionnaire_result_code,
+    FORM_T16: parse_t16_from_visit_survey,
+    FORM_CONTACT: parse_contact_from_view,
+}
+
+
+def code_fingerprint(func) -> str:
+    """函式與其引用的本模組函式、XPath、常數的 bytecode 指紋"""
+    h = hashlib.blake2b(digest_size=8)
+    module = sys.modules[func.__module__].__dict__
+    seen: Set[int] = set()
+
+    def stable_repr(value) -> str:
+        # set/frozenset 的 repr 順序受字串雜湊隨機化影響，排序後才能跨次執行比較
+        if isinstance(value, (set, frozenset)):
+            return repr(sorted(repr(v) for v in value))
+        return repr(value)
+
+    def feed_code(code) -> None:
+        h.update(code.co_code)
+        h.update(repr(code.co_names).encode("utf-8"))
+        for const in code.co_consts:
+            if hasattr(const, "co_code"):
+                feed_code(const)
+            else:
+                h.update(stable_repr(const).encode("utf-8"))
+        for name in code.co_names:
+            feed_global(name, module.get(name))
+
+    def feed_global(name: str, value) -> None:
+        if value is None or id(value) in seen:
+            return
+        seen.add(id(value))
+        if callable(value) and getattr(value, "__module__", None) == func.__module__ and hasattr(value, "__code__"):
+            feed_code(value.__code__)
+        elif isinstance(value, etree.XPath):
+            h.update(f"{name}={value.path}".encode("utf-8"))
+        elif isinstance(value, (str, int, float, bytes, tuple, set, frozenset)):
+            h.update(f"{name}={stable_repr(value)}".encode("utf-8"))
+
+    seen.add(id(func))
+    feed_code(func.__code__)
+    return h.hexdigest()
+
+
+class ParseCache:
+    """跨執行保存的解析結果快取：鍵為「頁面類型:解析器指紋:內容雜湊」"""
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = PARSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, object]" = OrderedDict()
+        self.versions = {kind: code_fingerprint(parse) for kind, parse in FORM_PARSERS.items()}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "ParseCache":
+        cache = cls(path or get_cache_dir() / PARSE_CACHE_FILE)
+        try:
+            stored = json.loads(cache.path.read_text(encoding="utf-8"))
+        except Exception:
+            return cache
+        # 解析器版本不同的項目直接捨棄
+        prefixes = tuple(f"{kind}:{version}:" for kind, version in cache.versions.items())
+        for key, value in stored.items():
+            if key.startswith(prefixes):
+                cache.entries[key] = tuple(value) if isinstance(value, list) else value
+        return cache
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self.lock:
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            data = json.dumps(self.entries, ensure_ascii=False)
+        try:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            crawler_logger.debug(f"保存解析快取失敗: {e}")
+
+    def key(self, kind: str, r: requests.Response) -> str:
+        digest = hashlib.blake2b(r.content or b"", digest_size=16)
+        digest.update(response_encoding(r).encode("ascii"))
+        return f"{kind}:{self.versions[kind]}:{digest.hexdigest()}"
+
+    def parse(self, kind: str, r: requests.Response):
+        key = self.key(kind, r)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        result = FORM_PARSERS[kind](response_markup(r))
+        with self.lock:
+            self.entries[key] = result
+        return result
+
+
+def parse_form_result(session: requests.Session, kind: str, r: requests.Response):
+    """解析填答結果頁；session 帶有 ParseCache 時先查快取"""
+    cache = getattr(session, "parse_cache", None)
+    if cache is None:
+        return FORM_PARSERS[kind](response_markup(r))
+    return cache.parse(kind, r)
+
+
+# ---------------------- Process Single Item (v2 with debug_work_ids) ----------------------
+class SampleJob:
+    """把單一樣本拆成彼此獨立的子請求（/visit、/record、T16、各問卷、各訪次接觸方式）。
+    start()/complete() 回傳接下來可執行的步驟 (key, callable)；由呼叫端決定要同步執行或交給共用的執行緒池，
+    步驟本身不會等待其他步驟，因此放在同一個執行緒池中也不會互相卡住。"""
+
+    def __init__(
+        self,
+        session: requests.Session,
+        item: Dict,
+        project: int,
+        wave: int,
+        label: str = "",
+        debug: bool = False,
+        fetch_mode: str = FETCH_MODE,
+    ):
+        # 同一樣本的子請求共用這個 session（cookie jar 有鎖，連線池大小為 MAX_WORKERS * 2）
+        self.session = session
+        self.item = item
+        self.project = project
+        self.wave = wave
+        self.label = label
+        self.debug = debug
+        self.fetch_mode = fetch_mode
+        self.work_id = item["work_id"]
+        self.record_url = urljoin(BASE_URL, EDIT_BASE_TMPL.format(project=project, wave=wave, work_id=self.work_id) + "/visit")
+        self.visits: Optional[List[Dict[str, Optional[str]]]] = []
+        self.plan: Dict[str, bool] = {}
+        self.t16_answer: Optional[str] = None
+        self.questionnaire_status = {"sampling": "未填寫", "sampling_q": "未填寫", "interview_record": "未填寫"}
+        self.contacts: Dict[int, Tuple[str, str, str]] = {}
+        self.contact_scheduled: Set[int] = set()
+        self.pending = 0
+        self.failed = False
+        self.failures: List[Tuple[str, str]] = []  # (URL, 原因)；步驟在不同執行緒 append
+        self.attempts = 1
+        self.rows: List[Dict[str, str]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.pending == 0
+
+    def start(self) -> list:
+        return self._schedule([(("visit",), self._fetch_visits)])
+
+    def complete(self, key: tuple, result=None, error: Optional[BaseException] = None) -> list:
+        """回報一個步驟的結果，回傳因此可以開始的新步驟；全部完成時組出 rows"""
+        self.pending -= 1
+        steps = []
+        if error is not None:
+            if not self.failed:
+                crawler_logger.error(f"{self.label} WorkID={self.work_id} error: {error}")
+            self.failed = True
+            note_fetch_failure(self.failures, self.record_url if key == ("visit",) else "", error)
+        elif not self.failed:
+            steps = self._on_result(key, result)
+        steps = self._schedule(steps)
+        if self.done and not self.failed:
+            self.rows = self._assemble_rows()
+        return steps
+
+    def _schedule(self, steps: list) -> list:
+        self.pending += len(steps)
+        return steps
+
+    def _fetch_visits(self):
+        r = self.session.get(self.record_url, timeout=TIMEOUT, allow_redirects=True)
+        if r.status_code != 200:
+            crawler_logger.warning(f"{self.label} WorkID={self.work_id} status={r.status_code}")
+            note_fetch_failure(self.failures, self.record_url, f"HTTP {r.status_code}")
+            return None
+        return parse_visits_from_visit_html(response_markup(r))
+
+    def _on_result(self, key: tuple, result) -> list:
+        kind = key[0]
+        if kind == "visit":
+            self.visits = result
+            if not result:
+                return []
+            self.plan = plan_sample_fetches(self.visits, self.fetch_mode)
+            steps = [(("record",), lambda: fetch_record_links(self.session, self.work_id, self.project, self.wave, self.failures))]
+            return steps + self._contact_steps(lambda v: self.plan["all_contacts"] or contact_required_by_code(v.get("code", "")))
+        if kind == "record":
+            links = result
+            steps = []
+            if links.get("visit_survey"):
+                steps.append((("t16",), lambda: fetch_t16_answer(self.session, links["visit_survey"], work_id=self.work_id, debug=self.debug, failures=self.failures)))
+            else:
+                steps.extend(self._on_result(("t16",), "未填寫"))
+            if self.plan["questionnaires"]:
+                for q in self.questionnaire_status:
+                    if links.get(q):
+                        steps.append((("questionnaire", q), lambda q=q: fetch_questionnaire_status(self.session, links[q], self.work_id, q, self.failures)))
+            else:
+                self.questionnaire_status = {q: FIELD_NOT_FETCHED for q in self.questionnaire_status}
+            return steps
+        if kind == "t16":
+            # 訪視問卷 (T16) 每個樣本只有一份，所有訪次共用
+            self.t16_answer = result
+            return self._contact_steps(lambda v: contact_needed(v.get("code", ""), self.t16_answer))
+        if kind == "questionnaire":
+            self.questionnaire_status[key[1]] = result
+        elif kind == "contact":
+            self.contacts[key[1]] = result
+        return []
+
+    def _contact_steps(self, needed) -> list:
+        steps = []
+        for i, v in enumerate(self.visits):
+            if i in self.contact_scheduled or not v.get("view_url") or not needed(v):
+                continue
+            self.contact_scheduled.add(i)
+            view_url_abs = urljoin(BASE_URL, v["view_url"])
+            steps.append((("contact", i), lambda u=view_url_abs: fetch_visit_contact(self.session, u, work_id=self.work_id, debug=self.debug, failures=self.failures)))
+        return steps
+
+    def _assemble_rows(self) -> List[Dict[str, str]]:
+        item = self.item
+        base = {
+            "SampleID": item["sample_id"],
+            "WorkID": self.work_id,
+            "RecordURL": self.record_url,
+            "InterviewerNo": item["interviewer_no"],
+            "InterviewerName": item["interviewer_name"],
+        }
+        if self.visits is None:
+            return []
+        if not self.visits:
+            return [{
+                **base,
                 "Date": "",
                 "Session": "無訪次",
                 "ResultCode": "",
-                "RecordURL": record_url,
                 "ViewURL": "",
                 "LogsURL": "",
-                "InterviewerNo": interviewer_no,
-                "InterviewerName": interviewer_name,
                 "ContactMethod": "",
                 "ContactAnsweredAt": "",
                 "T16Answer": "",
@@ -426,192 +1793,1264 @@ def process_single_item_v2(
                 "SamplingQ": "",
                 "InterviewRecord": "",
                 "HasFill": "0",
-            })
-            return rows
+            }]
         
-        for v in visits:
+        rows = []
+        for i, v in enumerate(self.visits):
             contact_answer = "未填寫"
             contact_time = ""
-            t16_answer = "未填寫"
             has_fill = "0"
             view_url_abs = urljoin(BASE_URL, v["view_url"]) if v.get("view_url") else ""
             
             if view_url_abs:
                 has_fill = "1"
-                try:
-                    rv = session.get(view_url_abs, timeout=TIMEOUT, allow_redirects=True)
-                    
-                    if rv.status_code == 200:
-                        try:
-                            html_content = rv.content.decode('utf-8', errors='replace')
-                        except Exception:
-                            html_content = rv.text
-                        
-                        ans, ts = parse_contact_from_view(html_content, work_id=work_id, debug=is_debug)
-                        contact_answer = ans
-                        contact_time = ts
-                        
-                        if ans != "未填寫":
-                            has_fill = "1"
-                        else:
-                            has_fill = "0"
-                except Exception as e:
-                    crawler_logger.error(f"View fetch error for WorkID={work_id}: {e}")
-                    contact_answer = "未填寫"
-                    has_fill = "0"
-            elif v.get("log_url"):
-                has_fill = "0"
-            
-            try:
-                visit_survey_url = get_visit_survey_url(session, work_id, project, wave)
-                if visit_survey_url:
-                    visit_url_abs = urljoin(BASE_URL, visit_survey_url)
-                    rv_visit = session.get(visit_url_abs, timeout=TIMEOUT, allow_redirects=True)
-                    if rv_visit.status_code == 200:
-                        visit_html = rv_visit.content.decode('utf-8', errors='replace')
-                        t16_answer = parse_t16_from_visit_survey(visit_html, work_id=work_id, debug=is_debug)
-            except Exception as e:
-                crawler_logger.debug(f"獲取 T16 失敗 WorkID={work_id}: {e}")
-            
-            questionnaire_status = {"sampling": "未填寫", "sampling_q": "未填寫", "interview_record": "未填寫"}
+                if i in self.contacts:
+                    contact_answer, contact_time, has_fill = self.contacts[i]
+                else:
+                    contact_answer = FIELD_NOT_FETCHED
             
             rows.append({
-                "SampleID": sample_id,
-                "WorkID": work_id,
+                **base,
                 "Date": v.get("date", ""),
                 "Session": v.get("session", ""),
                 "ResultCode": v.get("code", ""),
-                "RecordURL": record_url,
                 "ViewURL": view_url_abs,
                 "LogsURL": urljoin(BASE_URL, v["log_url"]) if v.get("log_url") else "",
-                "InterviewerNo": interviewer_no,
-                "InterviewerName": interviewer_name,
                 "ContactMethod": contact_answer,
                 "ContactAnsweredAt": contact_time,
-                "T16Answer": t16_answer,
-                "Sampling": questionnaire_status["sampling"],
-                "SamplingQ": questionnaire_status["sampling_q"],
-                "InterviewRecord": questionnaire_status["interview_record"],
+                "T16Answer": self.t16_answer,
+                "Sampling": self.questionnaire_status["sampling"],
+                "SamplingQ": self.questionnaire_status["sampling_q"],
+                "InterviewRecord": self.questionnaire_status["interview_record"],
                 "HasFill": has_fill,
             })
-        
+        return rows
+
+
+def run_sample_job(job: SampleJob, on_step=None) -> List[Dict[str, str]]:
+    """在目前執行緒依序執行樣本的所有步驟；on_step 在每一步完成後呼叫，回傳 False 時不再執行剩餘步驟"""
+    steps = deque(job.start())
+    while steps:
+        key, fn = steps.popleft()
         try:
-            questionnaire_status = check_questionnaires_status(session, work_id, project, wave)
-            for row in rows:
-                if row["WorkID"] == work_id:
-                    row["Sampling"] = questionnaire_status["sampling"]
-                    row["SamplingQ"] = questionnaire_status["sampling_q"]
-                    row["InterviewRecord"] = questionnaire_status["interview_record"]
+            result, error = fn(), None
         except Exception as e:
-            crawler_logger.debug(f"檢查問卷狀態失敗 WorkID={work_id}: {e}")
-    
+            result, error = None, e
+        steps.extend(job.complete(key, result, error))
+        if on_step is not None and not on_step():
+            break
+    return job.rows
+
+
+def process_single_item_v2(
+    session: requests.Session, 
+    item: Dict, 
+    project: int, 
+    wave: int, 
+    item_idx: int, 
+    total: int, 
+    debug_work_ids: set,
+    update_progress_callback,
+    fetch_mode: str = FETCH_MODE,
+) -> List[Dict[str, str]]:
+    """處理單個樣本（v2 版本）；fetch_mode 為 rules 時只抓取檢查規則會用到的頁面"""
+    update_progress_callback(item_idx, total, f"處理樣本: {item['sample_id']} ({item['work_id']})")
+    job = SampleJob(
+        session, item, project, wave,
+        label=f"[{item_idx}/{total}]",
+        debug=item["work_id"] in debug_work_ids,
+        fetch_mode=fetch_mode,
+    )
+    return run_sample_job(job)
+
+
+# ---------------------- Crawl Scheduling ----------------------
+LIST_SNAPSHOT_FILE = "list_snapshot.json"
+PARTIAL_ISSUES_FILE = "partial_issues.csv"
+PARTIAL_REPORT_BATCH = 25
+PARTIAL_REPORT_INTERVAL = 5.0
+
+# 優先順序權重：清單列有變動（含新樣本）、上次訪次較多、訪員歷史違規數較高者先爬
+PRIORITY_WEIGHT_CHANGED = 3.0
+PRIORITY_WEIGHT_VISITS = 2.0
+PRIORITY_WEIGHT_INTERVIEWER = 2.0
+PRIORITY_HIGH_THRESHOLD = 3.0
+
+
+def load_list_snapshot(output_dir: Path) -> Dict[str, str]:
+    """讀取上次執行時的清單快照 {WorkID: 清單列雜湊}"""
+    try:
+        data = json.loads((output_dir / LIST_SNAPSHOT_FILE).read_text(encoding="utf-8"))
+        return data.get("rows", {}) if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_list_snapshot(items: List[Dict], output_dir: Path) -> None:
+    data = {"saved_at": time.time(), "rows": {it["work_id"]: it.get("row_hash", "") for it in items}}
+    try:
+        (output_dir / LIST_SNAPSHOT_FILE).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
     except Exception as e:
-        crawler_logger.error(f"[{item_idx}/{total}] WorkID={work_id} error: {e}")
-    
-    return rows
+        crawler_logger.warning(f"保存清單快照失敗: {e}")
+
+
+def _load_previous_visit_counts(output_dir: Path) -> Dict[str, int]:
+    try:
+        prev = pd.read_csv(output_dir / "visit_records.csv", dtype=str, encoding="utf-8-sig",
+                           na_filter=False, usecols=["WorkID", "Session"])
+    except Exception:
+        return {}
+    prev = prev[prev["Session"] != "無訪次"]
+    return prev.groupby("WorkID").size().to_dict()
+
+
+def _load_interviewer_violations(output_dir: Path) -> Dict[str, int]:
+    try:
+        summary = pd.read_csv(output_dir / "check_summary_by_interviewer.csv", dtype=str,
+                              encoding="utf-8-sig", na_filter=False)
+        return {name: int(n) for name, n in zip(summary["訪員姓名"], summary["違規總數"]) if str(n).isdigit()}
+    except Exception:
+        return {}
+
+
+def prioritize_items(items: List[Dict], output_dir: Path) -> List[Dict]:
+    """依上次執行結果估計各樣本出問題的可能性，回傳由高到低排序的清單（同分維持清單順序）"""
+    snapshot = load_list_snapshot(output_dir)
+    visit_counts = _load_previous_visit_counts(output_dir)
+    violations = _load_interviewer_violations(output_dir)
+    max_visits = max(visit_counts.values(), default=0) or 1
+    max_violations = max(violations.values(), default=0) or 1
+
+    for it in items:
+        changed = snapshot.get(it["work_id"]) != it.get("row_hash")
+        score = PRIORITY_WEIGHT_CHANGED if changed else 0.0
+        score += PRIORITY_WEIGHT_VISITS * visit_counts.get(it["work_id"], 0) / max_visits
+        score += PRIORITY_WEIGHT_INTERVIEWER * violations.get(it["interviewer_name"], 0) / max_violations
+        it["priority"] = round(score, 3)
+
+    ordered = sorted(items, key=lambda it: -it["priority"])
+    high = sum(1 for it in ordered if it["priority"] >= PRIORITY_HIGH_THRESHOLD)
+    crawler_logger.info(f"優先排程：{high} 筆高優先樣本（清單變動或高風險）將先處理")
+    return ordered
+
+
+class PartialIssueReporter:
+    """樣本完成後分批執行檢查，將問題逐步附加到 partial_issues.csv"""
+
+    def __init__(self, output_dir: Path, holidays_path: str, batch_size: int = PARTIAL_REPORT_BATCH):
+        self.path = output_dir / PARTIAL_ISSUES_FILE
+        self.holidays = load_holidays(holidays_path)
+        self.batch_size = batch_size
+        self.pending: List[Dict[str, str]] = []
+        self.pending_samples = 0
+        self.pending_high = False
+        self.last_flush = 0.0
+        self.total_issues = 0
+        self.header_written = False
+        if self.path.exists():
+            self.path.unlink()
+
+    def add(self, rows: List[Dict[str, str]], high_priority: bool = False) -> None:
+        if not rows:
+            return
+        self.pending.extend(rows)
+        self.pending_samples += 1
+        self.pending_high = self.pending_high or high_priority
+        # 高優先樣本最多等待 PARTIAL_REPORT_INTERVAL 秒就輸出，讓輔導員能最早看到風險最高的樣本
+        due = self.pending_high and time.monotonic() - self.last_flush >= PARTIAL_REPORT_INTERVAL
+        if due or self.pending_samples >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        try:
+            df = prepare_check_frame(pd.DataFrame(self.pending).fillna(""), self.holidays)
+            issues = collect_issues(df)
+        except Exception as e:
+            crawler_logger.warning(f"產生暫時問題清單失敗: {e}")
+            issues = []
+        self.pending = []
+        self.pending_samples = 0
+        self.pending_high = False
+        self.last_flush = time.monotonic()
+        if not issues:
+            return
+
+        issues_df = pd.DataFrame(issues)[["訪員姓名", "樣本編號", "日期", "結果代碼", "問題描述", "檢查類別"]]
+        issues_df.to_csv(self.path, mode="a", index=False, header=not self.header_written,
+                         encoding="utf-8" if self.header_written else "utf-8-sig")
+        self.header_written = True
+        self.total_issues += len(issues_df)
+        crawler_logger.info(f"暫時問題清單已更新：{self.path.name} (累計 {self.total_issues} 筆)")
+
+
+# ---------------------- Row Sink ----------------------
+VISIT_FIELDNAMES = [
+    "SampleID", "WorkID", "Date", "Session", "ResultCode", "RecordURL",
+    "ViewURL", "LogsURL", "InterviewerNo", "InterviewerName",
+    "ContactMethod", "ContactAnsweredAt", "T16Answer",
+    "Sampling", "SamplingQ", "InterviewRecord", "HasFill",
+]
+ROW_SINK_MEMORY_LIMIT = 32 * 1024 * 1024
+
+
+class RowSink:
+    """收集爬取結果的訪次列；估計用量超過 memory_limit 時整批寫到暫存 CSV，迭代時依序讀回"""
+
+    def __init__(self, output_dir: Path, memory_limit: int = ROW_SINK_MEMORY_LIMIT):
+        self.output_dir = output_dir
+        self.memory_limit = memory_limit
+        self.buffer: List[Dict[str, str]] = []
+        self.buffer_bytes = 0
+        self.spill_files: List[Path] = []
+        self.spill_dir: Optional[Path] = None
+        self.count = 0
+        self._finalizer = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        for path in self.spill_files:
+            with path.open("r", newline="", encoding="utf-8") as f:
+                yield from csv.DictReader(f)
+        yield from self.buffer
+
+    def extend(self, rows: List[Dict[str, str]]) -> None:
+        for row in rows:
+            self.buffer.append(row)
+            # 粗估：字串內容 + 每欄位的 dict/str 物件開銷
+            self.buffer_bytes += sum(len(v) for v in row.values()) * 2 + 80 * len(row)
+        self.count += len(rows)
+        if self.buffer_bytes >= self.memory_limit:
+            self.spill()
+
+    def spill(self) -> None:
+        if not self.buffer:
+            return
+        if self.spill_dir is None:
+            self.spill_dir = Path(tempfile.mkdtemp(prefix="_spill_", dir=self.output_dir))
+            self._finalizer = weakref.finalize(self, shutil.rmtree, str(self.spill_dir), True)
+        path = self.spill_dir / f"rows_{len(self.spill_files) + 1:05d}.csv"
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=VISIT_FIELDNAMES, restval="")
+            writer.writeheader()
+            writer.writerows(self.buffer)
+        self.spill_files.append(path)
+        crawler_logger.info(f"訪次列已暫存至磁碟：{path.name} ({len(self.buffer)} 列)")
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+# ---------------------- Dead Letters ----------------------
+# 有任何子請求失敗的樣本先不輸出，爬完後以較低並行數、遞增間隔重試；仍失敗者寫入 failed_samples.csv
+FAILED_SAMPLES_FILE = "failed_samples.csv"
+RETRY_WORKERS = 3
+RETRY_ROUNDS = 2
+RETRY_BACKOFF_SECONDS = 2.0
+
+
+def retry_dead_letters(
+    jobs: List[SampleJob],
+    session: requests.Session,
+    update_progress_callback,
+    backoff: float = RETRY_BACKOFF_SECONDS,
+) -> Tuple[List[SampleJob], List[SampleJob]]:
+    """重試失敗樣本，回傳 (重試成功, 仍然失敗)；每輪重新抓取整個樣本"""
+    recovered: List[SampleJob] = []
+    pending = list(jobs)
+    for round_no in range(1, RETRY_ROUNDS + 1):
+        if not pending:
+            break
+        delay = backoff * 2 ** (round_no - 1)
+        update_progress_callback(95, 100, f"3/4: 第 {round_no} 輪重試 {len(pending)} 筆失敗樣本...")
+        crawler_logger.info(f"{delay:.0f} 秒後進行第 {round_no} 輪重試，共 {len(pending)} 筆失敗樣本")
+        time.sleep(delay)
+        
+        retries = []
+        for job in pending:
+            retry = SampleJob(
+                clone_session(session), job.item, job.project, job.wave,
+                label=f"[重試 {round_no}]", debug=job.debug, fetch_mode=job.fetch_mode,
+            )
+            retry.attempts = job.attempts + 1
+            retries.append(retry)
+        with ThreadPoolExecutor(max_workers=RETRY_WORKERS) as executor:
+            list(executor.map(run_sample_job, retries))
+        
+        pending = []
+        for job in retries:
+            (pending if job.failures else recovered).append(job)
+    return recovered, pending
+
+
+def write_failed_samples(failed: List[Tuple[Dict, int, List[Tuple[str, str]]]], output_dir: Path) -> Optional[Path]:
+    """failed 為 (樣本, 嘗試次數, [(URL, 原因)])；每個失敗的 URL 一列，沒有失敗時移除上次留下的檔案"""
+    path = output_dir / FAILED_SAMPLES_FILE
+    if not failed:
+        path.unlink(missing_ok=True)
+        return None
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["WorkID", "SampleID", "InterviewerNo", "InterviewerName", "Attempts", "URL", "Reason"])
+        for item, attempts, failures in failed:
+            for url, reason in failures:
+                writer.writerow([
+                    item["work_id"], item["sample_id"], item["interviewer_no"],
+                    item["interviewer_name"], attempts, url, reason,
+                ])
+    crawler_logger.warning(f"{len(failed)} 筆樣本重試後仍失敗，已寫入 {path}")
+    return path
 
 
 # ---------------------- Main Crawl (修改為支援 GUI 進度更新) ----------------------
-def crawl_from_main_list(session: requests.Session, project: int, wave: int, update_progress_callback, output_dir: Path) -> List[Dict[str, str]]:
-    update_progress_callback(0, 100, "1/4: 嘗試登入並獲取清單...")
-    
+def fetch_list_items(session: requests.Session, project: int, wave: int, update_progress_callback) -> List[Dict]:
+    """抓取樣本清單的所有分頁"""
     first_url = urljoin(BASE_URL, LIST_PATH_TMPL.format(project=project, wave=wave, page=1))
     r0 = session.get(first_url, timeout=TIMEOUT, allow_redirects=True)
     r0.raise_for_status()
-    
-    items, max_page = parse_list_page_for_items(r0.text)
+
+    items, max_page = parse_list_page_for_items(response_markup(r0))
     crawler_logger.info(f"偵測到 {max_page} 個分頁")
-    
+
     if max_page > 1:
         update_progress_callback(10, 100, "1/4: 抓取所有清單頁面...")
         for p in range(2, max_page + 1):
             url = urljoin(BASE_URL, LIST_PATH_TMPL.format(project=project, wave=wave, page=p))
             r = session.get(url, timeout=TIMEOUT, allow_redirects=True)
-            items_p, _ = parse_list_page_for_items(r.text)
+            items_p, _ = parse_list_page_for_items(response_markup(r))
             items.extend(items_p)
-    
+
     crawler_logger.info(f"總計 {len(items)} 筆樣本")
-    
-    update_progress_callback(20, 100, f"2/4: 預處理前 500 筆以找出 DEBUG 目標...")
-    
+    return items
+
+
+def find_debug_work_ids(session: requests.Session, items: List[Dict], project: int, wave: int) -> Set[str]:
+    """預處理前 500 筆，找出最多 5 個有 ViewURL 的樣本作為 DEBUG 目標"""
     debug_work_ids = set()
     for item in items[:500]:
         if len(debug_work_ids) >= 5:
             break
-        worker_session = create_session()
-        worker_session.cookies.update(session.cookies)
+        worker_session = clone_session(session)
         record_url = urljoin(BASE_URL, EDIT_BASE_TMPL.format(project=project, wave=wave, work_id=item["work_id"]) + "/visit")
         try:
             r = worker_session.get(record_url, timeout=TIMEOUT, allow_redirects=True)
             if r.status_code == 200:
-                visits = parse_visits_from_visit_html(r.text)
+                visits = parse_visits_from_visit_html(response_markup(r))
                 if visits and any(v.get("view_url") for v in visits):
                     debug_work_ids.add(item["work_id"])
                     crawler_logger.info(f"找到有 ViewURL 的 WorkID: {item['work_id']}")
         except Exception as e:
             crawler_logger.debug(f"預處理 {item['work_id']} 失敗: {e}")
+    return debug_work_ids
+
+
+def crawl_from_main_list(
+    session: requests.Session,
+    project: int,
+    wave: int,
+    update_progress_callback,
+    output_dir: Path,
+    holidays_path: str = "",
+    prioritize: bool = True,
+    partial_reports: bool = True,
+    max_outstanding: int = MAX_OUTSTANDING_TASKS,
+    fetch_mode: str = FETCH_MODE,
+) -> RowSink:
+    update_progress_callback(0, 100, "1/4: 嘗試登入並獲取清單...")
+    started = time.time()
+    attach_run_caches(session)
+    
+    with profile_stage("list_pages"):
+        items = fetch_list_items(session, project, wave, update_progress_callback)
+    
+    update_progress_callback(20, 100, f"2/4: 預處理前 500 筆以找出 DEBUG 目標...")
+    with profile_stage("debug_prescan"):
+        debug_work_ids = find_debug_work_ids(session, items, project, wave)
+    
+    if prioritize:
+        items = prioritize_items(items, output_dir)
+    reporter = PartialIssueReporter(output_dir, holidays_path) if partial_reports else None
     
     update_progress_callback(25, 100, "3/4: 開始並行處理樣本...")
     
-    all_rows: List[Dict[str, str]] = []
+    all_rows = RowSink(output_dir)
+    queue = iter(enumerate(items, 1))
+    futures: Dict[Future, Tuple[SampleJob, tuple]] = {}
+    dead_letters: List[SampleJob] = []
+
+    def emit(job: SampleJob) -> None:
+        all_rows.extend(job.rows)
+        if reporter:
+            reporter.add(job.rows, high_priority=job.item.get("priority", 0) >= PRIORITY_HIGH_THRESHOLD)
+
+    def submit_steps(job: SampleJob, steps: list) -> None:
+        for key, fn in steps:
+            futures[executor.submit(fn)] = (job, key)
+
+    def start_next() -> bool:
+        # 每個樣本的子請求各自是一個工作；只在未完成工作少於 max_outstanding 時才開始新樣本，
+        # 已開始樣本的後續步驟則立即送出，讓請求多的樣本不會在單一 worker 上排成一長串
+        nxt = next(queue, None)
+        if nxt is None:
+            return False
+        idx, item = nxt
+        job = SampleJob(
+            clone_session(session), item, project, wave,
+            label=f"[{idx}/{len(items)}]",
+            debug=item["work_id"] in debug_work_ids,
+            fetch_mode=fetch_mode,
+        )
+        submit_steps(job, job.start())
+        return True
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {}
-        for idx, item in enumerate(items, 1):
-            worker_session = create_session()
-            worker_session.cookies.update(session.cookies)
-            future = executor.submit(
-                process_single_item_v2, 
-                worker_session, item, project, wave, idx, len(items), debug_work_ids, 
-                lambda current, total, message: update_progress_callback(
-                    25 + int(70 * current / total), 100, 
-                    f"3/4: ({current}/{total}) {message}"
-                )
-            )
-            futures[future] = item["work_id"]
+    with profile_stage("samples"), ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while len(futures) < max_outstanding and start_next():
+            pass
         
         completed = 0
-        for future in as_completed(futures):
-            work_id = futures[future]
-            try:
-                rows = future.result()
-                all_rows.extend(rows)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, key = futures.pop(future)
+                error = future.exception()
+                submit_steps(job, job.complete(key, None if error else future.result(), error))
+                if not job.done:
+                    continue
+                
+                if job.failures:
+                    dead_letters.append(job)
+                else:
+                    emit(job)
                 completed += 1
                 
                 update_progress_callback(
                     25 + int(70 * completed / len(items)), 100, 
-                    f"3/4: ({completed}/{len(items)}) 樣本 {work_id} 完成"
+                    f"3/4: ({completed}/{len(items)}) 樣本 {job.work_id} 完成"
                 )
-            except Exception as e:
-                crawler_logger.error(f"處理 WorkID={work_id} 時發生錯誤: {e}")
+            while len(futures) < max_outstanding and start_next():
+                pass
+    
+    with profile_stage("retry_dead_letters"):
+        recovered, failed = retry_dead_letters(dead_letters, session, update_progress_callback) if dead_letters else ([], [])
+    # 仍失敗的樣本保留已取得的部分資料（與過去相同），另於 failed_samples.csv 列出失敗原因
+    for job in recovered + failed:
+        emit(job)
+    write_failed_samples([(job.item, job.attempts, job.failures) for job in failed], output_dir)
+    
+    if reporter:
+        reporter.flush()
+    save_list_snapshot(items, output_dir)
+    save_run_caches(session)
+
+    metrics = {
+        "project": project,
+        "wave": wave,
+        "fetch_mode": fetch_mode,
+        "samples": len(items),
+        "visit_rows": len(all_rows),
+        "spilled_row_files": len(all_rows.spill_files),
+        "crawl_seconds": round(time.time() - started, 2),
+        "dead_letter_samples": len(dead_letters),
+        "recovered_samples": len(recovered),
+        "failed_samples": len(failed),
+    }
+    metrics.update(collect_session_metrics(session))
+    write_run_metrics(metrics, output_dir)
+    crawler_logger.info(
+        f"執行統計：GET 實際請求 {metrics.get('get_network_requests', 0)} 次，"
+        f"合併重複請求 {metrics.get('deduplicated_requests', 0)} 次"
+    )
     
     update_progress_callback(95, 100, f"4/4: 爬取完成，總計 {len(all_rows)} 筆訪次記錄。")
     return all_rows
 
+def crawl_and_check(
+    session: requests.Session,
+    project: int,
+    wave: int,
+    output_dir: Path,
+    holidays_path: str,
+    update_progress_callback,
+    fetch_mode: str = FETCH_MODE,
+) -> Tuple[bool, int]:
+    """登入後的完整流程：爬取、寫出 visit_records.csv、執行檢查並寫入結果資料庫"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with profile_stage("crawl"):
+        records = crawl_from_main_list(session, project, wave, update_progress_callback, output_dir, holidays_path,
+                                       fetch_mode=fetch_mode)
+    
+    update_progress_callback(95, 100, "4/4: 寫出訪次記錄 CSV...")
+    with profile_stage("write_csv"):
+        clear_run_complete(output_dir)
+        csv_path = write_csv(records, str(output_dir / "visit_records.csv"))
+        records.close()
+    if not csv_path:
+        raise RuntimeError("無法寫出訪次記錄 CSV。")
+    
+    with profile_stage("checks"):
+        success, total_issues = run_all_checks(csv_path, holidays_path, output_dir, update_progress_callback)
+    if success:
+        with profile_stage("results_store"):
+            record_run_results(project, wave, output_dir)
+    return success, total_issues
+
+
+# ---------------------- Distributed Crawl ----------------------
+# 協調者抓取清單後把樣本放入共用佇列；多個 worker（不同行程或主機）以租約領取樣本、寫回訪次資料。
+# worker 中斷時租約會逾期，樣本回到佇列由其他 worker 接手；全部完成後由協調者輸出 CSV 並執行檢查。
+# 處理中的樣本每完成一步就檢查租約，經過租約時間的 1/3 便延長，慢的樣本不會被重複領取。
+QUEUE_LEASE_SECONDS = 300
+QUEUE_LEASE_RENEW_FRACTION = 1 / 3
+QUEUE_POLL_SECONDS = 2.0
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_QUEUED = "queued"
+QUEUE_LEASED = "leased"
+QUEUE_DONE = "done"
+QUEUE_LEASE_EXPIRED_REASON = "租約逾期（worker 未回報結果）"
+
+
+def _queue_outcome(failures: list, attempts: int) -> str:
+    """有失敗且尚未達嘗試上限時重新排入佇列，否則視為完成"""
+    return QUEUE_QUEUED if failures and attempts < QUEUE_MAX_ATTEMPTS else QUEUE_DONE
+
+
+class WorkQueue(ABC):
+    """共用工作佇列的介面：SqliteWorkQueue 供多行程/多主機使用，LocalWorkQueue 為同一行程內的替代實作。
+    每次 start_run 產生新的 run_id 寫入 meta，worker 藉此分辨上一次已完成的內容與本次的樣本。"""
+
+    @abstractmethod
+    def start_run(self, meta: Dict, items: List[Dict]) -> None:
+        """清除上一次的內容，放入本次所有樣本並產生新的 run_id；領取順序與 items 相同"""
+
+    @abstractmethod
+    def meta(self) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def status(self) -> Tuple[Optional[Dict], bool]:
+        """在同一個交易內讀取 (meta, 是否全部完成)"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float = QUEUE_LEASE_SECONDS) -> Optional[Dict]:
+        """領取一筆樣本，回傳 {"item", "attempts", "meta"}（meta 與樣本在同一個交易內讀取）；會先把逾期的租約放回佇列"""
+
+    @abstractmethod
+    def renew(self, work_id: str, worker_id: str, lease_seconds: float = QUEUE_LEASE_SECONDS) -> bool:
+        """把租約延長到現在起 lease_seconds；租約已不屬於此 worker 時回傳 False"""
+
+    @abstractmethod
+    def complete(self, work_id: str, worker_id: str, rows: List[Dict[str, str]], failures: List[Tuple[str, str]]) -> bool:
+        """寫回結果；租約已不屬於此 worker 時回傳 False（結果捨棄）"""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        pass
+
+    @abstractmethod
+    def results(self) -> Iterable[Tuple[Dict, int, List[Dict[str, str]], List[Tuple[str, str]]]]:
+        """依佇列順序回傳 (樣本, 嘗試次數, 訪次資料, 失敗紀錄)"""
+
+    def finished(self) -> bool:
+        return self.status()[1]
+
+
+def new_queue_run_meta(meta: Dict) -> Dict:
+    return dict(meta, run_id=uuid.uuid4().hex)
+
+
+def _queue_counts_finished(counts: Dict[str, int]) -> bool:
+    return not counts.get(QUEUE_QUEUED) and not counts.get(QUEUE_LEASED)
+
+
+class LocalWorkQueue(WorkQueue):
+    """記憶體內的佇列，語意與 SqliteWorkQueue 相同；供單機執行與驗證使用"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._meta: Optional[Dict] = None
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def start_run(self, meta: Dict, items: List[Dict]) -> None:
+        with self.lock:
+            self._meta = new_queue_run_meta(meta)
+            self.entries = OrderedDict(
+                (it["work_id"], {"item": it, "state": QUEUE_QUEUED, "worker": None, "lease_until": 0.0,
+                                 "attempts": 0, "rows": [], "failures": []})
+                for it in items
+            )
+
+    def meta(self) -> Optional[Dict]:
+        with self.lock:
+            return dict(self._meta) if self._meta is not None else None
+
+    def status(self) -> Tuple[Optional[Dict], bool]:
+        with self.lock:
+            if self._meta is None:
+                return None, False
+            return dict(self._meta), all(e["state"] == QUEUE_DONE for e in self.entries.values())
+
+    def _expire_leases(self, now: float) -> None:
+        for e in self.entries.values():
+            if e["state"] == QUEUE_LEASED and e["lease_until"] < now:
+                e["worker"] = None
+                if e["attempts"] >= QUEUE_MAX_ATTEMPTS:
+                    e.update(state=QUEUE_DONE, failures=[("", QUEUE_LEASE_EXPIRED_REASON)])
+                else:
+                    e["state"] = QUEUE_QUEUED
+
+    def claim(self, worker_id: str, lease_seconds: float = QUEUE_LEASE_SECONDS) -> Optional[Dict]:
+        now = time.time()
+        with self.lock:
+            self._expire_leases(now)
+            for e in self.entries.values():
+                if e["state"] == QUEUE_QUEUED:
+                    e.update(state=QUEUE_LEASED, worker=worker_id, lease_until=now + lease_seconds, attempts=e["attempts"] + 1)
+                    return {"item": e["item"], "attempts": e["attempts"], "meta": dict(self._meta)}
+        return None
+
+    def renew(self, work_id: str, worker_id: str, lease_seconds: float = QUEUE_LEASE_SECONDS) -> bool:
+        with self.lock:
+            e = self.entries.get(work_id)
+            if e is None or e["state"] != QUEUE_LEASED or e["worker"] != worker_id:
+                return False
+            e["lease_until"] = time.time() + lease_seconds
+            return True
+
+    def complete(self, work_id: str, worker_id: str, rows: List[Dict[str, str]], failures: List[Tuple[str, str]]) -> bool:
+        with self.lock:
+            e = self.entries.get(work_id)
+            if e is None or e["state"] != QUEUE_LEASED or e["worker"] != worker_id:
+                return False
+            e.update(state=_queue_outcome(failures, e["attempts"]), worker=None, rows=list(rows), failures=list(failures))
+            return True
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            counts: Dict[str, int] = {}
+            for e in self.entries.values():
+                counts[e["state"]] = counts.get(e["state"], 0) + 1
+            return counts
+
+    def results(self):
+        with self.lock:
+            snapshot = [(e["item"], e["attempts"], e["rows"], e["failures"]) for e in self.entries.values()]
+        return iter(snapshot)
+
+
+class SqliteWorkQueue(WorkQueue):
+    """以 SQLite 檔案作為佇列，可放在多台主機共用的磁碟上。
+    每個操作各自開連線並以 BEGIN IMMEDIATE 取得寫入鎖；不使用 WAL，因為 WAL 無法在網路磁碟上運作。"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS queue_items (
+            seq INTEGER PRIMARY KEY,
+            work_id TEXT UNIQUE,
+            item TEXT,
+            state TEXT,
+            worker TEXT,
+            lease_until REAL DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            rows TEXT DEFAULT '[]',
+            failures TEXT DEFAULT '[]'
+        );
+        CREATE INDEX IF NOT EXISTS queue_items_state ON queue_items (state, seq);
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with self._connection() as db:
+            db.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def start_run(self, meta: Dict, items: List[Dict]) -> None:
+        with self._transaction() as db:
+            db.execute("DELETE FROM queue_items")
+            db.execute("INSERT OR REPLACE INTO queue_meta (key, value) VALUES ('run', ?)",
+                       (json.dumps(new_queue_run_meta(meta)),))
+            db.executemany(
+                "INSERT INTO queue_items (work_id, item, state) VALUES (?, ?, ?)",
+                [(it["work_id"], json.dumps(it, ensure_ascii=False), QUEUE_QUEUED) for it in items],
+            )
+
+    @staticmethod
+    def _read_meta(db) -> Optional[Dict]:
+        row = db.execute("SELECT value FROM queue_meta WHERE key = 'run'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def meta(self) -> Optional[Dict]:
+        with self._connection() as db:
+            return self._read_meta(db)
+
+    def status(self) -> Tuple[Optional[Dict], bool]:
+        with self._connection() as db:
+            db.execute("BEGIN")
+            meta = self._read_meta(db)
+            counts = dict(db.execute("SELECT state, COUNT(*) FROM queue_items GROUP BY state").fetchall())
+            db.execute("COMMIT")
+        return meta, meta is not None and _queue_counts_finished(counts)
+
+    def claim(self, worker_id: str, lease_seconds: float = QUEUE_LEASE_SECONDS) -> Optional[Dict]:
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE queue_items SET state = ?, worker = NULL, failures = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (QUEUE_DONE, json.dumps([("", QUEUE_LEASE_EXPIRED_REASON)], ensure_ascii=False), QUEUE_LEASED, now, QUEUE_MAX_ATTEMPTS),
+            )
+            db.execute(
+                "UPDATE queue_items SET state = ?, worker = NULL WHERE state = ? AND lease_until < ?",
+                (QUEUE_QUEUED, QUEUE_LEASED, now),
+            )
+            row = db.execute(
+                "SELECT seq, item, attempts FROM queue_items WHERE state = ? ORDER BY seq LIMIT 1", (QUEUE_QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            seq, item, attempts = row
+            db.execute(
+                "UPDATE queue_items SET state = ?, worker = ?, lease_until = ?, attempts = ? WHERE seq = ?",
+                (QUEUE_LEASED, worker_id, now + lease_seconds, attempts + 1, seq),
+            )
+            meta = self._read_meta(db)
+        return {"item": json.loads(item), "attempts": attempts + 1, "meta": meta}
+
+    def renew(self, work_id: str, worker_id: str, lease_seconds: float = QUEUE_LEASE_SECONDS) -> bool:
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE queue_items SET lease_until = ? WHERE work_id = ? AND state = ? AND worker = ?",
+                (time.time() + lease_seconds, work_id, QUEUE_LEASED, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, work_id: str, worker_id: str, rows: List[Dict[str, str]], failures: List[Tuple[str, str]]) -> bool:
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT attempts FROM queue_items WHERE work_id = ? AND state = ? AND worker = ?",
+                (work_id, QUEUE_LEASED, worker_id),
+            ).fetchone()
+            if row is None:
+                return False
+            db.execute(
+                "UPDATE queue_items SET state = ?, worker = NULL, rows = ?, failures = ? WHERE work_id = ?",
+                (_queue_outcome(failures, row[0]), json.dumps(list(rows), ensure_ascii=False),
+                 json.dumps(list(failures), ensure_ascii=False), work_id),
+            )
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        with self._connection() as db:
+            return dict(db.execute("SELECT state, COUNT(*) FROM queue_items GROUP BY state").fetchall())
+
+    def results(self):
+        with self._connection() as db:
+            for item, attempts, rows, failures in db.execute(
+                "SELECT item, attempts, rows, failures FROM queue_items ORDER BY seq"
+            ):
+                yield json.loads(item), attempts, json.loads(rows), [tuple(f) for f in json.loads(failures)]
+
+
+def run_queue_worker(
+    queue: WorkQueue,
+    session: requests.Session,
+    worker_id: str = "",
+    threads: int = MAX_WORKERS,
+    lease_seconds: float = QUEUE_LEASE_SECONDS,
+    poll_interval: float = QUEUE_POLL_SECONDS,
+) -> int:
+    """持續領取並處理樣本，直到佇列全部完成；回傳此 worker 寫回的樣本數"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    attach_run_caches(session)
+
+    # 只有在此 worker 看過尚未完成的 run 完成時才結束；啟動時佇列檔留著上一次已完成的 run 則繼續等候新的 run
+    active_runs: Set[str] = set()
+
+    def loop(thread_no: int) -> int:
+        name = f"{worker_id}#{thread_no}"
+        processed = 0
+        while True:
+            try:
+                claim = queue.claim(name, lease_seconds)
+                if claim is None:
+                    meta, finished = queue.status()
+            except Exception as e:
+                # 例如共用磁碟上的 SQLite 暫時被鎖住：稍後再試，不結束此執行緒
+                crawler_logger.warning(f"[{name}] 存取佇列失敗，稍後重試: {e}")
+                time.sleep(poll_interval)
+                continue
+            if claim is None:
+                run_id = meta.get("run_id") if meta else None
+                if run_id and not finished:
+                    active_runs.add(run_id)
+                elif run_id in active_runs:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            
+            item, meta = claim["item"], claim["meta"]
+            work_id = item["work_id"]
+            active_runs.add(meta["run_id"])
+            renewed_at = time.time()
+
+            def keep_lease() -> bool:
+                nonlocal renewed_at
+                now = time.time()
+                if now - renewed_at < lease_seconds * QUEUE_LEASE_RENEW_FRACTION:
+                    return True
+                try:
+                    if not queue.renew(work_id, name, lease_seconds):
+                        crawler_logger.warning(f"WorkID={work_id} 的租約已由其他 worker 接手，停止處理")
+                        return False
+                    renewed_at = now
+                except Exception as e:
+                    crawler_logger.warning(f"WorkID={work_id} 延長租約失敗，下一步再試: {e}")
+                return True
+
+            job = SampleJob(
+                clone_session(session), item, meta["project"], meta["wave"],
+                label=f"[{name}]", fetch_mode=meta.get("fetch_mode", FETCH_MODE),
+            )
+            try:
+                rows, failures = run_sample_job(job, keep_lease), job.failures
+            except Exception as e:
+                crawler_logger.error(f"WorkID={work_id} 處理失敗: {e}")
+                rows, failures = [], [("", f"worker 處理失敗: {e}")]
+            try:
+                completed = queue.complete(work_id, name, rows, failures)
+            except Exception as e:
+                crawler_logger.error(f"WorkID={work_id} 寫回結果失敗，租約逾期後由其他 worker 重試: {e}")
+                continue
+            if completed:
+                processed += 1
+            else:
+                crawler_logger.warning(f"WorkID={work_id} 的租約已逾期並由其他 worker 處理，捨棄本次結果")
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        processed = sum(executor.map(loop, range(1, threads + 1)))
+    save_run_caches(session)
+    crawler_logger.info(f"worker {worker_id} 結束，共處理 {processed} 筆樣本")
+    return processed
+
+
+def run_coordinator(
+    queue: WorkQueue,
+    session: requests.Session,
+    project: int,
+    wave: int,
+    output_dir: Path,
+    holidays_path: str = "",
+    update_progress_callback=None,
+    local_workers: int = 0,
+    fetch_mode: str = FETCH_MODE,
+    poll_interval: float = QUEUE_POLL_SECONDS,
+) -> Tuple[bool, int]:
+    """抓取清單並放入佇列，等待所有樣本完成後輸出 CSV 並執行檢查；local_workers > 0 時協調者也參與處理"""
+    progress = update_progress_callback or (lambda current, total, message: crawler_logger.info(message))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    items = fetch_list_items(session, project, wave, progress)
+    items = prioritize_items(items, output_dir)
+    queue.start_run({"project": project, "wave": wave, "fetch_mode": fetch_mode}, items)
+    progress(25, 100, f"3/4: 已放入 {len(items)} 筆樣本，等待 worker 處理...")
+    
+    local = None
+    if local_workers > 0:
+        local = threading.Thread(
+            target=run_queue_worker, args=(queue, session),
+            kwargs={"worker_id": "coordinator", "threads": local_workers, "poll_interval": poll_interval},
+            daemon=True,
+        )
+        local.start()
+    
+    last_done = -1
+    while not queue.finished():
+        counts = queue.counts()
+        done = counts.get(QUEUE_DONE, 0)
+        if done != last_done:
+            progress(25 + int(70 * done / max(len(items), 1)), 100,
+                     f"3/4: ({done}/{len(items)}) 已完成，{counts.get(QUEUE_LEASED, 0)} 筆處理中")
+            last_done = done
+        time.sleep(poll_interval)
+    if local is not None:
+        local.join()
+    
+    failed = []
+
+    def collected_rows():
+        for item, attempts, rows, failures in queue.results():
+            if failures:
+                failed.append((item, attempts, failures))
+            yield from rows
+
+    clear_run_complete(output_dir)
+    csv_path = write_csv(collected_rows(), str(output_dir / "visit_records.csv"))
+    write_failed_samples(failed, output_dir)
+    save_list_snapshot(items, output_dir)
+    if not csv_path:
+        return False, 0
+    success, total_issues = run_all_checks(csv_path, holidays_path, output_dir, progress)
+    if success:
+        record_run_results(project, wave, output_dir)
+    return success, total_issues
+
+
+# ---------------------- Watch Mode ----------------------
+# 長時間執行：每隔一段時間以條件式請求重新讀取樣本清單，與清單快照比對，只重新爬取新增或清單列有變動的樣本，
+# 替換 visit_records.csv 中這些 WorkID 的列後重新檢查（增量檢查只會重算變動的樣本），並只重寫受影響訪員的問題檔。
+# 清單列看不出的變動（例如只補填問卷）不會觸發重爬，需要時請另外完整執行一次。
+WATCH_INTERVAL_SECONDS = 300
+
+
+class ListPoller:
+    """以條件式請求 (If-None-Match / If-Modified-Since) 輪詢樣本清單；頁面未變時沿用上次的解析結果"""
+
+    def __init__(self, session: requests.Session, project: int, wave: int):
+        self.session = session
+        self.project = project
+        self.wave = wave
+        self.pages: Dict[str, Dict] = {}
+        self.requests = 0
+        self.not_modified = 0
+
+    def _fetch_page(self, page: int) -> Tuple[List[Dict], int]:
+        url = urljoin(BASE_URL, LIST_PATH_TMPL.format(project=self.project, wave=self.wave, page=page))
+        cached = self.pages.get(url)
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        r = self.session.get(url, headers=headers, timeout=TIMEOUT, allow_redirects=True)
+        self.requests += 1
+        if r.status_code == 304 and cached:
+            self.not_modified += 1
+        else:
+            r.raise_for_status()
+            digest = hashlib.blake2b(r.content, digest_size=16).hexdigest()
+            if not cached or cached["digest"] != digest:
+                items, max_page = parse_list_page_for_items(response_markup(r))
+                cached = {"digest": digest, "items": items, "max_page": max_page}
+            cached["etag"] = r.headers.get("ETag", "")
+            cached["last_modified"] = r.headers.get("Last-Modified", "")
+            self.pages[url] = cached
+        return [dict(it) for it in cached["items"]], cached["max_page"]
+
+    def poll(self) -> List[Dict]:
+        self.requests = self.not_modified = 0
+        items, max_page = self._fetch_page(1)
+        for page in range(2, max_page + 1):
+            items.extend(self._fetch_page(page)[0])
+        return items
+
+
+def merge_visit_records(csv_path: Path, replaced: Set[str], rows: List[Dict[str, str]]) -> Set[str]:
+    """把 visit_records.csv 中 replaced (WorkID) 的列換成 rows（寫入暫存檔後置換），回傳被換掉的列的訪員姓名"""
+    df = pd.read_csv(csv_path, dtype=str, encoding="utf-8-sig", na_filter=False)
+    df.columns = [c.strip() for c in df.columns]
+    dropped = df["WorkID"].isin(replaced)
+    previous_interviewers = set(df.loc[dropped, "InterviewerName"])
+    kept = df.loc[~dropped].reindex(columns=VISIT_FIELDNAMES, fill_value="")
+
+    def merged_rows():
+        for values in kept.itertuples(index=False, name=None):
+            yield dict(zip(VISIT_FIELDNAMES, values))
+        yield from rows
+
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    if not write_csv(merged_rows(), str(tmp_path)):
+        raise RuntimeError(f"無法寫出 {csv_path}")
+    os.replace(tmp_path, csv_path)
+    return previous_interviewers
+
+
+def watch_cycle(
+    session: requests.Session,
+    poller: ListPoller,
+    output_dir: Path,
+    holidays_path: str = "",
+    update_progress_callback=None,
+    fetch_mode: str = FETCH_MODE,
+) -> Dict[str, int]:
+    """輪詢一次清單；有變動時只重爬變動的樣本並更新輸出，回傳本輪統計"""
+    progress = update_progress_callback or (lambda current, total, message: None)
+    # 每輪使用新的 GET 快取，清單與訪次頁面都不沿用上一輪的回應
+    session.fetch_cache = FetchCache()
+    items = poller.poll()
+    stats = {"list_requests": poller.requests, "list_not_modified": poller.not_modified,
+             "changed": 0, "removed": 0, "failed": 0}
+    snapshot = load_list_snapshot(output_dir)
+    changed = [it for it in items if snapshot.get(it["work_id"]) != it.get("row_hash")]
+    removed = set(snapshot) - {it["work_id"] for it in items}
+    stats.update(changed=len(changed), removed=len(removed))
+    if not changed and not removed:
+        crawler_logger.info(f"監看：清單無變動（{poller.requests} 頁，{poller.not_modified} 頁未修改）")
+        return stats
+
+    crawler_logger.info(f"監看：{len(changed)} 筆樣本新增或變動、{len(removed)} 筆已移除，開始重新爬取")
+    jobs = [
+        SampleJob(clone_session(session), item, poller.project, poller.wave,
+                  label=f"[監看 {idx}/{len(changed)}]", fetch_mode=fetch_mode)
+        for idx, item in enumerate(changed, 1)
+    ]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(run_sample_job, jobs))
+
+    # 失敗的樣本保留舊資料與舊快照雜湊，下一輪會再嘗試
+    succeeded = [job for job in jobs if not job.failures]
+    failed_ids = {job.work_id for job in jobs if job.failures}
+    stats["failed"] = len(failed_ids)
+    replaced = {job.work_id for job in succeeded} | removed
+    new_rows = [row for job in succeeded for row in job.rows]
+
+    csv_path = output_dir / "visit_records.csv"
+    clear_run_complete(output_dir)
+    interviewers = merge_visit_records(csv_path, replaced, new_rows)
+    interviewers |= {row.get("InterviewerName", "") for row in new_rows}
+    run_all_checks(str(csv_path), holidays_path, output_dir, progress, interviewers=interviewers)
+
+    saved = []
+    for it in items:
+        if it["work_id"] in failed_ids:
+            if it["work_id"] not in snapshot:
+                continue
+            it = dict(it, row_hash=snapshot[it["work_id"]])
+        saved.append(it)
+    save_list_snapshot(saved, output_dir)
+    if failed_ids:
+        crawler_logger.warning(f"監看：{len(failed_ids)} 筆樣本爬取失敗，下一輪重試")
+    return stats
+
+
+def run_watch(
+    session: requests.Session,
+    project: int,
+    wave: int,
+    output_dir: Path,
+    holidays_path: str = "",
+    interval: float = WATCH_INTERVAL_SECONDS,
+    fetch_mode: str = FETCH_MODE,
+    cycles: Optional[int] = None,
+    update_progress_callback=None,
+) -> None:
+    """持續監看直到中斷（或執行 cycles 輪）；輸出資料夾沒有上次結果時先完整爬取一次"""
+    progress = update_progress_callback or (lambda current, total, message: None)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / "visit_records.csv"
+    attach_run_caches(session)
+    wait_first = False
+    if not csv_path.exists() or not load_list_snapshot(output_dir):
+        crawler_logger.info("監看：輸出資料夾沒有上次的結果，先完整爬取一次")
+        records = crawl_from_main_list(session, project, wave, progress, output_dir, holidays_path,
+                                       fetch_mode=fetch_mode)
+        clear_run_complete(output_dir)
+        write_csv(records, str(csv_path))
+        records.close()
+        run_all_checks(str(csv_path), holidays_path, output_dir, progress)
+        wait_first = True
+
+    poller = ListPoller(session, project, wave)
+    done = 0
+    while cycles is None or done < cycles:
+        if wait_first:
+            time.sleep(interval)
+        wait_first = True
+        try:
+            watch_cycle(session, poller, output_dir, holidays_path, progress, fetch_mode)
+        except requests.exceptions.RequestException as e:
+            crawler_logger.warning(f"監看：讀取清單失敗，下一輪重試: {e}")
+        save_run_caches(session)
+        done += 1
+
+
+# ---------------------- Holiday Calendar ----------------------
+# 內建行政院人事行政總處公告的國定假日（含補假、調整放假）與補行上班日；新年度公告後請補上。
+# 使用者的假日清單檔為覆寫：每行一個日期，預設為放假，日期後加「,上班」表示補行上班。
+# 內建資料與覆寫編譯成以日序為索引的布林陣列，整欄日期一次查表；編譯結果存於 cache/，兩者未變時直接載入。
+TW_HOLIDAYS = (
+    # 2024
+    "2024-01-01", "2024-02-08", "2024-02-09", "2024-02-12", "2024-02-13", "2024-02-14",
+    "2024-02-28", "2024-04-04", "2024-04-05", "2024-06-10", "2024-09-17", "2024-10-10",
+    # 2025
+    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31",
+    "2025-02-28", "2025-04-03", "2025-04-04", "2025-05-30", "2025-09-29", "2025-10-06",
+    "2025-10-10", "2025-10-24", "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20",
+    "2026-02-27", "2026-04-03", "2026-04-06", "2026-05-01", "2026-06-19", "2026-09-25",
+    "2026-09-28", "2026-10-09", "2026-10-26", "2026-12-25",
+)
+TW_MAKEUP_WORKDAYS = (
+    "2024-02-17",
+    "2025-02-08",
+)
+CALENDAR_CACHE_FILE = "holiday_calendar.npz"
+CALENDAR_FORMAT = 1
+WORKDAY_MARKS = {"上班", "補班", "補行上班", "workday"}
+HOLIDAY_FILE_UNSET_TEXT = f"未選擇（使用內建 {TW_HOLIDAYS[0][:4]}–{TW_HOLIDAYS[-1][:4]} 行事曆）"
+
+_calendar_memo: Dict[str, "HolidayCalendar"] = {}
+
+
+class HolidayCalendar:
+    """以日序 (1970-01-01 起算的天數) 為索引的放假表；範圍外的日期只依週末判斷"""
+
+    def __init__(self, start: int, offdays: np.ndarray, key: str):
+        self.start = start
+        self.offdays = offdays
+        self.key = key
+        self.warned = False
+
+    @property
+    def first_day(self) -> str:
+        return str(np.datetime64(self.start, "D"))
+
+    @property
+    def last_day(self) -> str:
+        return str(np.datetime64(self.start + len(self.offdays) - 1, "D"))
+
+    def classify(self, dates: pd.Series) -> np.ndarray:
+        """整欄判斷是否為週末或假日；無法解析的日期為 False"""
+        values = pd.to_datetime(dates, errors="coerce").to_numpy(dtype="datetime64[ns]")
+        valid = ~np.isnat(values)
+        days = values.astype("datetime64[D]").astype(np.int64)
+        index = days - self.start
+        in_range = valid & (index >= 0) & (index < len(self.offdays))
+        weekend = (days + 3) % 7 >= 5  # 1970-01-01 為星期四
+        result = np.where(in_range, self.offdays[np.clip(index, 0, len(self.offdays) - 1)], weekend)
+        if not self.warned and (valid & ~in_range).any():
+            self.warned = True
+            crawler_logger.warning(
+                f"部分訪問日期超出內建行事曆範圍 ({self.first_day} ~ {self.last_day})，僅以週末判斷；"
+                "請在假日清單補上該期間的國定假日"
+            )
+        return result & valid
+
+
+def parse_calendar_overrides(path: str) -> Tuple[List[str], List[str], bytes]:
+    """讀取假日清單檔，回傳 (放假日, 補班日, 原始內容)"""
+    holidays: List[str] = []
+    workdays: List[str] = []
+    if not path:
+        return holidays, workdays, b""
+    p = Path(path)
+    if not p.exists():
+        crawler_logger.warning(f"找不到假日清單 {path}，僅使用內建行事曆")
+        return holidays, workdays, b""
+    try:
+        raw = p.read_bytes()
+        text = raw.decode("utf-8-sig")
+    except Exception as e:
+        crawler_logger.error(f"讀取假日清單失敗: {e}")
+        return holidays, workdays, b""
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        m = re.match(r"(\S+?)(?:\s*[,，\s]\s*(.*))?$", line)
+        day, mark = m.group(1), (m.group(2) or "").strip().lower()
+        try:
+            d = pd.to_datetime(day).strftime("%Y-%m-%d")
+        except Exception:
+            crawler_logger.warning(f"假日清單無法解析的日期: {line}")
+            continue
+        (workdays if mark in WORKDAY_MARKS else holidays).append(d)
+    return holidays, workdays, raw
+
+
+def compile_calendar(holidays: Iterable[str], workdays: Iterable[str], key: str) -> HolidayCalendar:
+    holiday_days = np.array(sorted(holidays), dtype="datetime64[D]").astype(np.int64)
+    work_days = np.array(sorted(workdays), dtype="datetime64[D]").astype(np.int64)
+    marked = np.concatenate([holiday_days, work_days])
+    first_year = str(np.datetime64(int(marked.min()), "D").astype("datetime64[Y]"))
+    last_year = str(np.datetime64(int(marked.max()), "D").astype("datetime64[Y]"))
+    start = int(np.datetime64(f"{first_year}-01-01", "D").astype(np.int64))
+    end = int(np.datetime64(f"{last_year}-12-31", "D").astype(np.int64))
+    days = np.arange(start, end + 1, dtype=np.int64)
+    offdays = (days + 3) % 7 >= 5
+    offdays[holiday_days - start] = True
+    offdays[work_days - start] = False
+    return HolidayCalendar(start, offdays, key)
+
+
+def load_holidays(path: str) -> HolidayCalendar:
+    """內建行事曆加上假日清單覆寫（覆寫在後，同一天以覆寫為準）"""
+    extra_holidays, extra_workdays, raw = parse_calendar_overrides(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([CALENDAR_FORMAT, TW_HOLIDAYS, TW_MAKEUP_WORKDAYS]).encode("ascii"))
+    h.update(raw)
+    key = h.hexdigest()
+    if key in _calendar_memo:
+        return _calendar_memo[key]
+
+    cache_path = CACHE_DIR / CALENDAR_CACHE_FILE
+    calendar = None
+    try:
+        with np.load(cache_path) as data:
+            if str(data["key"]) == key:
+                calendar = HolidayCalendar(int(data["start"]), data["offdays"].astype(bool), key)
+    except Exception:
+        pass
+    if calendar is None:
+        workdays = set(TW_MAKEUP_WORKDAYS) - set(extra_holidays) | set(extra_workdays)
+        holidays = set(TW_HOLIDAYS) - set(extra_workdays) | set(extra_holidays)
+        calendar = compile_calendar(holidays, workdays, key)
+        try:
+            tmp = get_cache_dir() / (CALENDAR_CACHE_FILE + ".tmp.npz")
+            np.savez(tmp, key=np.array(key), start=np.array(calendar.start), offdays=calendar.offdays)
+            os.replace(tmp, cache_path)
+        except Exception as e:
+            crawler_logger.warning(f"保存行事曆快取失敗: {e}")
+    crawler_logger.info(
+        f"行事曆：{calendar.first_day} ~ {calendar.last_day}，假日清單覆寫 "
+        f"{len(extra_holidays)} 個放假日、{len(extra_workdays)} 個補班日"
+    )
+    _calendar_memo[key] = calendar
+    return calendar
+
+
 # ---------------------- CSV Output ----------------------
-def write_csv(rows: List[Dict[str, str]], path: str) -> str:
+def write_csv(rows: Iterable[Dict[str, str]], path: str) -> str:
+    """寫出訪次記錄；rows 可為 list、RowSink 或產生器（逐列串流寫出，不需全部載入記憶體）"""
     if not rows:
         crawler_logger.info("無資料可寫出")
         return ""
     
-    fieldnames = [
-        "SampleID", "WorkID", "Date", "Session", "ResultCode", "RecordURL",
-        "ViewURL", "LogsURL", "InterviewerNo", "InterviewerName",
-        "ContactMethod", "ContactAnsweredAt", "T16Answer",
-        "Sampling", "SamplingQ", "InterviewRecord", "HasFill",
-    ]
-    
-    for row in rows:
-        for field in fieldnames:
-            if field not in row:
-                row[field] = ""
-    
     try:
+        count = 0
         with open(path, "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=VISIT_FIELDNAMES, restval="")
             writer.writeheader()
-            writer.writerows(rows)
-        crawler_logger.info(f"輸出 {len(rows)} 列到 {path}")
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        crawler_logger.info(f"輸出 {count} 列到 {path}")
         return path
     except Exception as e:
         crawler_logger.error(f"寫出 CSV 失敗: {e}")
@@ -670,34 +3109,6 @@ def session_bucket(session: str) -> str:
         return "晚上"
     return "未知"
 
-def load_holidays(path: str) -> Set[pd.Timestamp]:
-    days: Set[pd.Timestamp] = set()
-    if not path:
-        return days
-    p = Path(path)
-    if not p.exists():
-        return days
-    try:
-        with p.open("r", encoding="utf-8") as fh:
-            for line in fh:
-                d = line.strip()
-                if not d:
-                    continue
-                try:
-                    days.add(pd.to_datetime(d).normalize())
-                except Exception:
-                    pass
-    except Exception as e:
-        crawler_logger.error(f"讀取假日清單失敗: {e}")
-    return days
-
-def is_weekend_or_holiday(ts: pd.Timestamp, holidays: Set[pd.Timestamp]) -> bool:
-    if pd.isna(ts):
-        return False
-    if ts.weekday() >= 5:
-        return True
-    return ts.normalize() in holidays
-
 def extract_t16_numbers(t16: str) -> Set[str]:
     s = norm(t16)
     nums = set(re.findall(r"(\d+)\s*:", s))
@@ -710,6 +3121,16 @@ def contact_is_public_servant(contact: str) -> bool:
     s = norm(contact)
     return any(k in s for k in ["鄰里長", "員警", "警察", "郵差", "公職人員", "警衛"]) or "里長" in s
 
+# 各檢查使用的結果代碼集合（抓取規劃 plan_sample_fetches 也依此判斷需要哪些頁面）
+II_FORBIDDEN_CODES = {"202","206","207","302","303","304","311","312","313","324","329"}
+II_ALLOWED_NEWER_CODES = {"201","203","204","205","301","305","306","307","309","310","311","314","315","316","317","318","319","320","321","322","325","326","331","100"}
+II_MUST_HAVE_SAMPLING_CODES = {"201","203","204","205","301","305","306","307","309","310","311","314","315","316","317","318","319","320","321","322","325","326","331"}
+II_SUCCESS_CODE = "100"
+III_GUARD_CODES = {"304"}
+III_PUBLIC_SERVANT_CODES = {"311", "312"}
+IV_TARGET_CODES = {"305","314","315","316","317","318","319","320","321","322","323","324","326","329","330","331"}
+
+
 def check_I_three_visits(df: pd.DataFrame) -> List[Dict]:
     recs: List[Dict] = []
     df_sorted = df.sort_values(["SampleID", "DateTime", "_row"], kind="mergesort")
@@ -745,9 +3166,9 @@ def check_I_three_visits(df: pd.DataFrame) -> List[Dict]:
 
 
 def check_II_questionnaire(df: pd.DataFrame) -> List[Dict]:
-    forbidden = {"202","206","207","302","303","304","311","312","313","324","329"}
-    allowed_newer = {"201","203","204","205","301","305","306","307","309","310","311","314","315","316","317","318","319","320","321","322","325","326","331","100"}
-    must_have_sampling = {"201","203","204","205","301","305","306","307","309","310","311","314","315","316","317","318","319","320","321","322","325","326","331"}
+    forbidden = II_FORBIDDEN_CODES
+    allowed_newer = II_ALLOWED_NEWER_CODES
+    must_have_sampling = II_MUST_HAVE_SAMPLING_CODES
 
     recs: List[Dict] = []
 
@@ -763,7 +3184,7 @@ def check_II_questionnaire(df: pd.DataFrame) -> List[Dict]:
 
     g = df.sort_values(["SampleID", "DateTime", "_row"], kind="mergesort").reset_index(drop=True)
 
-    sample_has_100 = g.groupby("SampleID")["ResultCode3"].apply(lambda x: "100" in x.values).to_dict()
+    sample_has_100 = g.groupby("SampleID")["ResultCode3"].apply(lambda x: II_SUCCESS_CODE in x.values).to_dict()
     g["SampleHas100"] = g["SampleID"].map(sample_has_100)
 
     has_future_allowed = [False] * len(g)
@@ -803,7 +3224,7 @@ def check_II_questionnaire(df: pd.DataFrame) -> List[Dict]:
 
     for sid, grp in g.groupby("SampleID", sort=False):
         last = grp.iloc[-1]
-        if norm(last["ResultCode3"]) == "100":
+        if norm(last["ResultCode3"]) == II_SUCCESS_CODE:
             if not (last["T16Filled"] and last["SamplingFilled"] and last["SamplingQFilled"] and last["InterviewRecordFilled"]):
                 recs.append({
                     "樣本編號": last["SampleID"],
@@ -844,11 +3265,11 @@ def check_III_content(df: pd.DataFrame) -> List[Dict]:
             if ("2" not in t16_nums) and ("對講機" not in t16):
                 push(row, "【問卷內容】接觸方式為對講機，但訪視問卷未包含『對講機』")
 
-        if code3 == "304":
+        if code3 in III_GUARD_CODES:
             if not contact_is_guard(contact):
                 push(row, "【問卷內容】結果代碼為304，但接觸方式並非『警衛』")
 
-        if code3 in {"311", "312"}:
+        if code3 in III_PUBLIC_SERVANT_CODES:
             if not contact_is_public_servant(contact):
                 push(row, "【問卷內容】結果代碼為311或312，但接觸方式非公職人員（鄰里長/員警/郵差等）")
 
@@ -856,7 +3277,7 @@ def check_III_content(df: pd.DataFrame) -> List[Dict]:
 
 
 def check_IV_latest_codes(df: pd.DataFrame) -> List[Dict]:
-    target = {"305","314","315","316","317","318","319","320","321","322","323","324","326","329","330","331"}
+    target = IV_TARGET_CODES
     recs: List[Dict] = []
 
     df_sorted = df.sort_values(["SampleID", "DateTime", "_row"], kind="mergesort")
@@ -876,338 +3297,1567 @@ def check_IV_latest_codes(df: pd.DataFrame) -> List[Dict]:
     return recs
 
 
-def run_all_checks(csv_path: str, holidays_path: str, output_dir: Path, update_progress_callback) -> Tuple[bool, int]:
-    update_progress_callback(96, 100, "4/4: 讀取資料並準備檢查...")
-    try:
-        df = pd.read_csv(csv_path, dtype=str, encoding="utf-8-sig", na_filter=False)
-    except Exception as e:
-        messagebox.showerror("錯誤", f"讀取爬蟲結果 CSV 失敗：{e}")
-        return False, 0
-    
-    df.columns = [c.strip() for c in df.columns]
+# ---------------------- Fetch Planning (依檢查規則決定抓取範圍) ----------------------
+# 戶抽/戶抽問卷/訪問記錄問卷只在 II.問卷填寫 的這些代碼（與無結果代碼的訪次）會被檢查
+QUESTIONNAIRE_RULE_CODES = II_FORBIDDEN_CODES | II_MUST_HAVE_SAMPLING_CODES | {II_SUCCESS_CODE}
+
+
+def plan_sample_fetches(visits: List[Dict[str, Optional[str]]], fetch_mode: str = FETCH_MODE) -> Dict[str, bool]:
+    """依 /visit 已知的結果代碼，決定此樣本需要哪些頁面；full 模式保留完整匯出"""
+    if fetch_mode == FETCH_MODE_FULL:
+        return {"questionnaires": True, "all_contacts": True}
+    raw_codes = [v.get("code") or "" for v in visits]
+    codes = {normalize_result_code(c) for c in raw_codes}
+    needs_questionnaires = any(not is_filled(c) for c in raw_codes) or bool(codes & QUESTIONNAIRE_RULE_CODES)
+    return {"questionnaires": needs_questionnaires, "all_contacts": False}
+
+
+def contact_needed(code: str, t16_answer: str) -> bool:
+    """接觸方式 (T03) 只用於 III.問卷內容：304/311/312 代碼，以及 T16 未涵蓋警衛或對講機時的比對"""
+    return contact_required_by_code(code) or not t16_covers_contact(t16_answer)
 
+
+def contact_required_by_code(code: str) -> bool:
+    """不論 T16 為何都需要接觸方式的代碼；可在 T16 取得前先行抓取"""
+    code3 = normalize_result_code(code)
+    return code3 in III_GUARD_CODES or code3 in III_PUBLIC_SERVANT_CODES
+
+
+def t16_covers_contact(t16_answer: str) -> bool:
+    t16 = norm(t16_answer)
+    t16_nums = extract_t16_numbers(t16)
+    guard_covered = "3" in t16_nums or "警衛" in t16
+    intercom_covered = "2" in t16_nums or "對講機" in t16
+    return guard_covered and intercom_covered
+
+
+def prepare_check_frame(df: pd.DataFrame, holidays: HolidayCalendar) -> pd.DataFrame:
+    """加上各項檢查所需的衍生欄位"""
     df = df.copy()
     df["_row"] = range(len(df))
     df["ResultCode3"] = df["ResultCode"].apply(normalize_result_code)
     df["DateTime"] = df["Date"].apply(parse_datetime)
     df["SessionBucket"] = df["Session"].apply(session_bucket)
 
-    holidays = load_holidays(holidays_path)
-    df["IsWeekendOrHoliday"] = df["DateTime"].apply(lambda x: is_weekend_or_holiday(x, holidays))
+    df["IsWeekendOrHoliday"] = holidays.classify(df["DateTime"])
 
     df["T16Filled"] = df["T16Answer"].apply(is_filled)
     df["SamplingFilled"] = df["Sampling"].apply(is_filled)
     df["SamplingQFilled"] = df["SamplingQ"].apply(is_filled)
     df["InterviewRecordFilled"] = df["InterviewRecord"].apply(is_filled)
+    return df
 
-    update_progress_callback(97, 100, "4/4: 執行邏輯一致性檢查...")
-    all_issues = []
-    all_issues.extend(check_I_three_visits(df))
-    all_issues.extend(check_II_questionnaire(df))
-    all_issues.extend(check_III_content(df))
-    all_issues.extend(check_IV_latest_codes(df))
-
-    issues_df = pd.DataFrame(all_issues)
-    
-    if len(issues_df) == 0:
-        crawler_logger.info("恭喜！沒有發現任何問題。")
-        summary = pd.DataFrame([{"訪員姓名": "全部", "違規總數": 0}])
-        summary_path = output_dir / "check_summary_by_interviewer.csv"
-        summary.to_csv(summary_path, index=False, encoding="utf-8-sig")
-        return True, 0
 
-    update_progress_callback(98, 100, "4/4: 輸出違規清單檔案...")
-    for interviewer, grp in issues_df.groupby("訪員姓名"):
-        safe_name = re.sub(r'[\\/:*?"<>|]', '_', str(interviewer))
-        filename = f"interviewer_{safe_name}.csv"
-        grp_sorted = grp.sort_values(["樣本編號", "日期"])
-        grp_sorted[["樣本編號", "日期", "結果代碼", "問題描述", "檢查類別"]].to_csv(
-            output_dir / filename, index=False, encoding="utf-8-sig"
-        )
-        crawler_logger.info(f"已輸出：{filename} ({len(grp)} 筆問題)")
+def collect_issues(df: pd.DataFrame) -> List[Dict]:
+    """執行四類檢查；各類檢查皆以 SampleID 為單位，可對任意樣本子集執行"""
+    return collect_issues_from_families(collect_issues_by_family(df))
 
-    summary = issues_df.groupby("訪員姓名").size().reset_index(name="違規總數")
-    summary = summary.sort_values("違規總數", ascending=False)
-    summary_path = output_dir / "check_summary_by_interviewer.csv"
-    summary.to_csv(summary_path, index=False, encoding="utf-8-sig")
-    
-    total_issues = len(issues_df)
-    crawler_logger.info(f"\n完成！共發現 {total_issues} 個問題，涉及 {len(summary)} 位訪員")
-    return True, total_issues
 
+def collect_issues_by_family(df: pd.DataFrame) -> List[List[Dict]]:
+    families = []
+    for check in (check_I_three_visits, check_II_questionnaire, check_III_content, check_IV_latest_codes):
+        with profile_stage(check.__name__):
+            families.append(check(df))
+    return families
 
-# =================================================================
-# GUI 區塊 (使用 CustomTkinter) - UI 終極美化版 v2.3
-# =================================================================
 
-# 設定 CustomTkinter 預設主題
-ctk.set_appearance_mode("System")  # 預設為系統主題
-ctk.set_default_color_theme("blue")  # 使用藍色主題
+# ---------------------- Incremental Checks ----------------------
+# 樣本的檢查結果只取決於該樣本自己的訪次資料、假日清單與檢查程式本身。check_state.json 保存各樣本訪次資料的
+# 指紋與上次產生的問題（依檢查類別分組）；資料未變的樣本直接沿用，只重新檢查有變動的樣本。
+# 合併時依「檢查類別 → 樣本內產生順序」排列，與整批重新檢查的輸出相同。
+CHECK_STATE_FILE = "check_state.json"
+DELTA_SUMMARY_FILE = "check_delta_summary.csv"
+ISSUE_COLUMNS = ["樣本編號", "日期", "結果代碼", "問題描述", "檢查類別"]
 
-class VisitCrawlerApp(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-        self.title("訪次資料匯出檢查 | By.莊旻叡")
-        self.geometry("780x650")
-        self.resizable(False, False) 
-
-        # 狀態變數
-        self.email_var = ctk.StringVar(value="")
-        self.password_var = ctk.StringVar()
-        self.project_var = ctk.StringVar(value="35")
-        self.wave_var = ctk.StringVar(value="99")
-        self.holiday_path_var = ctk.StringVar(value="未選擇")
-        self._full_holiday_path: Optional[Path] = None
-        self.output_dir = Path.cwd() / "Output"
-        
-        # 顏色常量 (CTk 會自動處理深淺模式)
-        self.ACCENT_COLOR = "#1F4E79" # Dark Navy/Blue
-        self.FONT_FAMILY = "微軟正黑體"
-        
-        self._create_widgets()
-        self.bind('<Return>', lambda e: self._start_crawl_thread())
-        
-    def _create_widgets(self):
-        # 主容器框架 (使用 CTkFrame，padding 與圓角效果)
-        main_frame = ctk.CTkFrame(self, fg_color="transparent")
-        main_frame.pack(fill="both", expand=True, padx=30, pady=30)
-
-        # 頂部標題
-        ctk.CTkLabel(main_frame, text="訪次資料匯出檢查", 
-                     font=(self.FONT_FAMILY, 24, 'bold'),
-                     text_color=self.ACCENT_COLOR).pack(pady=(0, 25))
-
-        # --- 1. 執行參數框架 ---
-        # 使用 CTkFrame 模擬 LabelFrame，視覺上更簡潔
-        input_frame = ctk.CTkFrame(main_frame, corner_radius=10)
-        input_frame.pack(padx=0, pady=(0, 25), fill="x", ipady=15)
-
-        # 網格配置
-        input_frame.columnconfigure(0, weight=1, minsize=160) 
-        input_frame.columnconfigure(1, weight=3) 
-
-        row_index = 0
-        pady_val = 10
-        padx_val = 15
-        
-        # A. 登入憑證 (分組標題)
-        ctk.CTkLabel(input_frame, text="[ 登入憑證 ]", 
-                     font=(self.FONT_FAMILY, 15, 'bold'), 
-                     text_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"][0], # 使用主題色
-                     ).grid(row=row_index, column=0, sticky="w", pady=(pady_val, 0), padx=padx_val, columnspan=2)
-        row_index += 1
-        
-        # 帳號 (Email)
-        ctk.CTkLabel(input_frame, text="帳號 (Email):", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
-        ctk.CTkEntry(input_frame, textvariable=self.email_var, font=(self.FONT_FAMILY, 13)).grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
-        row_index += 1
-
-        # 密碼
-        ctk.CTkLabel(input_frame, text="密碼:", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
-        ctk.CTkEntry(input_frame, textvariable=self.password_var, show="•", font=(self.FONT_FAMILY, 13)).grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
-        row_index += 1
-
-        # B. 專案配置 (分組標題)
-        ctk.CTkLabel(input_frame, text="[ 專案配置 ]", 
-                     font=(self.FONT_FAMILY, 15, 'bold'), 
-                     text_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"][0],
-                     ).grid(row=row_index, column=0, sticky="w", pady=(pady_val*2, 0), padx=padx_val, columnspan=2)
-        row_index += 1
-        
-        # Project ID / Wave ID 容器
-        project_wave_frame = ctk.CTkFrame(input_frame, fg_color="transparent")
-        project_wave_frame.grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
-        project_wave_frame.columnconfigure(0, weight=1) 
-        project_wave_frame.columnconfigure(2, weight=0) # 分隔符不佔空間
-        project_wave_frame.columnconfigure(3, weight=1) 
-
-        ctk.CTkLabel(input_frame, text="Project ID / Wave ID:", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
-        
-        ctk.CTkEntry(project_wave_frame, textvariable=self.project_var, font=(self.FONT_FAMILY, 13)).grid(row=0, column=0, sticky="ew")
-        ctk.CTkLabel(project_wave_frame, text=" / ", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=0, column=2, sticky="ew", padx=10)
-        ctk.CTkEntry(project_wave_frame, textvariable=self.wave_var, font=(self.FONT_FAMILY, 13)).grid(row=0, column=3, sticky="ew")
-        row_index += 1
-        
-        # 假日清單按鈕 (優化 UX)
-        holiday_control_frame = ctk.CTkFrame(input_frame, fg_color="transparent")
-        holiday_control_frame.grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
-        holiday_control_frame.columnconfigure(0, weight=0) 
-        holiday_control_frame.columnconfigure(1, weight=1) 
 
-        ctk.CTkLabel(input_frame, text="國定假日清單 (選填):", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
-        
-        ctk.CTkButton(holiday_control_frame, text="選擇檔案...", command=self._select_holiday_file, 
-                      width=150, font=(self.FONT_FAMILY, 12),
-                      fg_color=("gray70", "gray35") # 次要按鈕樣式
-                      ).grid(row=0, column=0, sticky="w")
-        
-        # 顯示選中的檔案名稱
-        self.holiday_path_display = ctk.CTkLabel(holiday_control_frame, textvariable=self.holiday_path_var, wraplength=400, 
-                                                 font=(self.FONT_FAMILY, 11), text_color=("gray40", "gray60"))
-        self.holiday_path_display.grid(row=0, column=1, sticky="w", padx=(10, 0))
-        row_index += 1
-
-        # --- 2. 執行按鈕 ---
-        self.run_button = ctk.CTkButton(main_frame, text="▶ 啟動爬取與檢查", command=self._start_crawl_thread, 
-                                        height=50, 
-                                        font=(self.FONT_FAMILY, 16, 'bold'))
-        self.run_button.pack(pady=(20, 30), fill="x")
-
-        # --- 3. 執行進度框架 ---
-        progress_frame = ctk.CTkFrame(main_frame, corner_radius=10)
-        progress_frame.pack(padx=0, pady=(0, 25), fill="x", ipady=15)
-        
-        # 狀態標籤 
-        self.status_label = ctk.CTkLabel(progress_frame, text="系統待命中...", anchor="center", 
-                                         font=(self.FONT_FAMILY, 15, 'bold'), 
-                                         text_color=self.ACCENT_COLOR)
-        self.status_label.pack(pady=(5, 15), fill="x")
-        
-        # 進度條
-        self.progress = ctk.CTkProgressBar(progress_frame, orientation="horizontal", height=20)
-        self.progress.set(0)
-        self.progress.pack(pady=5, padx=15, fill="x")
-
-        # --- 4. 資訊區與模式切換 ---
-        info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
-        info_frame.pack(padx=0, pady=(0, 0), fill="x")
-        info_frame.columnconfigure(0, weight=1)
-        info_frame.columnconfigure(1, weight=1)
-
-        # 輸出路徑
-        self.output_label = ctk.CTkLabel(info_frame, text=f"輸出資料夾: {self.output_dir.name}", 
-                                         font=(self.FONT_FAMILY, 11), 
-                                         anchor="w", text_color=self.ACCENT_COLOR)
-        self.output_label.grid(row=0, column=0, sticky="w")
-        
-        # 主題切換按鈕
-        self.appearance_mode_optionemenu = ctk.CTkOptionMenu(info_frame, 
-                                                             values=["Light", "Dark", "System"],
-                                                             command=self.change_appearance_mode_event,
-                                                             width=100,
-                                                             font=(self.FONT_FAMILY, 11))
-        self.appearance_mode_optionemenu.set("System")
-        self.appearance_mode_optionemenu.grid(row=0, column=1, sticky="e")
-        
-        # 作者資訊
-        ctk.CTkLabel(info_frame, text="By.莊旻叡", 
-                     font=(self.FONT_FAMILY, 9), text_color=("gray60", "gray40")).grid(row=1, column=0, sticky="w")
+def sample_fingerprints(df: pd.DataFrame) -> Dict[str, str]:
+    """依 CSV 原始欄位計算每個樣本（依列順序）的指紋"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return {
+        str(sid): hashlib.blake2b(row_hashes[positions].tobytes(), digest_size=16).hexdigest()
+        for sid, positions in df.groupby("SampleID", sort=False).indices.items()
+    }
 
-    def change_appearance_mode_event(self, new_appearance_mode: str):
-        ctk.set_appearance_mode(new_appearance_mode)
 
-    def _select_holiday_file(self):
-        file_path = filedialog.askopenfilename(
-            title="選擇國定假日清單 (.txt)",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
-        )
-        if file_path:
-            self._full_holiday_path = Path(file_path)
-            self.holiday_path_var.set(self._full_holiday_path.name) 
-        else:
-            self.holiday_path_var.set("未選擇")
-            self._full_holiday_path = None
+def check_state_version(holidays: HolidayCalendar) -> str:
+    """檢查程式或假日清單改變時，所有樣本都需重新檢查"""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(code_fingerprint(prepare_check_frame).encode("ascii"))
+    h.update(code_fingerprint(collect_issues).encode("ascii"))
+    h.update(holidays.key.encode("ascii"))
+    return h.hexdigest()
 
-    def _update_progress(self, current, total, message):
-        percentage = max(0, min(100, (current / total) * 100))
-        
-        # CTkProgressBar 使用 set(value)
-        self.progress.set(percentage / 100) 
-        self.status_label.configure(text=f"{message} ({percentage:.1f}%)")
-        self.update_idletasks()
-        
-    def _start_crawl_thread(self):
-        email = self.email_var.get().strip()
-        password = self.password_var.get().strip()
-        project_id = self.project_var.get().strip()
-        wave_id = self.wave_var.get().strip()
-        
-        holiday_path = str(self._full_holiday_path) if self._full_holiday_path else ""
 
-        if not email or "@" not in email:
-            messagebox.showerror("驗證錯誤", "請輸入有效的 Email 帳號。")
-            return
-        if not password:
-            messagebox.showerror("驗證錯誤", "請輸入密碼。")
-            return
-        if not project_id.isdigit() or not wave_id.isdigit():
-            messagebox.showerror("驗證錯誤", "Project ID 和 Wave ID 必須是數字。")
-            return
-            
-        self.run_button.configure(state="disabled")
-        self.progress.set(0)
-        self.status_label.configure(text="初始化...")
-        
-        try:
-            self.output_dir.mkdir(parents=True, exist_ok=True)
-            output_csv = str(self.output_dir / "visit_records.csv")
-        except Exception as e:
-            messagebox.showerror("錯誤", f"無法建立輸出目錄: {e}")
-            self.run_button.configure(state="normal")
-            return
-            
-        threading.Thread(
-            target=self._run_crawl_and_check, 
-            args=(email, password, int(project_id), int(wave_id), output_csv, holiday_path),
-            daemon=True
-        ).start()
-
-    def _run_crawl_and_check(self, email, password, project, wave, output_csv, holiday_path):
-        total_issues = 0
-        try:
-            session = create_session()
-            
-            # 1. 登入
-            self._update_progress(1, 100, "1/4: 嘗試登入...")
-            fetch_csrf_and_login(session, email, password)
-            
-            # 2. 爬取
-            records = crawl_from_main_list(session, project, wave, self._update_progress, self.output_dir)
-            
-            # 3. 寫出 CSV
-            self._update_progress(95, 100, "4/4: 寫出訪次記錄 CSV...")
-            csv_path = write_csv(records, output_csv)
-            
-            if not csv_path:
-                raise RuntimeError("無法寫出訪次記錄 CSV。")
-            
-            # 4. 執行檢查
-            success, total_issues = run_all_checks(csv_path, holiday_path, self.output_dir, self._update_progress)
-            
-            # 5. 完成
-            self._update_progress(100, 100, "✅ 完成所有任務！")
-            
-            if success:
-                messagebox.showinfo(
-                    "完成", 
-                    f"資料匯出與檢查成功！\n\n檔案已輸出至：{self.output_dir.name} 資料夾\n\n共發現 {total_issues} 個問題。\n\n本程式由莊旻叡撰寫\n特別感謝陳逸龍教授加博士先生的協助開發"
-                )
-            else:
-                messagebox.showwarning("警告", f"資料爬取與檢查成功，但檢查過程中發生錯誤或未生成彙總檔案。\n輸出路徑：{self.output_dir.name}")
-
-        except requests.exceptions.HTTPError as e:
-            messagebox.showerror("錯誤", f"HTTP 錯誤: 檢查您的 Project/Wave ID 或登入狀態。\n錯誤細節: {e}")
-            self._update_progress(0, 100, "❌ 錯誤：HTTP 失敗。")
-        except RuntimeError as e:
-            messagebox.showerror("錯誤", f"執行錯誤: {e}")
-            self._update_progress(0, 100, "❌ 錯誤：登入或執行失敗。")
-        except Exception as e:
-            messagebox.showerror("嚴重錯誤", f"發生無法預期的錯誤: {e}")
-            self._update_progress(0, 100, "❌ 錯誤：執行失敗。")
-        finally:
-            self.run_button.configure(state="normal")
+def load_check_state(output_dir: Path) -> Dict:
+    try:
+        state = json.loads((output_dir / CHECK_STATE_FILE).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return state if isinstance(state, dict) and isinstance(state.get("samples"), dict) else {}
 
 
-if __name__ == "__main__":
+def save_check_state(state: Dict, output_dir: Path) -> None:
     try:
-        log_dir = Path.cwd() / "logs"
-        log_dir.mkdir(exist_ok=True)
-        if not any(isinstance(handler, logging.FileHandler) for handler in crawler_logger.handlers):
-            file_handler = logging.FileHandler(log_dir / 'crawler_log.txt', encoding='utf-8')
-            file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        (output_dir / CHECK_STATE_FILE).write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    except Exception as e:
+        crawler_logger.warning(f"保存檢查狀態失敗: {e}")
+
+
+def incremental_issues(df: pd.DataFrame, holidays: HolidayCalendar, previous: Dict) -> Tuple[List[Dict], Dict]:
+    """只重新檢查訪次資料有變動的樣本，回傳 (全部問題, 新的檢查狀態)"""
+    version = check_state_version(holidays)
+    prev_samples = previous.get("samples", {}) if previous.get("version") == version else {}
+    fingerprints = sample_fingerprints(df)
+    changed = {sid for sid, fp in fingerprints.items() if prev_samples.get(sid, {}).get("fingerprint") != fp}
+    
+    per_sample: Dict[str, List[List[Dict]]] = {
+        sid: prev_samples[sid]["issues"] for sid in fingerprints if sid not in changed
+    }
+    if changed:
+        families = check_samples(df[df["SampleID"].astype(str).isin(changed)], holidays)
+        for sid in changed:
+            per_sample[sid] = [[] for _ in families]
+        for family_no, issues in enumerate(families):
+            for issue in issues:
+                per_sample[str(issue["樣本編號"])][family_no].append(issue)
+    crawler_logger.info(f"增量檢查：{len(changed)} / {len(fingerprints)} 個樣本重新檢查，其餘沿用上次結果")
+    
+    family_count = max((len(v) for v in per_sample.values()), default=0)
+    all_issues = [
+        issue
+        for family_no in range(family_count)
+        for sid in fingerprints
+        for issue in per_sample[sid][family_no]
+    ]
+    state = {
+        "version": version,
+        "samples": {sid: {"fingerprint": fp, "issues": per_sample[sid]} for sid, fp in fingerprints.items()},
+    }
+    return all_issues, state
+
+
+# ---------------------- Parallel Checks ----------------------
+# 大量樣本需要檢查時，依 SampleID 雜湊切成多個分片交給多個行程。各分片只傳檢查規則用到的欄位：
+# 每欄先 factorize 成 int32 代碼，不重複的字串接成一段 UTF-8 文字並記錄各字串的起訖位置，全部放進同一塊
+# 共享記憶體。子行程只收到各陣列的位置，以 numpy 直接對應共享記憶體、切出字串後用 take 還原欄位，
+# 不必序列化或解析 CSV；長的自由文字只佔自己的長度。回傳的問題依分片順序合併。
+CHECK_PROCESSES = os.cpu_count() or 1
+CHECK_SHARDS_PER_PROCESS = 4
+CHECK_PARALLEL_MIN_ROWS = 50_000
+# prepare_check_frame 與各項檢查讀取的原始欄位；新增檢查規則用到其他欄位時需一併加入
+CHECK_INPUT_COLUMNS = ["SampleID", "InterviewerName", "Date", "ResultCode", "Session",
+                       "T16Answer", "Sampling", "SamplingQ", "InterviewRecord", "ContactMethod"]
+
+
+def check_samples(df: pd.DataFrame, holidays: HolidayCalendar, processes: int = CHECK_PROCESSES,
+                  min_rows: int = CHECK_PARALLEL_MIN_ROWS) -> List[List[Dict]]:
+    """對 df（原始字串欄位）執行四類檢查，回傳各類問題；資料量夠大時分片平行處理"""
+    if processes <= 1 or len(df) < min_rows:
+        return collect_issues_by_family(prepare_check_frame(df, holidays))
+    try:
+        return _check_samples_parallel(df, holidays, processes)
+    except Exception as e:
+        crawler_logger.warning(f"平行檢查失敗，改為單一行程執行: {e}")
+        return collect_issues_by_family(prepare_check_frame(df, holidays))
+
+
+def _check_samples_parallel(df: pd.DataFrame, holidays: HolidayCalendar, processes: int) -> List[List[Dict]]:
+    shard_count = processes * CHECK_SHARDS_PER_PROCESS
+    shard_of_row = pd.util.hash_array(df["SampleID"].astype(str).to_numpy()) % shard_count
+    # 依分片排列列號（stable：分片內維持原本的列順序）
+    order = np.argsort(shard_of_row, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(shard_of_row, minlength=shard_count))))
+    columns = {c: df[c].to_numpy() for c in CHECK_INPUT_COLUMNS if c in df.columns}
+
+    arrays: List[np.ndarray] = []
+    shards: List[List[Tuple[str, int]]] = []
+    for shard in range(shard_count):
+        rows = order[bounds[shard]:bounds[shard + 1]]
+        if not len(rows):
+            continue
+        specs = []
+        for column, values in columns.items():
+            codes, uniques = pd.factorize(values[rows])
+            ends = np.cumsum([len(u) for u in uniques], dtype=np.int64)
+            text = np.frombuffer("".join(uniques).encode("utf-8"), dtype=np.uint8)
+            specs.append((column, len(arrays)))
+            arrays += [codes.astype(np.int32), ends, text]
+        shards.append(specs)
+
+    offsets = []
+    size = 0
+    for arr in arrays:
+        offsets.append(size)
+        size += -(-arr.nbytes // 8) * 8  # 8 位元組對齊
+    block = shared_memory.SharedMemory(create=True, size=max(1, size))
+    try:
+        for arr, offset in zip(arrays, offsets):
+            _shared_array(block, (offset, arr.shape, arr.dtype.str))[...] = arr
+        layout = [(offsets[i], arrays[i].shape, arrays[i].dtype.str) for i in range(len(arrays))]
+        tasks = [
+            (block.name, [(column, layout[first:first + 3]) for column, first in specs], holidays)
+            for specs in shards
+        ]
+        del arrays
+
+        crawler_logger.info(f"平行檢查：{len(df)} 列分成 {len(tasks)} 個分片，使用 {processes} 個行程")
+        families: List[List[Dict]] = []
+        # spawn 在各平台行為一致，也不會複製 GUI 執行緒的狀態
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+            for shard_families in executor.map(_check_shard, tasks):
+                if not families:
+                    families = [[] for _ in shard_families]
+                for family_no, issues in enumerate(shard_families):
+                    families[family_no].extend(issues)
+        return families
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _shared_array(block: shared_memory.SharedMemory, spec) -> np.ndarray:
+    """共享記憶體中 (位置, 形狀, dtype) 的陣列檢視；呼叫端須在 block.close() 前釋放"""
+    offset, shape, dtype = spec
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+
+
+def _read_shared_column(block: shared_memory.SharedMemory, specs) -> np.ndarray:
+    """由 (代碼, 字串結尾位置, UTF-8 文字) 還原成與 read_csv(dtype=str) 相同的 object 欄位"""
+    codes, ends, text = (_shared_array(block, spec) for spec in specs)
+    decoded = text.tobytes().decode("utf-8")
+    starts = np.concatenate(([0], ends[:-1]))
+    uniques = np.array([decoded[a:b] for a, b in zip(starts.tolist(), ends.tolist())], dtype=object)
+    return uniques.take(codes)
+
+
+def _check_shard(task) -> List[List[Dict]]:
+    name, columns, holidays = task
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        shard = pd.DataFrame({column: _read_shared_column(block, specs) for column, specs in columns})
+    finally:
+        block.close()
+    return collect_issues_by_family(prepare_check_frame(shard, holidays))
+
+
+def write_issue_delta(previous: Dict, all_issues: List[Dict], output_dir: Path) -> Tuple[int, int]:
+    """與上次的問題比較，依訪員輸出新增/已解決的問題；回傳 (新增數, 已解決數)"""
+    def issue_key(issue: Dict) -> Tuple[str, ...]:
+        return (str(issue["訪員姓名"]),) + tuple(str(issue[c]) for c in ISSUE_COLUMNS)
+
+    previous_issues = [
+        issue for sample in previous.get("samples", {}).values() for family in sample["issues"] for issue in family
+    ]
+    before = Counter(map(issue_key, previous_issues))
+    after = Counter(map(issue_key, all_issues))
+    changes = [("新增", key) for key in (after - before).elements()] + [("已解決", key) for key in (before - after).elements()]
+    
+    for old in output_dir.glob("delta_interviewer_*.csv"):
+        old.unlink(missing_ok=True)
+    delta_df = pd.DataFrame(
+        [(change,) + key for change, key in changes],
+        columns=["變動", "訪員姓名"] + ISSUE_COLUMNS,
+    )
+    for interviewer, grp in delta_df.groupby("訪員姓名"):
+        safe_name = re.sub(r'[\\/:*?"<>|]', '_', str(interviewer))
+        grp.sort_values(["變動", "樣本編號", "日期"], ascending=[False, True, True])[["變動"] + ISSUE_COLUMNS].to_csv(
+            output_dir / f"delta_interviewer_{safe_name}.csv", index=False, encoding="utf-8-sig"
+        )
+    summary = pd.DataFrame({
+        "新增問題": delta_df[delta_df["變動"] == "新增"].groupby("訪員姓名").size(),
+        "已解決問題": delta_df[delta_df["變動"] == "已解決"].groupby("訪員姓名").size(),
+    }).fillna(0).astype(int).rename_axis("訪員姓名").reset_index()
+    summary.to_csv(output_dir / DELTA_SUMMARY_FILE, index=False, encoding="utf-8-sig")
+    
+    added = int((delta_df["變動"] == "新增").sum())
+    resolved = len(delta_df) - added
+    crawler_logger.info(f"與上次相比：新增 {added} 個問題，已解決 {resolved} 個問題")
+    return added, resolved
+
+
+def run_all_checks(csv_path: str, holidays_path: str, output_dir: Path, update_progress_callback,
+                   interviewers: Optional[Set[str]] = None) -> Tuple[bool, int]:
+    """interviewers 不為 None 時只重寫這些訪員的問題檔，其中已沒有問題的訪員會刪除舊檔；
+    完整執行時刪除已沒有問題的訪員留下的舊檔。成功時最後寫出 run_complete.json"""
+    clear_run_complete(output_dir)
+    try:
+        if Path(csv_path).stat().st_size >= CHECK_OUT_OF_CORE_BYTES:
+            return run_checks_chunked(csv_path, holidays_path, output_dir, update_progress_callback)
+    except OSError:
+        pass
+    update_progress_callback(96, 100, "4/4: 讀取資料並準備檢查...")
+    try:
+        with profile_stage("read_csv"):
+            df = pd.read_csv(csv_path, dtype=str, encoding="utf-8-sig", na_filter=False)
+    except Exception as e:
+        # 無介面的呼叫端（check、crawl、watch、協調者）也會走到這裡；對話框只由 GUI 依回傳值顯示
+        crawler_logger.error(f"讀取爬蟲結果 CSV 失敗：{e}")
+        return False, 0
+    
+    df.columns = [c.strip() for c in df.columns]
+
+    holidays = load_holidays(holidays_path)
+
+    update_progress_callback(97, 100, "4/4: 執行邏輯一致性檢查...")
+    with profile_stage("incremental_checks"):
+        previous_state = load_check_state(output_dir)
+        all_issues, state = incremental_issues(df, holidays, previous_state)
+        if previous_state:
+            write_issue_delta(previous_state, all_issues, output_dir)
+        save_check_state(state, output_dir)
+
+    issues_df = pd.DataFrame(all_issues)
+    if interviewers is not None:
+        remaining = set(issues_df["訪員姓名"]) if len(issues_df) else set()
+        for interviewer in interviewers - remaining:
+            stale = output_dir / interviewer_issue_filename(interviewer)
+            if stale.exists():
+                stale.unlink()
+    
+    if len(issues_df) == 0:
+        write_empty_check_summary(output_dir)
+        if interviewers is None:
+            remove_stale_interviewer_files(output_dir, set())
+        return mark_run_complete(output_dir, 0)
+
+    update_progress_callback(98, 100, "4/4: 輸出違規清單檔案...")
+    with profile_stage("write_reports"):
+        total_issues = write_issue_reports(issues_df, output_dir, interviewers)
+    return mark_run_complete(output_dir, total_issues)
+
+
+def interviewer_issue_filename(interviewer: str) -> str:
+    safe_name = re.sub(r'[\\/:*?"<>|]', '_', str(interviewer))
+    return f"interviewer_{safe_name}.csv"
+
+
+def render_interviewer_issues(issues: pd.DataFrame, presorted: bool = False) -> bytes:
+    if not presorted:
+        issues = issues.sort_values(["樣本編號", "日期"])
+    return issues[ISSUE_COLUMNS].to_csv(index=False).encode("utf-8-sig")
+
+
+def write_empty_check_summary(output_dir: Path) -> None:
+    crawler_logger.info("恭喜！沒有發現任何問題。")
+    summary = pd.DataFrame([{"訪員姓名": "全部", "違規總數": 0}])
+    write_file_atomic(output_dir / "check_summary_by_interviewer.csv", summary.to_csv(index=False).encode("utf-8-sig"))
+
+
+def write_check_summary(counts: pd.Series, output_dir: Path) -> int:
+    """counts 為依訪員姓名排序的問題數；回傳問題總數"""
+    summary = counts.reset_index(name="違規總數")
+    summary = summary.sort_values("違規總數", ascending=False)
+    write_file_atomic(output_dir / "check_summary_by_interviewer.csv", summary.to_csv(index=False).encode("utf-8-sig"))
+    
+    total_issues = int(summary["違規總數"].sum())
+    crawler_logger.info(f"\n完成！共發現 {total_issues} 個問題，涉及 {len(summary)} 位訪員")
+    return total_issues
+
+
+# ---------------------- Report Writer ----------------------
+# 問題全部排序一次、以單次 groupby 分成各訪員，交給執行緒池產生 CSV 並寫出；每個檔案先寫暫存檔再 os.replace，
+# 讀取中的檔案不會看到寫一半的內容。內容與現有檔案相同時不重寫（修改時間不變，同步到共用磁碟時也不會重傳）。
+# REPORT_BUNDLE 設為 zip / xlsx 時另外輸出一個包含所有訪員的壓縮檔或活頁簿。xlsx 需 openpyxl（requirements.txt 的選用依賴）；
+# pandas 以動態 import 載入它，PyInstaller 打包時需 --hidden-import=openpyxl。
+REPORT_WRITER_THREADS = 4
+REPORT_BUNDLE = ""  # "" | "zip" | "xlsx"
+REPORT_BUNDLE_FILES = {"zip": "interviewer_reports.zip", "xlsx": "interviewer_reports.xlsx"}
+# 開始改寫輸出檔時刪除、所有輸出檔寫完後最後寫出；存在時代表資料夾內是同一次執行的完整結果（結果查詢服務據此重新載入）
+RUN_COMPLETE_FILE = "run_complete.json"
+
+
+def write_file_atomic(path: Path, data: bytes) -> bool:
+    """內容不同時才以暫存檔替換；回傳是否有寫入"""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def clear_run_complete(output_dir: Path) -> None:
+    (output_dir / RUN_COMPLETE_FILE).unlink(missing_ok=True)
+
+
+def mark_run_complete(output_dir: Path, total_issues: int) -> Tuple[bool, int]:
+    """寫出完成標記；回傳 run_all_checks 的 (成功, 問題數)"""
+    marker = {"completed_at": time.strftime("%Y-%m-%d %H:%M:%S"), "issues": total_issues}
+    write_file_atomic(output_dir / RUN_COMPLETE_FILE, json.dumps(marker, ensure_ascii=False).encode("utf-8"))
+    return True, total_issues
+
+
+def remove_stale_interviewer_files(output_dir: Path, interviewers: Set[str]) -> None:
+    """完整執行後刪除已沒有問題的訪員留下的問題檔"""
+    keep = {interviewer_issue_filename(name) for name in interviewers}
+    for path in output_dir.glob("interviewer_*.csv"):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+            crawler_logger.info(f"已刪除：{path.name}（已沒有問題）")
+
+
+class ReportWriter:
+    """在執行緒池上產生並寫出各訪員的問題檔；以 with 使用，離開時等待全部完成並輸出合併檔"""
+
+    def __init__(self, output_dir: Path, bundle: str = "", threads: int = REPORT_WRITER_THREADS):
+        self.output_dir = output_dir
+        self.bundle = bundle
+        self.max_pending = threads * 2
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="report-writer")
+        self.pending: Set[Future] = set()
+        self.entries: Dict[str, Union[bytes, pd.DataFrame]] = {}
+        self.written = 0
+        self.unchanged = 0
+        self.lock = threading.Lock()
+
+    def submit(self, interviewer: str, issues: pd.DataFrame, presorted: bool = False, write_file: bool = True) -> None:
+        """write_file 為 False 時只放入合併檔；待處理的工作過多時先等候，避免分塊模式一次載入所有訪員"""
+        if not write_file and not self.bundle:
+            return
+        if len(self.pending) >= self.max_pending:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        self.pending.add(self.pool.submit(self._write, interviewer, issues, presorted, write_file))
+
+    def _write(self, interviewer: str, issues: pd.DataFrame, presorted: bool, write_file: bool) -> None:
+        filename = interviewer_issue_filename(interviewer)
+        data = render_interviewer_issues(issues, presorted)
+        changed = write_file and write_file_atomic(self.output_dir / filename, data)
+        with self.lock:
+            if changed:
+                self.written += 1
+            elif write_file:
+                self.unchanged += 1
+            if self.bundle == "xlsx":
+                self.entries[str(interviewer)] = issues if presorted else issues.sort_values(["樣本編號", "日期"])
+            elif self.bundle:
+                self.entries[filename] = data
+        if changed:
+            crawler_logger.info(f"已輸出：{filename} ({len(issues)} 筆問題)")
+
+    def close(self) -> None:
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.pool.shutdown(wait=True)
+        crawler_logger.info(f"問題檔：寫入 {self.written} 個，內容未變動 {self.unchanged} 個")
+        if self.bundle:
+            self.write_bundle()
+
+    def write_bundle(self) -> None:
+        path = self.output_dir / REPORT_BUNDLE_FILES[self.bundle]
+        buffer = io.BytesIO()
+        if self.bundle == "zip":
+            # 固定檔案順序與時間戳記，內容相同時 zip 的位元組也相同
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+                for name in sorted(self.entries):
+                    zf.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), self.entries[name],
+                                compress_type=zipfile.ZIP_DEFLATED)
+        else:
+            try:
+                with pd.ExcelWriter(buffer, engine="openpyxl") as xw:
+                    used: Set[str] = set()
+                    for interviewer in sorted(self.entries):
+                        # 工作表名稱最多 31 字且不可含 \ / : * ? [ ]
+                        base = re.sub(r"[\\/:*?\[\]]", "_", interviewer)[:31] or "_"
+                        sheet, k = base, 1
+                        while sheet in used:
+                            sheet, k = f"{base[:27]}~{k}", k + 1
+                        used.add(sheet)
+                        self.entries[interviewer][ISSUE_COLUMNS].to_excel(xw, sheet_name=sheet, index=False)
+            except ImportError:
+                crawler_logger.warning("未安裝 openpyxl，略過輸出活頁簿（pip install openpyxl）")
+                return
+        if write_file_atomic(path, buffer.getvalue()):
+            crawler_logger.info(f"已輸出：{path.name}（{len(self.entries)} 位訪員）")
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_issue_reports(issues_df: pd.DataFrame, output_dir: Path, interviewers: Optional[Set[str]] = None,
+                        bundle: Optional[str] = None) -> int:
+    """interviewers 不為 None 時只寫出這些訪員的問題檔（合併檔仍包含所有訪員）；回傳問題總數"""
+    bundle = REPORT_BUNDLE if bundle is None else bundle
+    ordered = issues_df.sort_values(["訪員姓名", "樣本編號", "日期"])
+    names: List[str] = []
+    sizes: List[int] = []
+    with ReportWriter(output_dir, bundle) as writer:
+        for interviewer, grp in ordered.groupby("訪員姓名", sort=False):
+            names.append(interviewer)
+            sizes.append(len(grp))
+            writer.submit(interviewer, grp, presorted=True,
+                          write_file=interviewers is None or interviewer in interviewers)
+    if interviewers is None:
+        remove_stale_interviewer_files(output_dir, set(names))
+    return write_check_summary(pd.Series(sizes, index=pd.Index(names, name="訪員姓名"), dtype="int64"), output_dir)
+
+
+# ---------------------- Out-of-core Checks ----------------------
+# 整季歷史 CSV 可能大於記憶體。分塊模式每次只載入一組完整樣本：已依 SampleID 排序（同一樣本連續）的檔案
+# 直接按塊讀取並在樣本邊界切開；否則先依 SampleID 雜湊分割到暫存檔（外部分組），再逐一檢查。
+# 問題逐塊附加到各訪員的暫存檔，最後逐一排序寫出，彙總數字在結尾合併；不寫入增量檢查狀態。
+CHECK_OUT_OF_CORE_BYTES = 1024 * 1024 * 1024
+CHECK_CHUNK_ROWS = 200_000
+
+
+def run_checks_chunked(
+    csv_path: str,
+    holidays_path: str,
+    output_dir: Path,
+    update_progress_callback,
+    chunk_rows: int = CHECK_CHUNK_ROWS,
+    presorted: bool = False,
+) -> Tuple[bool, int]:
+    """分塊執行檢查，記憶體用量取決於 chunk_rows 而非整個檔案；輸出檔與 run_all_checks 相同"""
+    clear_run_complete(output_dir)
+    holidays = load_holidays(holidays_path)
+    work_dir = Path(tempfile.mkdtemp(prefix="chunked_checks_", dir=output_dir))
+    try:
+        if presorted:
+            chunks = _sample_aligned_chunks(csv_path, chunk_rows)
+        else:
+            chunks = _partitioned_chunks(csv_path, chunk_rows, work_dir, update_progress_callback)
+        spool = IssueSpool(work_dir)
+        rows_done = 0
+        for chunk in chunks:
+            spool.add(collect_issues_from_families(check_samples(chunk, holidays)))
+            rows_done += len(chunk)
+            update_progress_callback(97, 100, f"4/4: 分塊檢查中，已完成 {rows_done} 列...")
+        
+        update_progress_callback(98, 100, "4/4: 輸出違規清單檔案...")
+        remove_stale_interviewer_files(output_dir, set(spool.counts))
+        if not spool.counts:
+            write_empty_check_summary(output_dir)
+            return mark_run_complete(output_dir, 0)
+        with ReportWriter(output_dir, REPORT_BUNDLE) as writer:
+            for interviewer, issues in spool.interviewer_issues():
+                writer.submit(interviewer, issues)
+        counts = pd.Series(spool.counts, dtype="int64").sort_index().rename_axis("訪員姓名")
+        return mark_run_complete(output_dir, write_check_summary(counts, output_dir))
+    except Exception as e:
+        crawler_logger.error(f"分塊檢查失敗: {e}")
+        return False, 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def collect_issues_from_families(families: List[List[Dict]]) -> List[Dict]:
+    return [issue for family in families for issue in family]
+
+
+def _read_visit_csv(source, **kwargs):
+    return pd.read_csv(source, dtype=str, encoding="utf-8-sig", na_filter=False, **kwargs)
+
+
+def _sample_aligned_chunks(csv_path: str, chunk_rows: int) -> Iterable[pd.DataFrame]:
+    """已依 SampleID 排序的檔案：每塊的最後一個樣本留到下一塊，確保樣本不被切開"""
+    carry: Optional[pd.DataFrame] = None
+    for chunk in _read_visit_csv(csv_path, chunksize=chunk_rows):
+        chunk.columns = [c.strip() for c in chunk.columns]
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        ids = chunk["SampleID"].to_numpy()
+        cut = len(ids)
+        while cut > 0 and ids[cut - 1] == ids[-1]:
+            cut -= 1
+        carry = chunk.iloc[cut:]
+        if cut:
+            yield chunk.iloc[:cut]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def _partitioned_chunks(csv_path: str, chunk_rows: int, work_dir: Path, update_progress_callback) -> Iterable[pd.DataFrame]:
+    """未排序的檔案：依 SampleID 雜湊分到約 chunk_rows 列的分割檔，同一樣本必在同一分割"""
+    with open(csv_path, "rb") as fh:
+        head = fh.read(1024 * 1024)
+    row_bytes = max(1, len(head) // max(1, head.count(b"\n")))
+    partitions = max(1, -(-Path(csv_path).stat().st_size // (row_bytes * chunk_rows)))
+    paths = [work_dir / f"partition_{k}.csv" for k in range(partitions)]
+    
+    update_progress_callback(96, 100, f"4/4: 依樣本分割資料（{partitions} 份）...")
+    for chunk in _read_visit_csv(csv_path, chunksize=chunk_rows):
+        chunk.columns = [c.strip() for c in chunk.columns]
+        partition_of_row = pd.util.hash_array(chunk["SampleID"].to_numpy()) % partitions
+        for k in sorted(set(partition_of_row.tolist())):
+            part = chunk[partition_of_row == k]
+            part.to_csv(paths[k], mode="a", header=not paths[k].exists(), index=False, encoding="utf-8")
+    
+    for path in paths:
+        if path.exists():
+            yield pd.read_csv(path, dtype=str, encoding="utf-8", na_filter=False)
+            path.unlink()
+
+
+class IssueSpool:
+    """把各塊的問題附加到每位訪員的暫存檔，並累計各訪員的問題數"""
+
+    def __init__(self, work_dir: Path):
+        self.work_dir = work_dir
+        self.files: Dict[str, Path] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, issues: List[Dict]) -> None:
+        if not issues:
+            return
+        issues_df = pd.DataFrame(issues)
+        for interviewer, grp in issues_df.groupby("訪員姓名", sort=False):
+            path = self.files.get(interviewer)
+            if path is None:
+                path = self.files[interviewer] = self.work_dir / f"issues_{len(self.files)}.csv"
+            grp.to_csv(path, mode="a", header=not path.exists(), index=False, encoding="utf-8")
+            self.counts[interviewer] = self.counts.get(interviewer, 0) + len(grp)
+
+    def interviewer_issues(self) -> Iterable[Tuple[str, pd.DataFrame]]:
+        """一次只載入一位訪員的問題"""
+        for interviewer in sorted(self.files):
+            yield interviewer, pd.read_csv(self.files[interviewer], dtype=str, encoding="utf-8", na_filter=False)
+
+
+# ---------------------- Results Store ----------------------
+# 每次執行結束後，把 visit_records.csv 與各訪員問題檔整批寫入本機 SQLite (results.sqlite)，
+# 跨梯次、跨執行查詢某位訪員或某個樣本時直接走索引，不必逐一開啟 CSV。
+# 每次寫入為一筆 run；查詢預設只看每個 project/wave 最新的一次執行。
+RESULTS_DB_PATH = Path.cwd() / "results.sqlite"
+RESULTS_INSERT_BATCH = 50_000
+ISSUE_STORE_COLUMNS = {
+    "樣本編號": "SampleID",
+    "日期": "Date",
+    "結果代碼": "ResultCode",
+    "問題描述": "Description",
+    "檢查類別": "Category",
+}
+
+
+class ResultsStore:
+    """本機結果資料庫；visits 欄位與 visit_records.csv 相同，issues 另記訪員編號以便依訪員查詢"""
+
+    SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY,
+            project INTEGER,
+            wave INTEGER,
+            recorded_at TEXT,
+            output_dir TEXT,
+            visit_rows INTEGER DEFAULT 0,
+            issue_count INTEGER DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS runs_project_wave ON runs (project, wave, run_id);
+        CREATE TABLE IF NOT EXISTS visits (
+            run_id INTEGER, project INTEGER, wave INTEGER,
+            {", ".join(f"{c} TEXT" for c in VISIT_FIELDNAMES)}
+        );
+        CREATE INDEX IF NOT EXISTS visits_project_wave ON visits (project, wave, run_id);
+        CREATE INDEX IF NOT EXISTS visits_sample ON visits (SampleID);
+        CREATE INDEX IF NOT EXISTS visits_work ON visits (WorkID);
+        CREATE INDEX IF NOT EXISTS visits_interviewer ON visits (InterviewerNo);
+        CREATE TABLE IF NOT EXISTS issues (
+            run_id INTEGER, project INTEGER, wave INTEGER,
+            InterviewerNo TEXT, InterviewerName TEXT,
+            {", ".join(f"{c} TEXT" for c in ISSUE_STORE_COLUMNS.values())}
+        );
+        CREATE INDEX IF NOT EXISTS issues_project_wave ON issues (project, wave, run_id);
+        CREATE INDEX IF NOT EXISTS issues_sample ON issues (SampleID);
+        CREATE INDEX IF NOT EXISTS issues_interviewer_no ON issues (InterviewerNo);
+        CREATE INDEX IF NOT EXISTS issues_interviewer_name ON issues (InterviewerName);
+        CREATE INDEX IF NOT EXISTS issues_category ON issues (Category);
+    """
+
+    def __init__(self, path=RESULTS_DB_PATH):
+        self.path = str(path)
+        with self._connection() as db:
+            db.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def record_run(self, project: int, wave: int, output_dir: Path) -> int:
+        """把輸出資料夾內的訪次與問題寫成一筆新的 run（單一交易），回傳 run_id"""
+        output_dir = Path(output_dir)
+        csv_path = output_dir / "visit_records.csv"
+        if not csv_path.exists():
+            raise FileNotFoundError(f"找不到 {csv_path}")
+
+        with self._transaction() as db:
+            run_id = db.execute(
+                "INSERT INTO runs (project, wave, recorded_at, output_dir) VALUES (?, ?, ?, ?)",
+                (project, wave, time.strftime("%Y-%m-%d %H:%M:%S"), str(output_dir.resolve())),
+            ).lastrowid
+            prefix = (run_id, project, wave)
+
+            visit_sql = (
+                f"INSERT INTO visits (run_id, project, wave, {', '.join(VISIT_FIELDNAMES)}) "
+                f"VALUES ({', '.join('?' * (len(VISIT_FIELDNAMES) + 3))})"
+            )
+            interviewer_of_sample: Dict[str, str] = {}
+            visit_rows = 0
+            for chunk in pd.read_csv(csv_path, dtype=str, encoding="utf-8-sig", na_filter=False,
+                                     chunksize=RESULTS_INSERT_BATCH):
+                chunk.columns = [c.strip() for c in chunk.columns]
+                chunk = chunk.reindex(columns=VISIT_FIELDNAMES, fill_value="")
+                db.executemany(visit_sql, (prefix + row for row in chunk.itertuples(index=False, name=None)))
+                for sid, ino in zip(chunk["SampleID"], chunk["InterviewerNo"]):
+                    interviewer_of_sample.setdefault(sid, ino)
+                visit_rows += len(chunk)
+
+            issue_sql = (
+                f"INSERT INTO issues (run_id, project, wave, InterviewerNo, InterviewerName, "
+                f"{', '.join(ISSUE_STORE_COLUMNS.values())}) VALUES ({', '.join('?' * (len(ISSUE_STORE_COLUMNS) + 5))})"
+            )
+            issue_count = 0
+            for interviewer, issues in read_interviewer_issues(output_dir):
+                issues = issues.reindex(columns=list(ISSUE_STORE_COLUMNS), fill_value="")
+                db.executemany(issue_sql, (
+                    prefix + (interviewer_of_sample.get(row[0], ""), interviewer) + row
+                    for row in issues.itertuples(index=False, name=None)
+                ))
+                issue_count += len(issues)
+
+            db.execute("UPDATE runs SET visit_rows = ?, issue_count = ? WHERE run_id = ?",
+                       (visit_rows, issue_count, run_id))
+        crawler_logger.info(f"已寫入結果資料庫 run {run_id}：{visit_rows} 筆訪次、{issue_count} 筆問題")
+        return run_id
+
+    def runs(self) -> pd.DataFrame:
+        with self._connection() as db:
+            return pd.read_sql_query("SELECT * FROM runs ORDER BY run_id", db)
+
+    def _query(self, table: str, filters: List[Tuple[str, object]], all_runs: bool,
+               project: Optional[int], wave: Optional[int], limit: Optional[int]) -> pd.DataFrame:
+        clauses, params = [], []
+        if project is not None:
+            clauses.append("project = ?")
+            params.append(project)
+        if wave is not None:
+            clauses.append("wave = ?")
+            params.append(wave)
+        if not all_runs:
+            clauses.append("run_id IN (SELECT MAX(run_id) FROM runs GROUP BY project, wave)")
+        for clause, value in filters:
+            if value not in (None, ""):
+                clauses.append(clause)
+                params.extend([value] * clause.count("?"))
+        sql = f"SELECT * FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY run_id, rowid"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._connection() as db:
+            return pd.read_sql_query(sql, db, params=params)
+
+    def issues(self, project: Optional[int] = None, wave: Optional[int] = None, interviewer: str = "",
+               sample_id: str = "", category: str = "", all_runs: bool = False,
+               limit: Optional[int] = None) -> pd.DataFrame:
+        """interviewer 可為訪員編號或姓名"""
+        return self._query("issues", [
+            ("(InterviewerNo = ? OR InterviewerName = ?)", interviewer),
+            ("SampleID = ?", sample_id),
+            ("Category = ?", category),
+        ], all_runs, project, wave, limit)
+
+    def visits(self, project: Optional[int] = None, wave: Optional[int] = None, interviewer: str = "",
+               sample_id: str = "", work_id: str = "", all_runs: bool = False,
+               limit: Optional[int] = None) -> pd.DataFrame:
+        """interviewer 為訪員編號"""
+        return self._query("visits", [
+            ("InterviewerNo = ?", interviewer),
+            ("SampleID = ?", sample_id),
+            ("WorkID = ?", work_id),
+        ], all_runs, project, wave, limit)
+
+
+def read_interviewer_issues(output_dir: Path) -> Iterable[Tuple[str, pd.DataFrame]]:
+    """依 check_summary_by_interviewer.csv 逐一讀回各訪員的問題檔"""
+    summary_path = output_dir / "check_summary_by_interviewer.csv"
+    if not summary_path.exists():
+        return
+    summary = pd.read_csv(summary_path, dtype=str, encoding="utf-8-sig", na_filter=False)
+    for interviewer, count in zip(summary["訪員姓名"], summary["違規總數"]):
+        path = output_dir / interviewer_issue_filename(interviewer)
+        if count in ("", "0") or not path.exists():
+            continue
+        yield interviewer, pd.read_csv(path, dtype=str, encoding="utf-8-sig", na_filter=False)
+
+
+def record_run_results(project: int, wave: int, output_dir: Path, db_path=RESULTS_DB_PATH) -> Optional[int]:
+    """執行結束後寫入結果資料庫；失敗只記錄警告，不影響本次輸出"""
+    try:
+        return ResultsStore(db_path).record_run(project, wave, output_dir)
+    except Exception as e:
+        crawler_logger.warning(f"寫入結果資料庫失敗: {e}")
+        return None
+
+
+# ---------------------- Results Server ----------------------
+# 督導在區網內以瀏覽器或程式查詢同一次執行的結果，不必各自複製輸出資料夾或重新爬取（命令列: serve）。
+# 把 visit_records.csv 與各訪員問題檔載入記憶體，依訪員、樣本、結果代碼、檢查類別建立索引（值 → 列號陣列），
+# 查詢只做索引取交集與切頁。只有已沒有問題的訪員不會載入（依 check_summary_by_interviewer.csv）。
+# 背景執行緒定期檢查完成標記 (run_complete.json)：新一次執行寫完所有輸出檔後才會出現新的標記，
+# 此時在旁邊建好新的快照再替換參考；進行中的查詢繼續使用原本的快照，讀取端不需要鎖。
+RESULTS_SERVER_PORT = 8765
+RESULTS_SERVER_POLL_SECONDS = 5.0
+RESULTS_SERVER_PAGE_SIZE = 100
+RESULTS_SERVER_MAX_PAGE_SIZE = 5000
+ISSUE_SERVER_COLUMNS = ["InterviewerNo", "InterviewerName"] + list(ISSUE_STORE_COLUMNS.values())
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+
+def results_signature(output_dir: Path) -> Tuple:
+    """完成標記的 (修改時間, 大小)；執行進行中（標記已刪除）時為空 tuple"""
+    try:
+        st = (output_dir / RUN_COMPLETE_FILE).stat()
+    except OSError:
+        return ()
+    return st.st_mtime_ns, st.st_size
+
+
+class ResultsSnapshot:
+    """一次執行結果的唯讀快照：每列存成 tuple，索引為 查詢值 → 由小到大的列號陣列"""
+
+    FILTERS = {
+        "visits": {"interviewer": ("InterviewerNo", "InterviewerName"), "sample": ("SampleID",),
+                   "work_id": ("WorkID",), "code": ("ResultCode",)},
+        "issues": {"interviewer": ("InterviewerNo", "InterviewerName"), "sample": ("SampleID",),
+                   "code": ("ResultCode",), "category": ("Category",)},
+    }
+
+    def __init__(self, output_dir: Path, signature: Tuple = ()):
+        output_dir = Path(output_dir)
+        csv_path = output_dir / "visit_records.csv"
+        if not csv_path.exists():
+            raise FileNotFoundError(f"找不到 {csv_path}")
+        visits = pd.read_csv(csv_path, dtype=str, encoding="utf-8-sig", na_filter=False)
+        visits.columns = [c.strip() for c in visits.columns]
+        visits = visits.reindex(columns=VISIT_FIELDNAMES, fill_value="")
+
+        frames = []
+        for interviewer, issues in read_interviewer_issues(output_dir):
+            issues = issues.reindex(columns=list(ISSUE_STORE_COLUMNS), fill_value="").rename(columns=ISSUE_STORE_COLUMNS)
+            issues.insert(0, "InterviewerName", interviewer)
+            frames.append(issues)
+        issues = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ISSUE_SERVER_COLUMNS[1:])
+        interviewer_of_sample = visits.drop_duplicates("SampleID").set_index("SampleID")["InterviewerNo"]
+        issues.insert(0, "InterviewerNo", issues["SampleID"].map(interviewer_of_sample).fillna(""))
+
+        self.output_dir = output_dir
+        self.signature = signature
+        self.loaded_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.columns = {"visits": list(visits.columns), "issues": list(issues.columns)}
+        self.rows = {name: list(frame.itertuples(index=False, name=None))
+                     for name, frame in (("visits", visits), ("issues", issues))}
+        self.indexes = {
+            name: {param: self._build_index(frame, columns) for param, columns in self.FILTERS[name].items()}
+            for name, frame in (("visits", visits), ("issues", issues))
+        }
+        counts = issues.groupby(["InterviewerNo", "InterviewerName"]).size().rename("issues")
+        visit_counts = visits.groupby(["InterviewerNo", "InterviewerName"]).size().rename("visits")
+        summary = pd.concat([visit_counts, counts], axis=1).fillna(0).astype(int).reset_index()
+        self.summary = summary.sort_values("issues", ascending=False, kind="stable").to_dict("records")
+
+    @staticmethod
+    def _build_index(frame: pd.DataFrame, columns: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+        index: Dict[str, np.ndarray] = {}
+        for column in columns:
+            for value, positions in frame.groupby(column, sort=False).indices.items():
+                if value == "":
+                    continue
+                index[value] = np.union1d(index[value], positions) if value in index else positions
+        return index
+
+    def lookup(self, table: str, filters: Dict[str, str]) -> Union[np.ndarray, range]:
+        """回傳符合所有條件的列號（由小到大）；從最少列的條件開始，以二分搜尋在較大的陣列中逐一篩選"""
+        if not filters:
+            return range(len(self.rows[table]))
+        indexes = self.indexes[table]
+        candidates = sorted((indexes[param].get(value, _NO_ROWS) for param, value in filters.items()), key=len)
+        positions = candidates[0]
+        for other in candidates[1:]:
+            if not len(positions):
+                break
+            found = np.minimum(np.searchsorted(other, positions), len(other) - 1)
+            positions = positions[other[found] == positions]
+        return positions
+
+    def records(self, table: str, positions) -> List[Dict[str, str]]:
+        columns = self.columns[table]
+        rows = self.rows[table]
+        return [dict(zip(columns, rows[i])) for i in positions]
+
+    def info(self) -> Dict[str, object]:
+        return {"output_dir": str(self.output_dir.resolve()), "loaded_at": self.loaded_at,
+                "visits": len(self.rows["visits"]), "issues": len(self.rows["issues"])}
+
+
+class ResultsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """GET /summary、/visits、/issues；查詢參數見 ResultsSnapshot.FILTERS，另有 page、per_page、format=json|csv|html"""
+
+    server_version = "SampleChecker"
+
+    def log_message(self, format, *args):
+        crawler_logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        snapshot = self.server.snapshot  # 整個請求只讀這一次參考，重新載入不影響進行中的請求
+        if snapshot is None:
+            return self._send_json(503, {"error": "尚未載入結果"})
+        path = url.path.rstrip("/") or "/"
+        if path == "/":
+            return self._send_html(self._overview_html(snapshot))
+        if path == "/summary":
+            return self._send_json(200, {"run": snapshot.info(), "interviewers": snapshot.summary})
+        table = path.lstrip("/")
+        if table not in ResultsSnapshot.FILTERS:
+            return self._send_json(404, {"error": f"沒有 {path}，可用 /summary、/visits、/issues"})
+
+        output_format = params.pop("format", "json")
+        try:
+            page = max(1, int(params.pop("page", 1)))
+            per_page = min(RESULTS_SERVER_MAX_PAGE_SIZE, max(1, int(params.pop("per_page", RESULTS_SERVER_PAGE_SIZE))))
+        except ValueError:
+            return self._send_json(400, {"error": "page 與 per_page 須為整數"})
+        unknown = set(params) - set(ResultsSnapshot.FILTERS[table])
+        if unknown or output_format not in ("json", "csv", "html"):
+            allowed = ", ".join(list(ResultsSnapshot.FILTERS[table]) + ["page", "per_page", "format"])
+            return self._send_json(400, {"error": f"不支援的參數 {', '.join(sorted(unknown)) or output_format}，可用 {allowed}"})
+
+        started = time.perf_counter()
+        positions = snapshot.lookup(table, params)
+        lookup_ms = (time.perf_counter() - started) * 1000
+        if output_format == "csv":
+            # CSV 為匯出用途，不分頁
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(snapshot.columns[table])
+            writer.writerows(snapshot.rows[table][i] for i in positions)
+            return self._send(200, buffer.getvalue().encode("utf-8-sig"), "text/csv; charset=utf-8", lookup_ms,
+                              [("Content-Disposition", f'attachment; filename="{table}.csv"')])
+        total = len(positions)
+        rows = snapshot.records(table, positions[(page - 1) * per_page: page * per_page])
+        result = {"run": snapshot.info(), "total": total, "page": page, "per_page": per_page,
+                  "pages": -(-total // per_page), "rows": rows}
+        if output_format == "html":
+            return self._send_html(self._table_html(table, params, result), lookup_ms)
+        return self._send_json(200, result, lookup_ms)
+
+    def _send(self, status: int, body: bytes, content_type: str, lookup_ms: Optional[float] = None,
+              headers: Iterable[Tuple[str, str]] = ()) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if lookup_ms is not None:
+            self.send_header("Server-Timing", f"lookup;dur={lookup_ms:.3f}")
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict, lookup_ms: Optional[float] = None) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                   "application/json; charset=utf-8", lookup_ms)
+
+    def _send_html(self, body: str, lookup_ms: Optional[float] = None) -> None:
+        page = f"<!doctype html><html><head><meta charset='utf-8'><title>樣本檢查結果</title></head><body>{body}</body></html>"
+        self._send(200, page.encode("utf-8"), "text/html; charset=utf-8", lookup_ms)
+
+    @staticmethod
+    def _overview_html(snapshot: ResultsSnapshot) -> str:
+        info = snapshot.info()
+        rows = "".join(
+            f"<tr><td>{escape(r['InterviewerNo'])}</td><td>{escape(r['InterviewerName'])}</td><td>{r['visits']}</td>"
+            f"<td><a href='/issues?{urlencode({'interviewer': r['InterviewerName'], 'format': 'html'})}'>{r['issues']}</a></td></tr>"
+            for r in snapshot.summary
+        )
+        return (f"<p>{escape(info['output_dir'])}（載入於 {info['loaded_at']}）：{info['visits']} 筆訪次、{info['issues']} 個問題</p>"
+                f"<table border='1'><tr><th>訪員編號</th><th>訪員姓名</th><th>訪次</th><th>問題</th></tr>{rows}</table>")
+
+    @staticmethod
+    def _table_html(table: str, filters: Dict[str, str], result: Dict) -> str:
+        columns = list(result["rows"][0]) if result["rows"] else []
+        header = "".join(f"<th>{escape(c)}</th>" for c in columns)
+        body = "".join("<tr>" + "".join(f"<td>{escape(row[c])}</td>" for c in columns) + "</tr>" for row in result["rows"])
+        links = []
+        for label, page in (("上一頁", result["page"] - 1), ("下一頁", result["page"] + 1)):
+            if 1 <= page <= result["pages"]:
+                query = urlencode({**filters, "page": page, "per_page": result["per_page"], "format": "html"})
+                links.append(f"<a href='/{table}?{query}'>{label}</a>")
+        csv_link = f"/{table}?{urlencode({**filters, 'format': 'csv'})}"
+        return (f"<p><a href='/'>總覽</a> 共 {result['total']} 筆，第 {result['page']}/{max(1, result['pages'])} 頁 "
+                f"{' '.join(links)} <a href='{csv_link}'>下載 CSV</a></p>"
+                f"<table border='1'><tr>{header}</tr>{body}</table>")
+
+
+class ResultsServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, output_dir: Path, host: str = "127.0.0.1", port: int = RESULTS_SERVER_PORT,
+                 poll_seconds: float = RESULTS_SERVER_POLL_SECONDS):
+        super().__init__((host, port), ResultsRequestHandler)
+        self.output_dir = Path(output_dir)
+        self.poll_seconds = poll_seconds
+        self.snapshot: Optional[ResultsSnapshot] = None
+        self.loaded_signature: Tuple = ()
+        self.stop_event = threading.Event()
+        self.reload(results_signature(self.output_dir))
+        self.watcher = threading.Thread(target=self._watch_loop, name="results-reload", daemon=True)
+        self.watcher.start()
+
+    def reload(self, signature: Tuple) -> bool:
+        """在旁邊建好新的快照後一次替換；載入失敗或載入期間又開始新的執行時保留原本的快照"""
+        try:
+            snapshot = ResultsSnapshot(self.output_dir, signature)
+        except Exception as e:
+            self.loaded_signature = signature
+            crawler_logger.warning(f"載入結果失敗，沿用上一份結果: {e}")
+            return False
+        if self.snapshot is not None and results_signature(self.output_dir) != signature:
+            crawler_logger.info("載入期間輸出資料夾又開始更新，等待這次執行完成")
+            return False
+        self.loaded_signature = signature
+        self.snapshot = snapshot
+        info = snapshot.info()
+        crawler_logger.info(f"已載入結果：{info['visits']} 筆訪次、{info['issues']} 個問題")
+        return True
+
+    def _watch_loop(self) -> None:
+        while not self.stop_event.wait(self.poll_seconds):
+            signature = results_signature(self.output_dir)
+            if signature and signature != self.loaded_signature:
+                self.reload(signature)
+
+    def server_close(self) -> None:
+        self.stop_event.set()
+        super().server_close()
+
+
+def run_results_server(output_dir: Path, host: str = "127.0.0.1", port: int = RESULTS_SERVER_PORT,
+                       poll_seconds: float = RESULTS_SERVER_POLL_SECONDS) -> None:
+    server = ResultsServer(output_dir, host, port, poll_seconds)
+    crawler_logger.info(f"結果查詢服務：http://{host}:{server.server_address[1]}/（Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# =================================================================
+# 效能量測 (命令列: python sample_checker.py bench-parse)
+# =================================================================
+
+def _synthetic_form_page(rows: int = 300) -> bytes:
+    filler = "".join(
+        f"<tr><td>Q{k:03d} 題目說明文字</td><td>單選</td><td><div>{k % 5}: 選項內容與說明文字</div></td><td>2025-01-04 10:{k % 60:02d}:00</td></tr>"
+        for k in range(rows)
+    )
+    target = "<tr><td>T03 接觸方式</td><td>單選</td><td>對講機</td><td>2025-01-04 10:00:00</td></tr>"
+    return (
+        "<html><head><title>填答結果</title></head><body>"
+        "<table class='table table-bordered'><tbody><tr><th>結果代碼</th><td>100</td></tr></tbody></table>"
+        f"<table class='table table-bordered'><tbody>{filler}{target}</tbody></table></body></html>"
+    ).encode("utf-8")
+
+
+def _synthetic_response(body: bytes, content_type: Optional[str]) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r._content = body
+    if content_type:
+        r.headers["Content-Type"] = content_type
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+
+def benchmark_response_parsing(pages: int = 50, form_rows: int = 300) -> List[Dict[str, object]]:
+    """比較填答結果頁交給解析器的方式，回傳每頁 CPU 毫秒數與相對舊做法 (r.text + BeautifulSoup) 的節省"""
+    body = _synthetic_form_page(form_rows)
+    paths = [
+        ("r.text + BeautifulSoup", lambda r: BeautifulSoup(r.text, "lxml").select("table.table.table-bordered")),
+        ("decode + BeautifulSoup", lambda r: BeautifulSoup(r.content.decode("utf-8", errors="replace"), "lxml").select("table.table.table-bordered")),
+        ("bytes + lxml", lambda r: parse_contact_from_view(response_markup(r))),
+    ]
+    results: List[Dict[str, object]] = []
+    for header_label, content_type in [("未宣告 charset", None), ("charset=UTF-8", "text/html; charset=UTF-8")]:
+        baseline = None
+        for label, run in paths:
+            started = time.process_time()
+            for _ in range(pages):
+                run(_synthetic_response(body, content_type))
+            per_page = (time.process_time() - started) * 1000 / pages
+            baseline = per_page if baseline is None else baseline
+            results.append({
+                "header": header_label,
+                "path": label,
+                "page_kb": round(len(body) / 1024, 1),
+                "cpu_ms_per_page": round(per_page, 3),
+                "saved_ms_per_page": round(baseline - per_page, 3),
+            })
+    return results
+
+
+# 命令列: python sample_checker.py bench-http2
+# 兩個本機測試伺服器回應相同的填答結果頁並延遲 delay 秒（模擬伺服器處理時間）：HTTP/1.1 為 ThreadingHTTPServer，
+# HTTP/2 以 h2 實作 h2c（明文、prior knowledge，本機不做 TLS，因此不含 TLS 交握的節省）。
+# 兩邊都以相同的 session 標頭與登入 cookie 並行抓取，統計牆鐘時間、伺服器接受的連線數與客戶端上傳的位元組。
+BENCH_SESSION_COOKIE = "laravel_session=" + "x" * 340  # 與正式站的 session cookie 長度相當
+
+
+class _Http1BenchServer:
+    def __init__(self, body: bytes, delay: float):
+        bench = self
+        self.connections = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with bench.lock:
+                    bench.connections += 1
+
+            def do_GET(self):
+                with bench.lock:
+                    bench.bytes_received += len(self.raw_requestline) + len(self.headers.as_bytes())
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _H2cBenchServer:
+    def __init__(self, body: bytes, delay: float):
+        import h2.config, h2.connection, h2.events, h2.exceptions  # 只有量測用的測試伺服器需要
+        self.h2 = h2
+        self.body = body
+        self.delay = delay
+        self.connections = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        h2 = self.h2
+        state = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        lock = threading.Lock()
+        pending: Dict[int, bytes] = {}
+
+        def flush() -> None:
+            # 依流量控制視窗送出尚未送完的內容（呼叫時需持有 lock）
+            for stream_id, data in list(pending.items()):
+                try:
+                    while data:
+                        size = min(state.local_flow_control_window(stream_id), state.max_outbound_frame_size, len(data))
+                        if size <= 0:
+                            break
+                        state.send_data(stream_id, data[:size])
+                        data = data[size:]
+                    if data:
+                        pending[stream_id] = data
+                    else:
+                        state.end_stream(stream_id)
+                        del pending[stream_id]
+                except h2.exceptions.StreamClosedError:
+                    pending.pop(stream_id, None)
+            conn.sendall(state.data_to_send())
+
+        def respond(stream_id: int) -> None:
+            with lock:
+                try:
+                    state.send_headers(stream_id, [(":status", "200"), ("content-type", "text/html; charset=UTF-8"),
+                                                   ("content-length", str(len(self.body)))])
+                except h2.exceptions.StreamClosedError:
+                    return
+                pending[stream_id] = self.body
+                try:
+                    flush()
+                except OSError:
+                    pass
+
+        with lock:
+            state.initiate_connection()
+            conn.sendall(state.data_to_send())
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(65536)
+                except OSError:
+                    return
+                if not data:
+                    return
+                with self.lock:
+                    self.bytes_received += len(data)
+                with lock:
+                    for event in state.receive_data(data):
+                        if isinstance(event, h2.events.RequestReceived):
+                            threading.Timer(self.delay, respond, (event.stream_id,)).start()
+                        elif isinstance(event, h2.events.ConnectionTerminated):
+                            return
+                    flush()
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def benchmark_http2(requests_count: int = 300, delay: float = 0.05, concurrency: int = MAX_WORKERS,
+                    form_rows: int = 300) -> List[Dict[str, object]]:
+    """以本機測試伺服器比較 HTTP/1.1 (HTTPAdapter) 與 HTTP/2 (Http2Adapter) 並行抓取相同頁面的成本"""
+    if httpx is None:
+        raise RuntimeError('需要 httpx：pip install "httpx[http2]"')
+    body = _synthetic_form_page(form_rows)
+    pool = dict(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS * 2, max_retries=3)
+    cases = [
+        ("HTTP/1.1", _Http1BenchServer, lambda: requests.adapters.HTTPAdapter(**pool)),
+        ("HTTP/2", _H2cBenchServer, lambda: Http2Adapter(httpx.HTTPTransport(
+            http1=False, http2=True, limits=httpx.Limits(max_connections=HTTP2_MAX_CONNECTIONS)))),
+    ]
+    results: List[Dict[str, object]] = []
+    for label, server_class, make_adapter in cases:
+        server = server_class(body, delay)
+        session = requests.Session()
+        session.headers.update({"User-Agent": "Mozilla/5.0", "Referer": BASE_URL, "Cookie": BENCH_SESSION_COOKIE})
+        adapter = make_adapter()
+        session.mount("http://", adapter)
+        urls = [f"{server.url}/admin/form-result/view/{k}" for k in range(requests_count)]
+
+        def fetch(url: str) -> int:
+            r = session.get(url, timeout=(10, 30))
+            r.raise_for_status()
+            return len(r.content)
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as ex:
+                received = sum(ex.map(fetch, urls))
+            elapsed = time.perf_counter() - started
+        finally:
+            session.close()
+            if isinstance(adapter, Http2Adapter):
+                adapter.transport.close()
+            server.close()
+        results.append({
+            "transport": label,
+            "requests": requests_count,
+            "seconds": round(elapsed, 3),
+            "connections": server.connections,
+            "upload_bytes_per_request": round(server.bytes_received / requests_count, 1),
+            "received_mb": round(received / 1024 / 1024, 2),
+        })
+    return results
+
+
+def run_gui_job(email: str, password: str, project: int, wave: int, output_dir: Path, holiday_path: str,
+                update_progress_callback, full_export: bool = False) -> Tuple[bool, int]:
+    """GUI 的一次執行：登入後爬取並檢查；設定 SAMPLE_CHECKER_PROFILE 時同時量測"""
+    profile_mode = os.environ.get(PROFILE_ENV, "")
+    if profile_mode:
+        start_profiling(sample_stacks=profile_mode == "stacks")
+    try:
+        session = create_session()
+        update_progress_callback(1, 100, "1/4: 嘗試登入...")
+        with profile_stage("login"):
+            fetch_csrf_and_login(session, email, password)
+        fetch_mode = FETCH_MODE_FULL if full_export else FETCH_MODE
+        return crawl_and_check(session, project, wave, output_dir, holiday_path, update_progress_callback, fetch_mode)
+    finally:
+        finish_profiling(output_dir)
+
+
+def setup_file_logging() -> None:
+    try:
+        log_dir = Path.cwd() / "logs"
+        log_dir.mkdir(exist_ok=True)
+        if not any(isinstance(handler, logging.FileHandler) for handler in crawler_logger.handlers):
+            file_handler = logging.FileHandler(log_dir / 'crawler_log.txt', encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
             crawler_logger.addHandler(file_handler)
     except Exception as e:
         print(f"無法設定日誌檔案: {e}")
-        
-    app = VisitCrawlerApp()
+
+
+def headless_login() -> EsccSession:
+    """無介面模式的登入：帳號密碼取自 ESCC_EMAIL / ESCC_PASSWORD，未設定時在終端機詢問"""
+    email = os.environ.get("ESCC_EMAIL", "")
+    password = os.environ.get("ESCC_PASSWORD", "")
+    if (not email or not password) and sys.stdin is None:
+        raise RuntimeError("沒有可輸入的終端機，請設定 ESCC_EMAIL 與 ESCC_PASSWORD 環境變數")
+    email = email or input("Email: ").strip()
+    password = password or getpass.getpass("Password: ")
+    session = create_session()
+    fetch_csrf_and_login(session, email, password)
+    return session
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """不帶參數時啟動 GUI；子命令提供無介面的輔助工具"""
+    global HTTP_TRANSPORT, REPORT_BUNDLE, STREAM_FORM_PAGES
+    parser = argparse.ArgumentParser(description="訪次資料匯出檢查")
+    parser.add_argument("--http2", action="store_true", help='以 HTTP/2 多工連線抓取（需 pip install "httpx[http2]"）')
+    parser.add_argument("--stream-forms", action="store_true",
+                        help="填答結果頁邊下載邊解析，找到目標列即中斷下載（頁面很大時才值得開啟）")
+    parser.add_argument("--bundle", choices=sorted(REPORT_BUNDLE_FILES), help="另外把所有訪員的問題檔輸出成一個 zip 或 xlsx")
+    sub = parser.add_subparsers(dest="command")
+
+    bench = sub.add_parser("bench-parse", help="量測填答結果頁從回應到解析的 CPU 成本")
+    bench.add_argument("--pages", type=int, default=50, help="每種方式解析的頁數")
+    bench.add_argument("--rows", type=int, default=300, help="模擬頁面的題目列數")
+
+    bench_h2 = sub.add_parser("bench-http2", help="以本機測試伺服器比較 HTTP/1.1 與 HTTP/2 並行抓取")
+    bench_h2.add_argument("--requests", type=int, default=300, help="請求數")
+    bench_h2.add_argument("--delay", type=float, default=0.05, help="伺服器每個回應的延遲秒數")
+    bench_h2.add_argument("--concurrency", type=int, default=MAX_WORKERS, help="並行請求數")
+
+    coord = sub.add_parser("coordinator", help="抓取清單放入共用佇列，等待所有 worker 完成後執行檢查")
+    coord.add_argument("--queue", required=True, help="佇列 SQLite 檔案（放在各主機共用的磁碟）")
+    coord.add_argument("--project", type=int, required=True)
+    coord.add_argument("--wave", type=int, required=True)
+    coord.add_argument("--output", default="output", help="輸出資料夾")
+    coord.add_argument("--holidays", default="", help="假日清單（覆寫內建行事曆）")
+    coord.add_argument("--local-workers", type=int, default=0, help="協調者本身也處理樣本的執行緒數")
+    coord.add_argument("--full", action="store_true", help="完整匯出（抓取所有問卷頁面）")
+
+    check = sub.add_parser("check", help="對既有的訪次記錄 CSV 執行檢查（大型檔案可分塊處理）")
+    check.add_argument("csv", help="visit_records.csv 路徑")
+    check.add_argument("--output", default="output", help="輸出資料夾")
+    check.add_argument("--holidays", default="", help="假日清單（覆寫內建行事曆）")
+    check.add_argument("--chunked", action="store_true", help="分塊檢查（檔案大於記憶體時使用）")
+    check.add_argument("--chunk-rows", type=int, default=CHECK_CHUNK_ROWS, help="每塊列數")
+    check.add_argument("--sorted", action="store_true", help="檔案已依 SampleID 排序，略過分割步驟")
+    check.add_argument("--profile", choices=["stages", "stacks"], help="效能分析：分段計時，stacks 另取樣堆疊")
+
+    results = sub.add_parser("results", help="查詢結果資料庫（跨梯次、跨執行的訪次與問題）")
+    results.add_argument("--db", default=str(RESULTS_DB_PATH), help="結果資料庫路徑")
+    results_sub = results.add_subparsers(dest="results_command", required=True)
+    results_sub.add_parser("runs", help="列出已寫入的執行")
+    record = results_sub.add_parser("import", help="把既有輸出資料夾寫入資料庫")
+    record.add_argument("--project", type=int, required=True)
+    record.add_argument("--wave", type=int, required=True)
+    record.add_argument("--output", default="output", help="輸出資料夾")
+    for name, help_text in (("issues", "查詢檢查問題"), ("visits", "查詢訪次")):
+        query = results_sub.add_parser(name, help=help_text)
+        query.add_argument("--project", type=int)
+        query.add_argument("--wave", type=int)
+        query.add_argument("--interviewer", default="", help="訪員編號" + ("或姓名" if name == "issues" else ""))
+        query.add_argument("--sample", default="", help="樣本編號")
+        if name == "issues":
+            query.add_argument("--category", default="", help="檢查類別，例如 I.三訪規則")
+        else:
+            query.add_argument("--work-id", default="", help="WorkID")
+        query.add_argument("--all-runs", action="store_true", help="包含每個梯次的歷次執行（預設只看最新一次）")
+        query.add_argument("--limit", type=int, default=0, help="最多列出幾筆")
+        query.add_argument("--csv", default="", help="改為輸出到 CSV 檔")
+
+    watch = sub.add_parser("watch", help="持續監看樣本清單，只重新爬取與檢查有變動的樣本")
+    watch.add_argument("--project", type=int, required=True)
+    watch.add_argument("--wave", type=int, required=True)
+    watch.add_argument("--output", default="output", help="輸出資料夾（沿用上次的結果）")
+    watch.add_argument("--holidays", default="", help="假日清單（覆寫內建行事曆）")
+    watch.add_argument("--interval", type=float, default=WATCH_INTERVAL_SECONDS, help="輪詢間隔秒數")
+    watch.add_argument("--full", action="store_true", help="完整匯出（抓取所有問卷頁面）")
+
+    crawl = sub.add_parser("crawl", help="無介面執行完整流程（與 GUI 相同），可錄製或回放所有回應")
+    crawl.add_argument("--project", type=int, required=True)
+    crawl.add_argument("--wave", type=int, required=True)
+    crawl.add_argument("--output", default="output", help="輸出資料夾")
+    crawl.add_argument("--holidays", default="", help="假日清單（覆寫內建行事曆）")
+    crawl.add_argument("--full", action="store_true", help="完整匯出（抓取所有問卷頁面）")
+    crawl.add_argument("--record", default="", help="把所有回應錄製到此回放檔")
+    crawl.add_argument("--redact", action="append", default=[], help="錄製時額外遮蔽的正規表示式（可重複）")
+    crawl.add_argument("--replay", default="", help="不連網，由此回放檔回應（不需登入）")
+    crawl.add_argument("--profile", choices=["stages", "stacks"], help="效能分析：分段計時，stacks 另取樣堆疊")
+
+    serve = sub.add_parser("serve", help="在區網提供唯讀的結果查詢服務（新的執行完成後自動重新載入）")
+    serve.add_argument("--output", default="output", help="要提供查詢的輸出資料夾")
+    serve.add_argument("--host", default="127.0.0.1", help="監聽位址；讓區網其他電腦連線請用 0.0.0.0")
+    serve.add_argument("--port", type=int, default=RESULTS_SERVER_PORT)
+    serve.add_argument("--poll", type=float, default=RESULTS_SERVER_POLL_SECONDS, help="檢查輸出檔是否更新的間隔秒數")
+
+    worker = sub.add_parser("worker", help="從共用佇列領取樣本並寫回訪次資料")
+    worker.add_argument("--queue", required=True, help="佇列 SQLite 檔案")
+    worker.add_argument("--threads", type=int, default=MAX_WORKERS, help="並行處理的樣本數")
+    worker.add_argument("--id", default="", help="worker 名稱（預設為主機名稱-行程編號）")
+
+    args = parser.parse_args(argv)
+    setup_file_logging()
+    if args.http2:
+        HTTP_TRANSPORT = "http2"
+    if args.stream_forms:
+        STREAM_FORM_PAGES = True
+    if args.bundle:
+        REPORT_BUNDLE = args.bundle
+
+    if args.command == "bench-parse":
+        for rec in benchmark_response_parsing(args.pages, args.rows):
+            print(f"{rec['header']:<14} {rec['path']:<24} {rec['page_kb']:>7} KB {rec['cpu_ms_per_page']:>9.3f} ms/頁  節省 {rec['saved_ms_per_page']:>8.3f} ms/頁")
+        return 0
+
+    if args.command == "bench-http2":
+        try:
+            records = benchmark_http2(args.requests, args.delay, args.concurrency)
+        except (RuntimeError, ImportError) as e:
+            print(e)
+            return 1
+        for rec in records:
+            print(f"{rec['transport']:<9} {rec['requests']:>5} 個請求 {rec['seconds']:>7.3f} 秒  連線 {rec['connections']:>3}  "
+                  f"上傳 {rec['upload_bytes_per_request']:>7.1f} B/請求  下載 {rec['received_mb']:>6.2f} MB")
+        return 0
+
+    if args.command == "coordinator":
+        session = headless_login()
+        success, total_issues = run_coordinator(
+            SqliteWorkQueue(args.queue), session, args.project, args.wave, Path(args.output), args.holidays,
+            local_workers=args.local_workers,
+            fetch_mode=FETCH_MODE_FULL if args.full else FETCH_MODE,
+        )
+        print(f"完成，共發現 {total_issues} 個問題，輸出於 {args.output}")
+        return 0 if success else 1
+
+    if args.command == "check":
+        output_dir = Path(args.output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        progress = lambda current, total, message: crawler_logger.info(message)
+        if args.profile:
+            start_profiling(sample_stacks=args.profile == "stacks")
+        try:
+            if args.chunked:
+                success, total_issues = run_checks_chunked(args.csv, args.holidays, output_dir, progress,
+                                                           chunk_rows=args.chunk_rows, presorted=args.sorted)
+            else:
+                success, total_issues = run_all_checks(args.csv, args.holidays, output_dir, progress)
+        finally:
+            finish_profiling(output_dir)
+        print(f"完成，共發現 {total_issues} 個問題，輸出於 {args.output}")
+        return 0 if success else 1
+
+    if args.command == "results":
+        store = ResultsStore(args.db)
+        if args.results_command == "import":
+            try:
+                store.record_run(args.project, args.wave, Path(args.output))
+            except FileNotFoundError as e:
+                print(e)
+                return 1
+            return 0
+        if args.results_command == "runs":
+            frame = store.runs()
+        elif args.results_command == "issues":
+            frame = store.issues(args.project, args.wave, args.interviewer, args.sample, args.category,
+                                 all_runs=args.all_runs, limit=args.limit)
+        else:
+            frame = store.visits(args.project, args.wave, args.interviewer, args.sample, args.work_id,
+                                 all_runs=args.all_runs, limit=args.limit)
+        if getattr(args, "csv", ""):
+            frame.to_csv(args.csv, index=False, encoding="utf-8-sig")
+            print(f"已輸出 {len(frame)} 筆至 {args.csv}")
+        else:
+            print(frame.to_string(index=False) if len(frame) else "查無資料")
+        return 0
+
+    if args.command == "crawl":
+        output_dir = Path(args.output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        progress = lambda current, total, message: crawler_logger.info(message)
+        if args.replay:
+            start_replay(args.replay)
+        elif args.record:
+            start_recording(args.record, args.redact)
+        if args.profile:
+            start_profiling(sample_stacks=args.profile == "stacks")
+        try:
+            with profile_stage("login"):
+                session = create_session() if args.replay else headless_login()
+            success, total_issues = crawl_and_check(session, args.project, args.wave, output_dir, args.holidays,
+                                                    progress, FETCH_MODE_FULL if args.full else FETCH_MODE)
+        finally:
+            finish_profiling(output_dir)
+            stop_transport_archive()
+        print(f"完成，共發現 {total_issues} 個問題，輸出於 {args.output}")
+        return 0 if success else 1
+
+    if args.command == "watch":
+        try:
+            run_watch(headless_login(), args.project, args.wave, Path(args.output), args.holidays,
+                      interval=args.interval, fetch_mode=FETCH_MODE_FULL if args.full else FETCH_MODE)
+        except KeyboardInterrupt:
+            print("已停止監看")
+        return 0
+
+    if args.command == "serve":
+        try:
+            run_results_server(Path(args.output), args.host, args.port, args.poll)
+        except KeyboardInterrupt:
+            print("已停止查詢服務")
+        return 0
+
+    if args.command == "worker":
+        run_queue_worker(SqliteWorkQueue(args.queue), headless_login(), worker_id=args.id, threads=args.threads)
+        return 0
+
+    # GUI 套件只在啟動 GUI 時載入：平行檢查的 spawn 子行程會重新執行本模組的模組層級程式碼
+    from sample_checker_gui import VisitCrawlerApp
+    app = VisitCrawlerApp(run_gui_job, HOLIDAY_FILE_UNSET_TEXT)
     app.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
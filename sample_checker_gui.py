@@ -0,0 +1,266 @@
+"""sample_checker 的 GUI；由 sample_checker.main() 在不帶子命令時載入。
+爬取與檢查由 main() 傳入的 run_job 執行，本模組不 import sample_checker。"""
+import customtkinter as ctk
+import tkinter as tk
+from tkinter import messagebox, filedialog
+import threading
+from pathlib import Path
+from typing import Optional
+import requests
+
+
+# =================================================================
+# GUI 區塊 (使用 CustomTkinter) - UI 終極美化版 v2.3
+# =================================================================
+
+# 設定 CustomTkinter 預設主題
+ctk.set_appearance_mode("System")  # 預設為系統主題
+ctk.set_default_color_theme("blue")  # 使用藍色主題
+
+class VisitCrawlerApp(ctk.CTk):
+    def __init__(self, run_job, holiday_unset_text: str):
+        """run_job(email, password, project, wave, output_dir, holiday_path, progress, full_export) -> (成功, 問題數)"""
+        super().__init__()
+        self.run_job = run_job
+        self.holiday_unset_text = holiday_unset_text
+        self.title("訪次資料匯出檢查 | By.莊旻叡")
+        self.geometry("780x700")
+        self.resizable(False, False) 
+
+        # 狀態變數
+        self.email_var = ctk.StringVar(value="")
+        self.password_var = ctk.StringVar()
+        self.project_var = ctk.StringVar(value="35")
+        self.wave_var = ctk.StringVar(value="99")
+        self.holiday_path_var = ctk.StringVar(value=self.holiday_unset_text)
+        self._full_holiday_path: Optional[Path] = None
+        self.full_export_var = ctk.BooleanVar(value=False)
+        self.output_dir = Path.cwd() / "Output"
+        
+        # 顏色常量 (CTk 會自動處理深淺模式)
+        self.ACCENT_COLOR = "#1F4E79" # Dark Navy/Blue
+        self.FONT_FAMILY = "微軟正黑體"
+        
+        self._create_widgets()
+        self.bind('<Return>', lambda e: self._start_crawl_thread())
+        
+    def _create_widgets(self):
+        # 主容器框架 (使用 CTkFrame，padding 與圓角效果)
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=30, pady=30)
+
+        # 頂部標題
+        ctk.CTkLabel(main_frame, text="訪次資料匯出檢查", 
+                     font=(self.FONT_FAMILY, 24, 'bold'),
+                     text_color=self.ACCENT_COLOR).pack(pady=(0, 25))
+
+        # --- 1. 執行參數框架 ---
+        # 使用 CTkFrame 模擬 LabelFrame，視覺上更簡潔
+        input_frame = ctk.CTkFrame(main_frame, corner_radius=10)
+        input_frame.pack(padx=0, pady=(0, 25), fill="x", ipady=15)
+
+        # 網格配置
+        input_frame.columnconfigure(0, weight=1, minsize=160) 
+        input_frame.columnconfigure(1, weight=3) 
+
+        row_index = 0
+        pady_val = 10
+        padx_val = 15
+        
+        # A. 登入憑證 (分組標題)
+        ctk.CTkLabel(input_frame, text="[ 登入憑證 ]", 
+                     font=(self.FONT_FAMILY, 15, 'bold'), 
+                     text_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"][0], # 使用主題色
+                     ).grid(row=row_index, column=0, sticky="w", pady=(pady_val, 0), padx=padx_val, columnspan=2)
+        row_index += 1
+        
+        # 帳號 (Email)
+        ctk.CTkLabel(input_frame, text="帳號 (Email):", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
+        ctk.CTkEntry(input_frame, textvariable=self.email_var, font=(self.FONT_FAMILY, 13)).grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
+        row_index += 1
+
+        # 密碼
+        ctk.CTkLabel(input_frame, text="密碼:", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
+        ctk.CTkEntry(input_frame, textvariable=self.password_var, show="•", font=(self.FONT_FAMILY, 13)).grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
+        row_index += 1
+
+        # B. 專案配置 (分組標題)
+        ctk.CTkLabel(input_frame, text="[ 專案配置 ]", 
+                     font=(self.FONT_FAMILY, 15, 'bold'), 
+                     text_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"][0],
+                     ).grid(row=row_index, column=0, sticky="w", pady=(pady_val*2, 0), padx=padx_val, columnspan=2)
+        row_index += 1
+        
+        # Project ID / Wave ID 容器
+        project_wave_frame = ctk.CTkFrame(input_frame, fg_color="transparent")
+        project_wave_frame.grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
+        project_wave_frame.columnconfigure(0, weight=1) 
+        project_wave_frame.columnconfigure(2, weight=0) # 分隔符不佔空間
+        project_wave_frame.columnconfigure(3, weight=1) 
+
+        ctk.CTkLabel(input_frame, text="Project ID / Wave ID:", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
+        
+        ctk.CTkEntry(project_wave_frame, textvariable=self.project_var, font=(self.FONT_FAMILY, 13)).grid(row=0, column=0, sticky="ew")
+        ctk.CTkLabel(project_wave_frame, text=" / ", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=0, column=2, sticky="ew", padx=10)
+        ctk.CTkEntry(project_wave_frame, textvariable=self.wave_var, font=(self.FONT_FAMILY, 13)).grid(row=0, column=3, sticky="ew")
+        row_index += 1
+        
+        # 假日清單按鈕 (優化 UX)
+        holiday_control_frame = ctk.CTkFrame(input_frame, fg_color="transparent")
+        holiday_control_frame.grid(row=row_index, column=1, sticky="ew", pady=pady_val, padx=padx_val)
+        holiday_control_frame.columnconfigure(0, weight=0) 
+        holiday_control_frame.columnconfigure(1, weight=1) 
+
+        ctk.CTkLabel(input_frame, text="假日清單覆寫 (選填):", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
+        
+        ctk.CTkButton(holiday_control_frame, text="選擇檔案...", command=self._select_holiday_file, 
+                      width=150, font=(self.FONT_FAMILY, 12),
+                      fg_color=("gray70", "gray35") # 次要按鈕樣式
+                      ).grid(row=0, column=0, sticky="w")
+        
+        # 顯示選中的檔案名稱
+        self.holiday_path_display = ctk.CTkLabel(holiday_control_frame, textvariable=self.holiday_path_var, wraplength=400, 
+                                                 font=(self.FONT_FAMILY, 11), text_color=("gray40", "gray60"))
+        self.holiday_path_display.grid(row=0, column=1, sticky="w", padx=(10, 0))
+        row_index += 1
+
+        # 匯出模式：預設只抓檢查規則需要的頁面
+        ctk.CTkLabel(input_frame, text="匯出模式:", font=(self.FONT_FAMILY, 13, 'bold')).grid(row=row_index, column=0, sticky="w", pady=pady_val, padx=padx_val)
+        ctk.CTkCheckBox(input_frame, text="完整匯出（抓取所有問卷頁面，較慢）", variable=self.full_export_var,
+                        font=(self.FONT_FAMILY, 12)).grid(row=row_index, column=1, sticky="w", pady=pady_val, padx=padx_val)
+        row_index += 1
+
+        # --- 2. 執行按鈕 ---
+        self.run_button = ctk.CTkButton(main_frame, text="▶ 啟動爬取與檢查", command=self._start_crawl_thread, 
+                                        height=50, 
+                                        font=(self.FONT_FAMILY, 16, 'bold'))
+        self.run_button.pack(pady=(20, 30), fill="x")
+
+        # --- 3. 執行進度框架 ---
+        progress_frame = ctk.CTkFrame(main_frame, corner_radius=10)
+        progress_frame.pack(padx=0, pady=(0, 25), fill="x", ipady=15)
+        
+        # 狀態標籤 
+        self.status_label = ctk.CTkLabel(progress_frame, text="系統待命中...", anchor="center", 
+                                         font=(self.FONT_FAMILY, 15, 'bold'), 
+                                         text_color=self.ACCENT_COLOR)
+        self.status_label.pack(pady=(5, 15), fill="x")
+        
+        # 進度條
+        self.progress = ctk.CTkProgressBar(progress_frame, orientation="horizontal", height=20)
+        self.progress.set(0)
+        self.progress.pack(pady=5, padx=15, fill="x")
+
+        # --- 4. 資訊區與模式切換 ---
+        info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        info_frame.pack(padx=0, pady=(0, 0), fill="x")
+        info_frame.columnconfigure(0, weight=1)
+        info_frame.columnconfigure(1, weight=1)
+
+        # 輸出路徑
+        self.output_label = ctk.CTkLabel(info_frame, text=f"輸出資料夾: {self.output_dir.name}", 
+                                         font=(self.FONT_FAMILY, 11), 
+                                         anchor="w", text_color=self.ACCENT_COLOR)
+        self.output_label.grid(row=0, column=0, sticky="w")
+        
+        # 主題切換按鈕
+        self.appearance_mode_optionemenu = ctk.CTkOptionMenu(info_frame, 
+                                                             values=["Light", "Dark", "System"],
+                                                             command=self.change_appearance_mode_event,
+                                                             width=100,
+                                                             font=(self.FONT_FAMILY, 11))
+        self.appearance_mode_optionemenu.set("System")
+        self.appearance_mode_optionemenu.grid(row=0, column=1, sticky="e")
+        
+        # 作者資訊
+        ctk.CTkLabel(info_frame, text="By.莊旻叡", 
+                     font=(self.FONT_FAMILY, 9), text_color=("gray60", "gray40")).grid(row=1, column=0, sticky="w")
+
+    def change_appearance_mode_event(self, new_appearance_mode: str):
+        ctk.set_appearance_mode(new_appearance_mode)
+
+    def _select_holiday_file(self):
+        file_path = filedialog.askopenfilename(
+            title="選擇假日清單 (.txt，每行一個日期，補班日加「,上班」)",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if file_path:
+            self._full_holiday_path = Path(file_path)
+            self.holiday_path_var.set(self._full_holiday_path.name) 
+        else:
+            self.holiday_path_var.set(self.holiday_unset_text)
+            self._full_holiday_path = None
+
+    def _update_progress(self, current, total, message):
+        percentage = max(0, min(100, (current / total) * 100))
+        
+        # CTkProgressBar 使用 set(value)
+        self.progress.set(percentage / 100) 
+        self.status_label.configure(text=f"{message} ({percentage:.1f}%)")
+        self.update_idletasks()
+        
+    def _start_crawl_thread(self):
+        email = self.email_var.get().strip()
+        password = self.password_var.get().strip()
+        project_id = self.project_var.get().strip()
+        wave_id = self.wave_var.get().strip()
+        
+        holiday_path = str(self._full_holiday_path) if self._full_holiday_path else ""
+        full_export = self.full_export_var.get()
+
+        if not email or "@" not in email:
+            messagebox.showerror("驗證錯誤", "請輸入有效的 Email 帳號。")
+            return
+        if not password:
+            messagebox.showerror("驗證錯誤", "請輸入密碼。")
+            return
+        if not project_id.isdigit() or not wave_id.isdigit():
+            messagebox.showerror("驗證錯誤", "Project ID 和 Wave ID 必須是數字。")
+            return
+            
+        self.run_button.configure(state="disabled")
+        self.progress.set(0)
+        self.status_label.configure(text="初始化...")
+        
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            messagebox.showerror("錯誤", f"無法建立輸出目錄: {e}")
+            self.run_button.configure(state="normal")
+            return
+            
+        threading.Thread(
+            target=self._run_crawl_and_check, 
+            args=(email, password, int(project_id), int(wave_id), holiday_path, full_export),
+            daemon=True
+        ).start()
+
+    def _run_crawl_and_check(self, email, password, project, wave, holiday_path, full_export=False):
+        total_issues = 0
+        try:
+            # 1~4. 登入、爬取、寫出 CSV、執行檢查
+            success, total_issues = self.run_job(email, password, project, wave, self.output_dir, holiday_path,
+                                                 self._update_progress, full_export)
+            
+            # 5. 完成
+            self._update_progress(100, 100, "✅ 完成所有任務！")
+            
+            if success:
+                messagebox.showinfo(
+                    "完成", 
+                    f"資料匯出與檢查成功！\n\n檔案已輸出至：{self.output_dir.name} 資料夾\n\n共發現 {total_issues} 個問題。\n\n本程式由莊旻叡撰寫\n特別感謝陳逸龍教授加博士先生的協助開發"
+                )
+            else:
+                messagebox.showwarning("警告", f"資料爬取與檢查成功，但檢查過程中發生錯誤或未生成彙總檔案。\n輸出路徑：{self.output_dir.name}")
+
+        except requests.exceptions.HTTPError as e:
+            messagebox.showerror("錯誤", f"HTTP 錯誤: 檢查您的 Project/Wave ID 或登入狀態。\n錯誤細節: {e}")
+            self._update_progress(0, 100, "❌ 錯誤：HTTP 失敗。")
+        except RuntimeError as e:
+            messagebox.showerror("錯誤", f"執行錯誤: {e}")
+            self._update_progress(0, 100, "❌ 錯誤：登入或執行失敗。")
+        except Exception as e:
+            messagebox.showerror("嚴重錯誤", f"發生無法預期的錯誤: {e}")
+            self._update_progress(0, 100, "❌ 錯誤：執行失敗。")
+        finally:
+            self.run_button.configure(state="normal")